@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+"""Measures what the durability options of FileStorage cost on save().
+
+Each mode updates one object and saves, over a storage of --objects
+objects, in a temporary directory.
+
+Usage: bench_durability.py [--objects N] [--saves N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import models  # noqa: E402
+from models.engine.file_storage import FileStorage  # noqa: E402
+from models.user import User  # noqa: E402
+
+MODES = (
+    ("plain", {}),
+    ("checksum", {"checksum": True}),
+    ("durable", {"durable": True}),
+    ("durable+checksum", {"durable": True, "checksum": True}),
+    ("journaled+durable", {"journaled": True, "durable": True}),
+)
+
+
+def configure(journaled=False, durable=False, checksum=False):
+    """Set the storage options of FileStorage."""
+    FileStorage._FileStorage__journaled = journaled
+    FileStorage._FileStorage__durable = durable
+    FileStorage._FileStorage__checksum = checksum
+    FileStorage._FileStorage__compact_bytes = 0
+    FileStorage._FileStorage__compact_ratio = 0
+    FileStorage._FileStorage__file_path = "file.json"
+    FileStorage._FileStorage__log_path = "file.json.log"
+
+
+def run(objects, saves, options):
+    """Return the saves per second of a storage with the given options."""
+    configure()
+    FileStorage._FileStorage__objects = {}
+    users = [User() for i in range(objects)]
+    models.storage.save()
+    configure(**options)
+    start = time.perf_counter()
+    for i in range(saves):
+        users[i % objects].first_name = str(i)
+        models.storage.save()
+    return saves / (time.perf_counter() - start)
+
+
+def main():
+    """Print the save throughput of each durability mode."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--objects", type=int, default=1000)
+    parser.add_argument("--saves", type=int, default=200)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        base = None
+        for name, options in MODES:
+            rate = run(args.objects, args.saves, options)
+            base = base or rate
+            print("{:<20} {:>10.1f} saves/s {:>7.2f}x".format(
+                name, rate, base / rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+"""Measures how fast FileStorage.reload() decodes timestamps.
+
+Writes a storage file of --objects reviews in a temporary directory, then
+times its reload in a new process for each mode: timestamps decoded when
+each object is built, and timestamps kept as strings until first read
+(HBNB_LAZY_TIMESTAMPS=1). It also compares the decoding of the timestamps
+of the file with datetime.strptime and datetime.fromisoformat.
+
+Usage: bench_timestamps.py [--objects N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+MODES = (
+    ("eager", {}),
+    ("lazy", {"HBNB_LAZY_TIMESTAMPS": "1"}),
+)
+CHILD = """
+import sys, time
+import models
+from models.engine.file_storage import FileStorage
+FileStorage._FileStorage__file_path = sys.argv[1]
+start = time.perf_counter()
+models.storage.reload()
+loaded = time.perf_counter()
+for obj in models.storage.all().values():
+    obj.created_at, obj.updated_at
+print(loaded - start, time.perf_counter() - loaded)
+"""
+
+
+def write(path, objects):
+    """Write a storage file of objects reviews to path, returning their
+    timestamps."""
+    start = datetime(2017, 9, 28, 21, 5, 54, 119427)
+    stamps = [(start + timedelta(seconds=i, microseconds=i)).isoformat()
+              for i in range(objects)]
+    records = {}
+    for i, ts in enumerate(stamps):
+        records["Review.{}".format(i)] = {
+            "id": str(i), "created_at": ts, "updated_at": ts,
+            "place_id": str(i % 1000), "user_id": str(i % 5000),
+            "text": "A review", "__class__": "Review"}
+    with open(path, "w") as f:
+        json.dump(records, f)
+    return stamps
+
+
+def decode(stamps):
+    """Print the time to decode stamps with strptime and fromisoformat."""
+    tform = "%Y-%m-%dT%H:%M:%S.%f"
+    start = time.perf_counter()
+    for ts in stamps:
+        datetime.strptime(ts, tform)
+    slow = time.perf_counter() - start
+    start = time.perf_counter()
+    for ts in stamps:
+        datetime.fromisoformat(ts)
+    fast = time.perf_counter() - start
+    print("{:<14} {:>8.3f} s".format("strptime", slow))
+    print("{:<14} {:>8.3f} s {:>7.2f}x".format("fromisoformat", fast,
+                                               slow / fast))
+
+
+def main():
+    """Print the reload time of each timestamp mode."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--objects", type=int, default=1000000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "reviews.json")
+        decode(write(path, args.objects))
+        base = None
+        for name, env in MODES:
+            env = dict(os.environ, HBNB_FILE_PATH=os.path.join(tmp, "none"),
+                       **env)
+            out = subprocess.run([sys.executable, "-c", CHILD, path],
+                                 cwd=ROOT, env=env, capture_output=True,
+                                 text=True, check=True).stdout
+            reload, read = map(float, out.split())
+            base = base or reload
+            print("{:<14} {:>8.3f} s reload {:>7.2f}x, {:.3f} s to read "
+                  "the timestamps".format(name, reload, base / reload, read))
+
+
+if __name__ == "__main__":
+    main()
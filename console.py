@@ -1,17 +1,16 @@
 #!/usr/bin/python3
 """This script defines the HBnB console."""
 
+import ast
 import cmd
 import re
+import time
+import select
+from os import getenv
 from shlex import split
 from models import storage
-from models.base_model import BaseModel
-from models.user import User
-from models.place import Place
-from models.city import City
-from models.state import State
-from models.amenity import Amenity
-from models.review import Review
+from models.engine.query import parse_conditions
+from models.base_model import ModelType
 
 
 def parse(arg):
@@ -38,18 +37,61 @@ class HBNBCommand(cmd.Cmd):
 
     Attributes:
         prompt (str): The command prompt.
+        __classes (dict): The model classes by name, as registered by
+            their ModelType metaclass.
+        __group_commit (bool): Whether changes are saved in groups rather
+            than after each command.
+        __commit_count (int): Number of changes that triggers a save in
+            group commit mode.
+        __commit_window (float): Seconds after the first unsaved change
+            that trigger a save in group commit mode, even while the
+            prompt waits for the next command.
     """
 
     prompt = "(hbnb) "
-    __classes = {
-        "BaseModel",
-        "User",
-        "State",
-        "City",
-        "Place",
-        "Amenity",
-        "Review"
-    }
+    __classes = ModelType.classes
+    __group_commit = getenv("HBNB_GROUP_COMMIT") == "1"
+    __commit_count = int(getenv("HBNB_GROUP_COMMIT_COUNT", 1000))
+    __commit_window = float(getenv("HBNB_GROUP_COMMIT_WINDOW", 1.0))
+    __pending = 0
+    __first_pending = None
+
+    def postcmd(self, stop, line):
+        """Save the pending changes once the commit window has elapsed,
+        waiting for it to elapse if no command is read before."""
+        if self.__pending and not stop:
+            left = (self.__first_pending + HBNBCommand.__commit_window -
+                    time.monotonic())
+            if left <= 0 or not self.__input_ready(left):
+                self.__flush()
+        return stop
+
+    def __input_ready(self, timeout):
+        """Return True if the next command can be read within timeout
+        seconds, or if stdin cannot be waited on."""
+        try:
+            ready, _, _ = select.select([self.stdin], [], [], timeout)
+        except (OSError, ValueError):
+            return True
+        return len(ready) > 0
+
+    def __commit(self):
+        """Save the changes, or add them to the group to save later."""
+        if not HBNBCommand.__group_commit:
+            storage.save()
+            return
+        if self.__pending == 0:
+            self.__first_pending = time.monotonic()
+        self.__pending += 1
+        if self.__pending >= HBNBCommand.__commit_count:
+            self.__flush()
+
+    def __flush(self):
+        """Save the pending changes of the group."""
+        if self.__pending:
+            storage.save()
+            self.__pending = 0
+            self.__first_pending = None
 
     def emptyline(self):
         """Do nothing when an empty line is entered."""
@@ -62,7 +104,9 @@ class HBNBCommand(cmd.Cmd):
             "show": self.do_show,
             "destroy": self.do_destroy,
             "count": self.do_count,
-            "update": self.do_update
+            "update": self.do_update,
+            "where": self.do_where,
+            "search": self.do_search
         }
         match = re.search(r"\.", arg)
         if match is not None:
@@ -78,13 +122,24 @@ class HBNBCommand(cmd.Cmd):
 
     def do_quit(self, arg):
         """Exit the program using the 'quit' command."""
+        self.__flush()
+        storage.close()
         return True
 
     def do_EOF(self, arg):
         """Exit the program when the EOF signal is received."""
         print("")
+        self.__flush()
+        storage.close()
         return True
 
+    def do_flush(self, arg):
+        """Save the changes waiting for a group commit.
+
+        Usage: flush
+        """
+        self.__flush()
+
     def do_create(self, arg):
         """Create a new class instance and print its ID.
 
@@ -96,8 +151,8 @@ class HBNBCommand(cmd.Cmd):
         elif argl[0] not in HBNBCommand.__classes:
             print("** class doesn't exist **")
         else:
-            print(eval(argl[0])().id)
-            storage.save()
+            print(HBNBCommand.__classes[argl[0]]().id)
+            self.__commit()
 
     def do_show(self, arg):
         """Display the string representation of a class instance by its ID.
@@ -105,17 +160,16 @@ class HBNBCommand(cmd.Cmd):
         Usage: show <class> <id> or <class>.show(<id>)
         """
         argl = parse(arg)
-        objdict = storage.all()
         if len(argl) == 0:
             print("** class name missing **")
         elif argl[0] not in HBNBCommand.__classes:
             print("** class doesn't exist **")
         elif len(argl) == 1:
             print("** instance id missing **")
-        elif "{}.{}".format(argl[0], argl[1]) not in objdict:
+        elif storage.get(argl[0], argl[1]) is None:
             print("** no instance found **")
         else:
-            print(objdict["{}.{}".format(argl[0], argl[1])])
+            print(storage.get(argl[0], argl[1]))
 
     def do_destroy(self, arg):
         """Delete a class instance of a given ID.
@@ -123,18 +177,17 @@ class HBNBCommand(cmd.Cmd):
         Usage: destroy <class> <id> or <class>.destroy(<id>)
         """
         argl = parse(arg)
-        objdict = storage.all()
         if len(argl) == 0:
             print("** class name missing **")
         elif argl[0] not in HBNBCommand.__classes:
             print("** class doesn't exist **")
         elif len(argl) == 1:
             print("** instance id missing **")
-        elif "{}.{}".format(argl[0], argl[1]) not in objdict.keys():
+        elif storage.get(argl[0], argl[1]) is None:
             print("** no instance found **")
         else:
-            del objdict["{}.{}".format(argl[0], argl[1])]
-            storage.save()
+            storage.delete(storage.get(argl[0], argl[1]))
+            self.__commit()
 
     def do_all(self, arg):
         """Display class instance representations or all objects.
@@ -145,13 +198,11 @@ class HBNBCommand(cmd.Cmd):
         if len(argl) > 0 and argl[0] not in HBNBCommand.__classes:
             print("** class doesn't exist **")
         else:
-            objl = []
-            for obj in storage.all().values():
-                if len(argl) > 0 and argl[0] == obj.__class__.__name__:
-                    objl.append(obj.__str__())
-                elif len(argl) == 0:
-                    objl.append(obj.__str__())
-            print(objl)
+            if len(argl) > 0:
+                objs = storage.all(cls_name=argl[0])
+            else:
+                objs = storage.all()
+            print([obj.__str__() for obj in objs.values()])
 
     def do_count(self, arg):
         """Retrieve the number of instances of a given class.
@@ -159,11 +210,79 @@ class HBNBCommand(cmd.Cmd):
         Usage: count <class> or <class>.count()
         """
         argl = parse(arg)
-        count = 0
-        for obj in storage.all().values():
-            if argl[0] == obj.__class__.__name__:
-                count += 1
-        print(count)
+        print(storage.count(argl[0]))
+
+    def do_where(self, arg):
+        """Display the instances of a class matching every condition.
+
+        Usage: where <class> <attribute><op><value>, ... or
+       <class>.where(<attribute><op><value>, ...)
+       with <op> one of ==, !=, <, <=, > and >=
+        """
+        argl = arg.split(maxsplit=1)
+        if len(argl) == 0:
+            print("** class name missing **")
+        elif argl[0] not in HBNBCommand.__classes:
+            print("** class doesn't exist **")
+        else:
+            try:
+                conditions = parse_conditions(argl[1] if len(argl) > 1
+                                              else "")
+            except ValueError as e:
+                print("** {} **".format(e))
+                return False
+            objs = storage.where(argl[0], conditions)
+            print([obj.__str__() for obj in objs.values()])
+
+    def do_search(self, arg):
+        """Display the places and reviews matching words, best first.
+
+        Usage: search [<class>] <words> or <class>.search(<words>)
+        """
+        argl = arg.split(maxsplit=1)
+        cls_name = None
+        if len(argl) > 0 and argl[0] in HBNBCommand.__classes:
+            cls_name = argl.pop(0)
+        if len(argl) == 0:
+            print("** search words missing **")
+            return False
+        objs = storage.search(argl[0], cls_name)
+        print([obj.__str__() for obj in objs.values()])
+
+    def do_near(self, arg):
+        """Display the places within a radius in kilometers, nearest first.
+
+        Usage: near <latitude> <longitude> <radius>
+        """
+        try:
+            lat, lon, radius = (float(v) for v in parse(arg))
+        except ValueError:
+            print("** usage: near <latitude> <longitude> <radius> **")
+            return False
+        objs = storage.near(lat, lon, radius)
+        print([obj.__str__() for obj in objs.values()])
+
+    def do_within(self, arg):
+        """Display the places inside a bounding box.
+
+        Usage: within <south> <west> <north> <east>
+        """
+        try:
+            south, west, north, east = (float(v) for v in parse(arg))
+        except ValueError:
+            print("** usage: within <south> <west> <north> <east> **")
+            return False
+        objs = storage.within(south, west, north, east)
+        print([obj.__str__() for obj in objs.values()])
+
+    def do_compact(self, arg):
+        """Fold the storage journal into a new snapshot.
+
+        Usage: compact
+        """
+        stats = storage.compact()
+        print("{} bytes, {} records reclaimed".format(
+            stats["bytes"], stats["records"]))
 
     def do_update(self, arg):
         """Update a class instance of a given ID by adding or updating
@@ -174,7 +293,6 @@ class HBNBCommand(cmd.Cmd):
        <class>.update(<id>, <dictionary>)
         """
         argl = parse(arg)
-        objdict = storage.all()
 
         if len(argl) == 0:
             print("** class name missing **")
@@ -185,36 +303,38 @@ class HBNBCommand(cmd.Cmd):
         if len(argl) == 1:
             print("** instance id missing **")
             return False
-        if "{}.{}".format(argl[0], argl[1]) not in objdict.keys():
+        obj = storage.get(argl[0], argl[1])
+        if obj is None:
             print("** no instance found **")
             return False
         if len(argl) == 2:
             print("** attribute name missing **")
             return False
+        attrs = None
         if len(argl) == 3:
             try:
-                type(eval(argl[2])) != dict
-            except NameError:
+                attrs = ast.literal_eval(argl[2])
+            except (ValueError, SyntaxError):
+                pass
+            if type(attrs) is not dict:
                 print("** value missing **")
                 return False
 
-        if len(argl) == 4:
-            obj = objdict["{}.{}".format(argl[0], argl[1])]
-            if argl[2] in obj.__class__.__dict__.keys():
-                valtype = type(obj.__class__.__dict__[argl[2]])
-                obj.__dict__[argl[2]] = valtype(argl[3])
+        defaults = type(obj).defaults
+        if attrs is None:
+            if argl[2] in defaults:
+                valtype = type(defaults[argl[2]])
+                setattr(obj, argl[2], valtype(argl[3]))
             else:
-                obj.__dict__[argl[2]] = argl[3]
-        elif type(eval(argl[2])) == dict:
-            obj = objdict["{}.{}".format(argl[0], argl[1])]
-            for k, v in eval(argl[2]).items():
-                if (k in obj.__class__.__dict__.keys() and
-                        type(obj.__class__.__dict__[k]) in {str, int, float}):
-                    valtype = type(obj.__class__.__dict__[k])
-                    obj.__dict__[k] = valtype(v)
+                setattr(obj, argl[2], argl[3])
+        else:
+            for k, v in attrs.items():
+                if k in defaults and type(defaults[k]) in {str, int, float}:
+                    valtype = type(defaults[k])
+                    setattr(obj, k, valtype(v))
                 else:
-                    obj.__dict__[k] = v
-        storage.save()
+                    setattr(obj, k, v)
+        self.__commit()
 
 
 if __name__ == "__main__":
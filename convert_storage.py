@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+"""Converts a storage file between the JSON and binary formats.
+
+The binary_format module is loaded from its file rather than imported
+from the models package, which would first load the whole storage.
+
+Usage: convert_storage.py import <file.json> <file.bin>
+       convert_storage.py export <file.bin> <file.json>
+"""
+import importlib.util
+import os
+import sys
+
+FORMAT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "models", "engine", "binary_format.py")
+
+
+def load_format():
+    """Return the binary_format module, without importing models."""
+    spec = importlib.util.spec_from_file_location("binary_format",
+                                                  FORMAT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main(argv):
+    """Run the conversion named by argv[1] and return the exit status."""
+    fmt = load_format()
+    commands = {"import": fmt.json_to_binary, "export": fmt.binary_to_json}
+    if len(argv) != 4 or argv[1] not in commands:
+        print("Usage: " + __doc__.split("Usage: ")[1].rstrip(),
+              file=sys.stderr)
+        return 1
+    commands[argv[1]](argv[2], argv[3])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,7 +1,14 @@
 #!/usr/bin/python3
-"""Initialize the FileStorage engine and load data if available."""
-from models.engine.file_storage import FileStorage
+"""Initialize the storage engine and load data if available.
 
+The engine is FileStorage, or DBStorage when HBNB_TYPE_STORAGE is "db".
+"""
+from os import getenv
 
-storage = FileStorage()
+if getenv("HBNB_TYPE_STORAGE") == "db":
+    from models.engine.db_storage import DBStorage
+    storage = DBStorage()
+else:
+    from models.engine.file_storage import FileStorage
+    storage = FileStorage()
 storage.reload()
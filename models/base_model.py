@@ -1,12 +1,146 @@
 #!/usr/bin/python3
 """Defines the BaseModel class."""
 import models
+from os import getenv
 from uuid import uuid4
 from datetime import datetime
 
+COMPACT = getenv("HBNB_COMPACT_MODELS") == "1"
+LAZY_TIMESTAMPS = getenv("HBNB_LAZY_TIMESTAMPS") == "1"
+TIMESTAMPS = ("created_at", "updated_at")
 
-class BaseModel:
-    """Represents the BaseModel of the HBnB project."""
+
+class ModelType(type):
+    """The metaclass of the models.
+
+    It collects the attributes declared by each model class, with their
+    default values, in the defaults dictionary of the class. In compact
+    mode, enabled with HBNB_COMPACT_MODELS=1, these attributes become
+    slots instead of class attributes, so instances have no __dict__.
+    The declared attributes whose default is a list or a dict become
+    Container attributes, listed in the containers dictionary.
+
+    Attributes:
+        classes (dict): The model classes by name.
+    """
+    classes = {}
+
+    def __new__(mcs, name, bases, namespace):
+        """Create a model class, with slots in compact mode."""
+        defaults = {}
+        for base in reversed(bases):
+            defaults.update(getattr(base, "defaults", {}))
+        declared = [k for k, v in namespace.items()
+                    if not k.startswith("_") and not callable(v) and
+                    not hasattr(v, "__get__")]
+        for k in declared:
+            defaults[k] = namespace[k]
+            if COMPACT:
+                del namespace[k]
+        if COMPACT:
+            namespace["__slots__"] = (tuple(namespace.get("__slots__", ())) +
+                                      tuple(declared))
+        namespace["defaults"] = defaults
+        containers = {}
+        for base in reversed(bases):
+            containers.update(getattr(base, "containers", {}))
+        namespace["containers"] = containers
+        cls = super().__new__(mcs, name, bases, namespace)
+        for k in declared:
+            if type(defaults[k]) is list or type(defaults[k]) is dict:
+                member = vars(cls)[k] if COMPACT else None
+                containers[k] = Container(k, defaults[k], member)
+                setattr(cls, k, containers[k])
+        ModelType.classes[name] = cls
+        return cls
+
+
+class Attribute:
+    """An attribute of the instances held in a slot or in their __dict__.
+
+    Attributes:
+        name (str): The name of the attribute.
+        member (member_descriptor): The slot holding the value in compact
+            mode, or None when it is held in the __dict__ of instances.
+    """
+
+    def __init__(self, name, member=None):
+        """Initialize the attribute name, held in the slot member."""
+        self.name = name
+        self.member = member
+
+    def raw(self, obj):
+        """Return the value held by obj, as it was set."""
+        if self.member is not None:
+            return self.member.__get__(obj)
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+    def __set__(self, obj, value):
+        """Set the value of obj."""
+        if self.member is not None:
+            self.member.__set__(obj, value)
+        else:
+            obj.__dict__[self.name] = value
+
+
+class Timestamp(Attribute):
+    """A datetime attribute that can hold the ISO 8601 string it was read
+    from, only decoded when the attribute is first read."""
+
+    def __get__(self, obj, owner=None):
+        """Return the datetime of obj, decoding it if needed."""
+        if obj is None:
+            return self
+        v = self.raw(obj)
+        if type(v) is str:
+            v = datetime.fromisoformat(v)
+            self.__set__(obj, v)
+        return v
+
+
+class Container(Attribute):
+    """A declared attribute whose default is a list or a dict.
+
+    Reading the list or dict of an instance marks the attribute as changed
+    in storage, as it can then be changed in place.
+
+    Attributes:
+        default (list or dict): The value of the instances that do not
+            set the attribute.
+    """
+
+    def __init__(self, name, default, member=None):
+        """Initialize the attribute name of default value default, held
+        in the slot member."""
+        super().__init__(name, member)
+        self.default = default
+
+    def __get__(self, obj, owner=None):
+        """Return the value of obj, marking it as changed in storage."""
+        if obj is None:
+            return self.default
+        try:
+            v = self.raw(obj)
+        except AttributeError:
+            return self.default
+        if type(v) is list or type(v) is dict:
+            models.storage.touch(obj, self.name)
+        return v
+
+
+class BaseModel(metaclass=ModelType):
+    """Represents the BaseModel of the HBnB project.
+
+    In compact mode, the attributes that are not declared by the class are
+    kept in a separate dictionary, only created when first needed.
+    """
+
+    if COMPACT:
+        __slots__ = ("id", "created_at", "updated_at", "__extra",
+                     "__weakref__")
 
     def __init__(self, *args, **kwargs):
         """Initialize a new BaseModel.
@@ -15,22 +149,113 @@ class BaseModel:
             *args (any): Unused.
             **kwargs (dict): Key/value pairs of attributes.
         """
-        tform = "%Y-%m-%dT%H:%M:%S.%f"
-        self.id = str(uuid4())
-        self.created_at = datetime.today()
-        self.updated_at = datetime.today()
-        if len(kwargs) != 0:
-            for k, v in kwargs.items():
-                if k == "created_at" or k == "updated_at":
-                    self.__dict__[k] = datetime.strptime(v, tform)
-                else:
-                    self.__dict__[k] = v
-        else:
+        if COMPACT:
+            object.__setattr__(self, "_BaseModel__extra", None)
+        self.__load(kwargs)
+        if len(kwargs) == 0:
             models.storage.new(self)
 
+    @classmethod
+    def from_records(cls, records):
+        """Return the list of the objects of records, without adding them
+        to storage.
+
+        The objects are the same as built by passing each record as
+        keyword arguments, but no id or timestamp is generated for the
+        record to replace.
+
+        Args:
+            records (iterable): Dictionaries such as returned by to_dict().
+                The class of each object is the model named by the
+                __class__ key of its record, or cls when there is none.
+        """
+        classes = ModelType.classes
+        objs = []
+        for rec in records:
+            name = rec.get("__class__")
+            obj = object.__new__(cls if name is None else classes[name])
+            if COMPACT:
+                object.__setattr__(obj, "_BaseModel__extra", None)
+            obj.__load(rec, "__class__")
+            objs.append(obj)
+        return objs
+
+    def __load(self, rec, skip=None):
+        """Set the attributes of the record rec, generating the id and the
+        timestamps that it lacks.
+
+        Args:
+            rec (dict): Key/value pairs of attributes.
+            skip (str): A key of rec that is not an attribute.
+        """
+        self.__set("id", rec["id"] if "id" in rec else str(uuid4()))
+        for k in TIMESTAMPS:
+            v = rec[k] if k in rec else datetime.today()
+            lazy = LAZY_TIMESTAMPS and type(v) is str
+            if type(v) is not datetime and not lazy:
+                v = datetime.fromisoformat(v)
+            self.__set(k, v)
+        for k, v in rec.items():
+            if k != "id" and k not in TIMESTAMPS and k != skip:
+                self.__set(k, v)
+
+    if COMPACT:
+        def __getattr__(self, name):
+            """Return an attribute missing from the slots: an undeclared
+            attribute, or the default of a declared one."""
+            if name != "_BaseModel__extra":
+                extra = self.__extra
+                if extra is not None and name in extra:
+                    return extra[name]
+                if name in type(self).defaults:
+                    return type(self).defaults[name]
+            raise AttributeError("'{}' object has no attribute '{}'".format(
+                type(self).__name__, name))
+
+    def __setattr__(self, name, value):
+        """Set an attribute and mark the instance as changed in storage."""
+        self.__set(name, value)
+        models.storage.touch(self, name)
+
+    def __set(self, name, value):
+        """Set an attribute without marking the instance as changed."""
+        if not COMPACT:
+            self.__dict__[name] = value
+            return
+        try:
+            object.__setattr__(self, name, value)
+        except (AttributeError, TypeError):
+            if self.__extra is None:
+                object.__setattr__(self, "_BaseModel__extra", {})
+            self.__extra[name] = value
+
+    def attributes(self):
+        """Return the dictionary of the attributes set on the instance.
+
+        Outside compact mode, this is the __dict__ of the instance.
+        """
+        if not COMPACT:
+            return self.__dict__
+        attrs = {}
+        containers = type(self).containers
+        for name in ("id", "created_at", "updated_at", *type(self).defaults):
+            try:
+                if name in TIMESTAMPS:
+                    attrs[name] = vars(BaseModel)[name].raw(self)
+                elif name in containers:
+                    attrs[name] = containers[name].raw(self)
+                else:
+                    attrs[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        if self.__extra is not None:
+            attrs.update(self.__extra)
+        return attrs
+
     def save(self):
-        """Update updated_at with the current datetime."""
+        """Update updated_at with the current datetime and persist it."""
         self.updated_at = datetime.today()
+        models.storage.new(self)
         models.storage.save()
 
     def to_dict(self):
@@ -39,13 +264,24 @@ class BaseModel:
         Includes the key/value pair __class__ representing
         the class name of the object.
         """
-        rdict = self.__dict__.copy()
-        rdict["created_at"] = self.created_at.isoformat()
-        rdict["updated_at"] = self.updated_at.isoformat()
+        rdict = self.attributes().copy()
+        for name in TIMESTAMPS:
+            if type(rdict[name]) is not str:
+                rdict[name] = rdict[name].isoformat()
         rdict["__class__"] = self.__class__.__name__
         return rdict
 
     def __str__(self):
         """Return the print/str representation of the BaseModel instance."""
         clname = self.__class__.__name__
-        return "[{}] ({}) {}".format(clname, self.id, self.__dict__)
+        if LAZY_TIMESTAMPS:
+            # Decode the timestamps so that they print as datetimes.
+            for name in TIMESTAMPS:
+                getattr(self, name, None)
+        return "[{}] ({}) {}".format(clname, self.id, self.attributes())
+
+
+if COMPACT or LAZY_TIMESTAMPS:
+    for _name in TIMESTAMPS:
+        setattr(BaseModel, _name,
+                Timestamp(_name, vars(BaseModel).get(_name)))
@@ -0,0 +1,250 @@
+#!/usr/bin/python3
+"""Defines the binary on-disk format of the FileStorage engine.
+
+A binary file starts with MAGIC, followed by a table of interned strings
+(class and attribute names) and one length-prefixed record per object.
+Timestamps are stored as integer microseconds since the epoch.
+
+This module does not import the models package, so that convert_storage.py
+can load it to convert storage files.
+"""
+import json
+import struct
+from datetime import datetime, timedelta
+
+MAGIC = b"HBNB\x01"
+EPOCH = datetime(1970, 1, 1)
+TIMESTAMPS = ("created_at", "updated_at")
+
+
+class BinaryCodec:
+    """Encodes records to and from binary payloads.
+
+    The payloads refer to class and attribute names by their index in a
+    table of interned strings, which only ever grows, so a payload stays
+    valid for as long as the codec is alive.
+
+    Attributes:
+        strings (list): The interned strings, in index order.
+    """
+
+    def __init__(self):
+        """Initialize a codec with an empty string table."""
+        self.strings = []
+        self.__index = {}
+
+    def intern(self, s):
+        """Return the index of the string s, adding it to the table."""
+        idx = self.__index.get(s)
+        if idx is None:
+            idx = len(self.strings)
+            self.strings.append(s)
+            self.__index[s] = idx
+        return idx
+
+    def encode(self, rec):
+        """Return the payload of the record rec.
+
+        Args:
+            rec (dict): A record with "__class__" and "id" keys, such as
+                returned by to_dict(). Its values may also be datetimes.
+        """
+        parts = [struct.pack("<H", self.intern(rec["__class__"])),
+                 _pack_value(rec["id"])]
+        fields = [k for k in rec if k != "__class__" and k != "id"]
+        parts.append(struct.pack("<H", len(fields)))
+        for k in fields:
+            parts.append(struct.pack("<H", self.intern(k)))
+            parts.append(_pack_value(rec[k]))
+        return b"".join(parts)
+
+    def decode(self, payload):
+        """Return the record of payload, with timestamps as datetimes."""
+        return _unpack_record(payload, self.strings)
+
+    def key(self, payload):
+        """Return the <class name>.id key of payload."""
+        cls_name = self.strings[struct.unpack_from("<H", payload)[0]]
+        return "{}.{}".format(cls_name, _unpack_value(payload, 2)[0])
+
+    def dump(self, f, payloads):
+        """Write the string table and the payloads to the binary file f."""
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(self.strings)))
+        for s in self.strings:
+            data = s.encode("utf-8")
+            f.write(struct.pack("<H", len(data)))
+            f.write(data)
+        for payload in payloads:
+            f.write(struct.pack("<I", len(payload)))
+            f.write(payload)
+
+    def iter_load(self, f, end=None):
+        """Yield the key and payload of each record of the binary file f.
+
+        The strings of the file are interned in this codec; payloads are
+        re-encoded when the file numbers its strings differently.
+
+        Args:
+            f (file): A binary file opened for reading.
+            end (int): The position where the records stop, the end of
+                the file when None.
+        """
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not an HBNB binary file".format(f.name))
+        count = struct.unpack("<I", _read(f, 4))[0]
+        strings = []
+        for i in range(count):
+            size = struct.unpack("<H", _read(f, 2))[0]
+            strings.append(_read(f, size).decode("utf-8"))
+        same = self.__merge(strings)
+        while end is None or f.tell() < end:
+            head = f.read(4)
+            if len(head) == 0:
+                return
+            payload = _read(f, struct.unpack("<I", _read(f, 4, head))[0])
+            if not same:
+                payload = self.encode(_unpack_record(payload, strings))
+            yield self.key(payload), payload
+
+    def iter_buffer(self, buf):
+        """Yield the key and payload of each record of the binary data buf,
+        such as a memory-mapped file.
+
+        The payloads are memoryview slices of buf, so records are only
+        copied when they are decoded.
+        """
+        view = memoryview(buf)
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError("not an HBNB binary file")
+        pos = len(MAGIC)
+        count = struct.unpack_from("<I", view, pos)[0]
+        pos += 4
+        strings = []
+        for i in range(count):
+            size = struct.unpack_from("<H", view, pos)[0]
+            strings.append(str(view[pos + 2:pos + 2 + size], "utf-8"))
+            pos += 2 + size
+        same = self.__merge(strings)
+        while pos < len(view):
+            size = struct.unpack_from("<I", view, pos)[0]
+            if pos + 4 + size > len(view):
+                raise ValueError("truncated HBNB binary file")
+            payload = view[pos + 4:pos + 4 + size]
+            pos += 4 + size
+            if not same:
+                payload = self.encode(_unpack_record(payload, strings))
+            yield self.key(payload), payload
+
+    def __merge(self, strings):
+        """Intern the strings of a file and return True if they keep the
+        same indexes in this codec."""
+        return [self.intern(s) for s in strings] == list(range(len(strings)))
+
+
+def _read(f, size, data=b""):
+    """Read exactly size bytes from f, starting with the bytes in data."""
+    while len(data) < size:
+        chunk = f.read(size - len(data))
+        if len(chunk) == 0:
+            raise ValueError("truncated HBNB binary file")
+        data += chunk
+    return data
+
+
+def _pack_value(v):
+    """Return the tagged binary encoding of the value v."""
+    if v is None:
+        return b"N"
+    if v is True or v is False:
+        return struct.pack("<c?", b"B", v)
+    if type(v) is int and -(1 << 63) <= v < (1 << 63):
+        return struct.pack("<cq", b"I", v)
+    if type(v) is float:
+        return struct.pack("<cd", b"F", v)
+    if type(v) is datetime and v.tzinfo is None:
+        us = (v - EPOCH) // timedelta(microseconds=1)
+        return struct.pack("<cq", b"T", us)
+    if type(v) is str:
+        tag, data = b"S", v.encode("utf-8", "surrogatepass")
+    else:
+        tag, data = b"J", json.dumps(v).encode("utf-8")
+    return tag + struct.pack("<I", len(data)) + data
+
+
+def _unpack_value(payload, pos):
+    """Return the value encoded at pos in payload and the next position."""
+    tag = bytes(payload[pos:pos + 1])
+    pos += 1
+    if tag == b"N":
+        return None, pos
+    if tag == b"B":
+        return struct.unpack_from("<?", payload, pos)[0], pos + 1
+    if tag == b"I":
+        return struct.unpack_from("<q", payload, pos)[0], pos + 8
+    if tag == b"F":
+        return struct.unpack_from("<d", payload, pos)[0], pos + 8
+    if tag == b"T":
+        us = struct.unpack_from("<q", payload, pos)[0]
+        return EPOCH + timedelta(microseconds=us), pos + 8
+    size = struct.unpack_from("<I", payload, pos)[0]
+    data = bytes(payload[pos + 4:pos + 4 + size])
+    if tag == b"S":
+        return data.decode("utf-8", "surrogatepass"), pos + 4 + size
+    if tag == b"J":
+        return json.loads(data), pos + 4 + size
+    raise ValueError("unknown value tag {!r}".format(tag))
+
+
+def _unpack_record(payload, strings):
+    """Return the record of payload, whose names index into strings."""
+    cls_name = strings[struct.unpack_from("<H", payload)[0]]
+    rec = {}
+    rec["id"], pos = _unpack_value(payload, 2)
+    count = struct.unpack_from("<H", payload, pos)[0]
+    pos += 2
+    for i in range(count):
+        name = strings[struct.unpack_from("<H", payload, pos)[0]]
+        rec[name], pos = _unpack_value(payload, pos + 2)
+    rec["__class__"] = cls_name
+    return rec
+
+
+def json_to_binary(src, dst):
+    """Convert the JSON storage file src to the binary file dst.
+
+    The timestamps are stored as integers only when they convert back to
+    the exact same text, so that the conversion is lossless.
+    """
+    codec = BinaryCodec()
+    with open(src) as f:
+        objdict = json.load(f)
+    payloads = []
+    for rec in objdict.values():
+        for k in TIMESTAMPS:
+            v = rec.get(k)
+            if type(v) is str:
+                try:
+                    dt = datetime.fromisoformat(v)
+                except ValueError:
+                    continue
+                if dt.tzinfo is None and dt.isoformat() == v:
+                    rec[k] = dt
+        payloads.append(codec.encode(rec))
+    with open(dst, "wb") as f:
+        codec.dump(f, payloads)
+
+
+def binary_to_json(src, dst):
+    """Convert the binary storage file src to the JSON file dst."""
+    codec = BinaryCodec()
+    objdict = {}
+    with open(src, "rb") as f:
+        for key, payload in codec.iter_load(f):
+            rec = codec.decode(payload)
+            for k, v in rec.items():
+                if type(v) is datetime:
+                    rec[k] = v.isoformat()
+            objdict[key] = rec
+    with open(dst, "w") as f:
+        json.dump(objdict, f)
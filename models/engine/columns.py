@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+"""Defines the columnar store behind the aggregations of FileStorage.
+
+Each numeric attribute is kept in a contiguous array of doubles with one
+row per object, so that aggregations run over flat arrays instead of
+reading the attributes of each object.
+"""
+import bisect
+import math
+from array import array
+from itertools import compress
+
+FUNCTIONS = ("count", "sum", "avg", "min", "max")
+
+
+class ColumnStore:
+    """Keeps numeric attributes of objects in columns.
+
+    Rows are kept dense: removing an object moves the last row into its
+    place.
+
+    Attributes:
+        numbers (dict): The array of each numeric attribute.
+        groups (dict): The array of string codes of each attribute that
+            results can be grouped by.
+        keys (list): The key of the object of each row.
+    """
+
+    def __init__(self, numbers, groups=(), defaults=None):
+        """Initialize an empty store.
+
+        Args:
+            numbers (iterable): The numeric attribute names.
+            groups (iterable): The string attribute names to group by.
+            defaults (dict): The values of the attributes missing from
+                the values given to set(), such as class attributes.
+        """
+        self.numbers = {attr: array("d") for attr in numbers}
+        self.groups = {attr: array("q") for attr in groups}
+        self.keys = []
+        self.__valid = {attr: bytearray() for attr in numbers}
+        self.__rows = {}
+        self.__codes = {}
+        self.__names = []
+        self.__defaults = {} if defaults is None else defaults
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(self.keys)
+
+    def set(self, key, values):
+        """Store the attributes of key found in the dictionary values,
+        adding a row if needed.
+
+        Values that are not numbers are stored as missing.
+        """
+        row = self.__rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            self.__rows[key] = row
+            self.keys.append(key)
+            for col in self.numbers.values():
+                col.append(math.nan)
+            for valid in self.__valid.values():
+                valid.append(0)
+            for col in self.groups.values():
+                col.append(0)
+        defaults = self.__defaults
+        for attr, col in self.numbers.items():
+            v = values.get(attr, defaults.get(attr))
+            ok = type(v) in (int, float) and not math.isnan(v)
+            col[row] = v if ok else math.nan
+            self.__valid[attr][row] = ok
+        for attr, col in self.groups.items():
+            v = values.get(attr, defaults.get(attr))
+            col[row] = self.__code(v if type(v) is str else None)
+
+    def remove(self, key):
+        """Remove the row of key, if present."""
+        row = self.__rows.pop(key, None)
+        if row is None:
+            return
+        last = self.keys.pop()
+        columns = (list(self.numbers.values()) +
+                   list(self.__valid.values()) + list(self.groups.values()))
+        if row != len(self.keys):
+            self.keys[row] = last
+            self.__rows[last] = row
+            for col in columns:
+                col[row] = col[-1]
+        for col in columns:
+            del col[-1]
+
+    def aggregate(self, attr, func, group_by=None):
+        """Return func applied to the values of the column attr, ignoring
+        missing values, or None when there are none.
+
+        Args:
+            attr (str): A numeric attribute name.
+            func (str): One of "count", "sum", "avg", "min" and "max".
+            group_by (str): If given, return a dictionary of the result
+                for each value of this grouping attribute instead.
+
+        Raises:
+            ValueError: If func is not supported.
+        """
+        if func not in FUNCTIONS:
+            raise ValueError("unknown aggregate function {}".format(func))
+        col = self.numbers[attr]
+        valid = self.__valid[attr]
+        if group_by is None:
+            return _reduce(func, compress(col, valid), sum(valid))
+        codes = self.groups[group_by]
+        values = {}
+        for code, v, ok in zip(codes, col, valid):
+            if ok:
+                values.setdefault(code, []).append(v)
+        return {self.__names[code]: _reduce(func, vs, len(vs))
+                for code, vs in values.items()}
+
+    def histogram(self, attr, edges):
+        """Return the number of values of the column attr in each bin
+        between consecutive edges.
+
+        Each bin holds its lower edge, and the last one its upper edge as
+        well; values outside the edges are not counted.
+        """
+        counts = [0] * (len(edges) - 1)
+        last = len(edges) - 1
+        for v in compress(self.numbers[attr], self.__valid[attr]):
+            i = bisect.bisect_right(edges, v) - 1
+            if i == last and v == edges[-1]:
+                i -= 1
+            if 0 <= i < last:
+                counts[i] += 1
+        return counts
+
+    def __code(self, name):
+        """Return the code of the group name, a string or None."""
+        code = self.__codes.get(name)
+        if code is None:
+            code = len(self.__names)
+            self.__codes[name] = code
+            self.__names.append(name)
+        return code
+
+
+def _reduce(func, values, count):
+    """Return func applied to the iterable values, holding count values."""
+    if func == "count":
+        return count
+    if count == 0:
+        return None
+    if func == "sum":
+        return math.fsum(values)
+    if func == "avg":
+        return math.fsum(values) / count
+    if func == "min":
+        return min(values)
+    return max(values)
@@ -0,0 +1,364 @@
+#!/usr/bin/python3
+"""Defines the DBStorage class, which stores objects in SQLite.
+
+Each model class has its own table, with a column for the id, for each
+timestamp and for each attribute declared by the class, and an __extra
+column holding the other attributes as JSON. The timestamps and the
+declared attributes ending in _id, which hold the id of a parent object,
+are indexed.
+"""
+import json
+import math
+import sqlite3
+import weakref
+from datetime import datetime
+from os import getenv
+from models.base_model import BaseModel, ModelType, TIMESTAMPS
+from models.engine.query import OPERATORS, compile_filter, parse_timestamps
+from models.engine.storage import Storage
+from models.user import User
+from models.city import City
+from models.place import Place
+from models.state import State
+from models.amenity import Amenity
+from models.review import Review
+
+
+def _is_column_value(v):
+    """Return True if v is kept in a column rather than in __extra."""
+    if type(v) is int:
+        return -(1 << 63) <= v < 1 << 63
+    return type(v) is str or (type(v) is float and math.isfinite(v))
+
+
+class DBStorage(Storage):
+    """Stores the objects in a SQLite database.
+
+    The objects built or added by this process are kept in an identity
+    map, so that each row has a single object. Changes are written to the
+    database before each query, in a transaction committed by save().
+
+    Attributes:
+        __db_path (str): The file name of the database.
+        __connection (sqlite3.Connection): The connection to the database.
+        __objects (WeakValueDictionary): The identity map of the objects,
+            keyed by <class name>.id.
+        __dirty (dict): The objects added or changed since they were last
+            written, keyed like __objects.
+        __deleted (set): The keys of the objects deleted since the last
+            write.
+        __tables (dict): For each class name, the ordered dict of the
+            columns of its table, and its select, upsert and delete
+            statements. The statements are the same for every call, so
+            sqlite3 reuses them from its cache of prepared statements.
+    """
+    __db_path = getenv("HBNB_DB_PATH", "hbnb.db")
+    __connection = None
+    __objects = weakref.WeakValueDictionary()
+    __dirty = {}
+    __deleted = set()
+    __tables = {}
+
+    def all(self, *, cls_name=None):
+        """Return the stored objects keyed by <class name>.id, in a new
+        dictionary.
+
+        Args:
+            cls_name (str): If given, only return the objects of this
+                class.
+        """
+        objs = {}
+        for name in self.__names(cls_name):
+            objs.update(self.__select(name))
+        return objs
+
+    def count(self, cls_name=None):
+        """Return the number of objects of class cls_name, or of all
+        objects when None."""
+        self.__flush()
+        total = 0
+        for name in self.__names(cls_name):
+            table = self.__table(name)
+            if table is not None:
+                sql = 'SELECT COUNT(*) FROM "{}"'.format(name)
+                total += self.__connect().execute(sql).fetchone()[0]
+        return total
+
+    def get(self, cls_name, obj_id):
+        """Return the object of class cls_name with id obj_id, or None."""
+        key = "{}.{}".format(cls_name, obj_id)
+        obj = DBStorage.__objects.get(key)
+        if obj is None:
+            obj = self.__select(cls_name, '"id" = ?', (obj_id,)).get(key)
+        return obj
+
+    def where(self, cls_name, conditions):
+        """Return the objects of class cls_name matching every condition,
+        in a new dictionary. Timestamps may be compared with ISO format
+        strings.
+
+        The conditions on columns select the rows in SQL, and every
+        condition is then checked on the objects of these rows, so that
+        values of different types compare as with FileStorage.
+
+        Args:
+            cls_name (str): The class name.
+            conditions (list): (attribute, operator, value) tuples, such
+                as returned by query.parse_conditions().
+        """
+        table = self.__table(cls_name)
+        if table is None:
+            return {}
+        conditions = parse_timestamps(conditions)
+        terms = []
+        params = []
+        for attr, op, value in conditions:
+            if attr in TIMESTAMPS and type(value) is datetime:
+                value = value.isoformat()
+            if (attr not in table[0] or op not in OPERATORS or
+                    not _is_column_value(value)):
+                continue
+            term = '"{}" {} ?'.format(attr, op)
+            if attr != "id":
+                term = '({} OR "{}" IS NULL)'.format(term, attr)
+            terms.append(term)
+            params.append(value)
+        match = compile_filter(conditions)
+        objs = self.__select(cls_name, " AND ".join(terms), params)
+        return {key: obj for key, obj in objs.items() if match(obj)}
+
+    def children(self, cls_name, attr, parent_id):
+        """Return the objects of class cls_name whose attribute attr holds
+        parent_id, such as the cities of a state, in a new dictionary.
+
+        Raises:
+            ValueError: If attr is not an indexed parent id of cls_name.
+        """
+        cls = ModelType.classes.get(cls_name)
+        if cls is None or not attr.endswith("_id") or attr not in cls.defaults:
+            raise ValueError("{}.{} is not indexed".format(cls_name, attr))
+        return self.where(cls_name, [(attr, "==", parent_id)])
+
+    def between(self, attr, start=None, end=None, *, cls_name=None):
+        """Return the objects whose timestamp attr is at or after start and
+        before end, in a new dictionary ordered by that timestamp.
+
+        Args:
+            attr (str): "created_at" or "updated_at".
+            start (datetime): The first timestamp, unbounded when None.
+            end (datetime): The timestamp after the last, unbounded when
+                None.
+            cls_name (str): If given, only return the objects of this
+                class.
+        """
+        conditions = []
+        if start is not None:
+            conditions.append((attr, ">=", start))
+        if end is not None:
+            conditions.append((attr, "<", end))
+        hits = []
+        for name in self.__names(cls_name):
+            for key, obj in self.where(name, conditions).items():
+                ts = getattr(obj, attr, None)
+                if type(ts) is datetime:
+                    hits.append((ts, key, obj))
+        hits.sort(key=lambda hit: hit[0])
+        return {key: obj for ts, key, obj in hits}
+
+    def new(self, obj):
+        """Add the object obj, written to the database by the next query
+        or save."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        DBStorage.__objects[key] = obj
+        DBStorage.__dirty[key] = obj
+        DBStorage.__deleted.discard(key)
+
+    def touch(self, obj, name):
+        """Mark a stored object as changed."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        if DBStorage.__objects.get(key) is obj:
+            DBStorage.__dirty[key] = obj
+
+    def delete(self, obj):
+        """Remove the object obj from the database if it is stored there."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        DBStorage.__objects.pop(key, None)
+        DBStorage.__dirty.pop(key, None)
+        DBStorage.__deleted.add(key)
+
+    def save(self):
+        """Write the pending changes and commit them."""
+        self.__flush()
+        self.__connect().commit()
+
+    def reload(self, *, classes=None):
+        """Open the database, creating the tables of the model classes.
+
+        The changes that were not saved and the objects built so far are
+        forgotten: objects are read again from the database when queried.
+
+        Args:
+            classes (iterable): Unused, as the objects of every class are
+                read when queried.
+        """
+        if DBStorage.__connection is not None:
+            DBStorage.__connection.close()
+            DBStorage.__connection = None
+        DBStorage.__objects = weakref.WeakValueDictionary()
+        DBStorage.__dirty = {}
+        DBStorage.__deleted = set()
+        DBStorage.__tables = {}
+        for name in list(ModelType.classes):
+            self.__table(name)
+        self.__connect().commit()
+
+    def compact(self, background=False):
+        """Save the pending changes and rebuild the database file without
+        the space left by deleted rows.
+
+        Args:
+            background (bool): Unused, as the database is rebuilt at once.
+
+        Returns:
+            A dict with the "bytes" reclaimed, and 0 "records".
+        """
+        self.save()
+        before = self.__size()
+        self.__connect().execute("VACUUM")
+        return {"bytes": before - self.__size(), "records": 0}
+
+    def __connect(self):
+        """Return the connection to the database, opening it if needed."""
+        if DBStorage.__connection is None:
+            DBStorage.__connection = sqlite3.connect(DBStorage.__db_path)
+        return DBStorage.__connection
+
+    def __size(self):
+        """Return the size in bytes of the database."""
+        conn = self.__connect()
+        return (conn.execute("PRAGMA page_count").fetchone()[0] *
+                conn.execute("PRAGMA page_size").fetchone()[0])
+
+    def __names(self, cls_name):
+        """Return the class names to read: cls_name, or all of them when
+        None."""
+        return list(ModelType.classes) if cls_name is None else [cls_name]
+
+    def __table(self, cls_name):
+        """Return the entry of __tables of the class cls_name, creating or
+        extending its table as needed, or None if it is not a model."""
+        table = DBStorage.__tables.get(cls_name)
+        if table is not None:
+            return table
+        cls = ModelType.classes.get(cls_name)
+        if cls is None:
+            return None
+        columns = dict.fromkeys(("id",) + TIMESTAMPS + tuple(cls.defaults))
+        conn = self.__connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS "{}" ("id" PRIMARY KEY, '
+                     '"__extra")'.format(cls_name))
+        found = {row[1] for row in
+                 conn.execute('PRAGMA table_info("{}")'.format(cls_name))}
+        for col in columns:
+            if col not in found:
+                conn.execute('ALTER TABLE "{}" ADD COLUMN "{}"'.format(
+                    cls_name, col))
+        for col in columns:
+            if col in TIMESTAMPS or col.endswith("_id") and col != "id":
+                conn.execute('CREATE INDEX IF NOT EXISTS "{0}_{1}" ON "{0}" '
+                             '("{1}")'.format(cls_name, col))
+        names = ", ".join('"{}"'.format(c) for c in (*columns, "__extra"))
+        table = (
+            columns,
+            'SELECT {} FROM "{}"'.format(names, cls_name),
+            'INSERT OR REPLACE INTO "{}" ({}) VALUES ({})'.format(
+                cls_name, names, ", ".join("?" * (len(columns) + 1))),
+            'DELETE FROM "{}" WHERE "id" = ?'.format(cls_name)
+        )
+        DBStorage.__tables[cls_name] = table
+        return table
+
+    def __select(self, cls_name, where="", params=()):
+        """Return the objects of the rows of the table of cls_name matching
+        the SQL condition where, reusing the objects already built.
+
+        Args:
+            cls_name (str): The class name.
+            where (str): An SQL condition, or "" to read every row.
+            params (iterable): The parameters of where.
+        """
+        table = self.__table(cls_name)
+        if table is None:
+            return {}
+        self.__flush()
+        sql = table[1] if where == "" else table[1] + " WHERE " + where
+        found = []
+        missing = []
+        for row in self.__connect().execute(sql, params):
+            key = "{}.{}".format(cls_name, row[0])
+            obj = DBStorage.__objects.get(key)
+            if obj is None:
+                missing.append(self.__record(cls_name, table[0], row))
+            found.append((key, obj))
+        built = iter(BaseModel.from_records(missing))
+        objs = {}
+        for key, obj in found:
+            if obj is None:
+                obj = next(built)
+                DBStorage.__objects[key] = obj
+            objs[key] = obj
+        return objs
+
+    def __record(self, cls_name, columns, row):
+        """Return the record of the row of the table of cls_name, as
+        returned by to_dict()."""
+        rec = {"__class__": cls_name}
+        for col, v in zip(columns, row):
+            if v is not None:
+                rec[col] = v
+        if row[-1] is not None:
+            rec.update(json.loads(row[-1]))
+        return rec
+
+    def __row(self, columns, obj):
+        """Return the row of the object obj for a table of columns."""
+        attrs = obj.attributes()
+        row = []
+        extra = {}
+        for col in columns:
+            v = attrs.get(col)
+            if col in TIMESTAMPS and type(v) is datetime:
+                v = v.isoformat()
+            if v is None or _is_column_value(v):
+                row.append(v)
+            else:
+                row.append(None)
+                extra[col] = v
+            if v is None and col in attrs:
+                extra[col] = None
+        for k, v in attrs.items():
+            if k not in columns and k != "__class__":
+                extra[k] = v
+        row.append(json.dumps(extra) if len(extra) != 0 else None)
+        return row
+
+    def __flush(self):
+        """Write the pending changes to the database, in the transaction
+        that save() commits."""
+        if len(DBStorage.__dirty) == 0 and len(DBStorage.__deleted) == 0:
+            return
+        conn = self.__connect()
+        for key in DBStorage.__deleted:
+            cls_name, obj_id = key.split(".", 1)
+            table = self.__table(cls_name)
+            if table is not None:
+                conn.execute(table[3], (obj_id,))
+        groups = {}
+        for key, obj in DBStorage.__dirty.items():
+            groups.setdefault(key.partition(".")[0], []).append(obj)
+        for cls_name, objs in groups.items():
+            table = self.__table(cls_name)
+            conn.executemany(table[2], [self.__row(table[0], obj)
+                                        for obj in objs])
+        DBStorage.__dirty.clear()
+        DBStorage.__deleted.clear()
@@ -1,7 +1,31 @@
 #!/usr/bin/python3
 """Defines the FileStorage class for handling data storage."""
+import array
+import bisect
+import contextlib
+import fcntl
+import glob
+import io
+import itertools
 import json
-from models.base_model import BaseModel
+import math
+import mmap
+import os
+import re
+import tempfile
+import threading
+import weakref
+import zlib
+from datetime import datetime
+from os import getenv
+from json.decoder import scanstring
+from models.engine.binary_format import BinaryCodec, TIMESTAMPS
+from models.engine.columns import ColumnStore
+from models.engine.query import compile_filter, parse_timestamps
+from models.engine.storage import Storage, EARTH_RADIUS, NUMBERS, TEXTS
+from models.engine.storage import STEMMED, _haversine
+from models.engine.text_index import InvertedIndex
+from models.base_model import BaseModel, ModelType
 from models.user import User
 from models.city import City
 from models.place import Place
@@ -9,43 +33,1711 @@ from models.state import State
 from models.amenity import Amenity
 from models.review import Review
 
+TRAILER = re.compile(rb"\n#crc32:([0-9a-f]{8})\n")
+TRAILER_SIZE = 17
+UMASK = os.umask(0)
+os.umask(UMASK)
 
-class FileStorage:
+
+def iter_file_entries(f, size=1 << 16):
+    """Yield the members of the JSON object read from the file f.
+
+    The file is read size characters at a time, so that at most one
+    chunk and one member are held in memory.
+
+    Args:
+        f (file): A text file opened for reading.
+        size (int): The number of characters read at a time.
+
+    Yields:
+        A (key, text) tuple per member, where text is the JSON text of
+        its value.
+    """
+    for key, buf, start, end, base in _iter_chunked(f.read, size):
+        yield key, buf[start:end]
+
+
+def iter_mmap_offsets(mm, size=1 << 16):
+    """Yield the position of the members of the JSON object mapped by mm.
+
+    The mapping is decoded size bytes at a time, and must only hold
+    ASCII text, as written by json.dump(), so that character and byte
+    positions agree.
+
+    Args:
+        mm (mmap): The memory-mapped JSON file.
+        size (int): The number of bytes decoded at a time.
+
+    Yields:
+        A (key, start, end) tuple per member, where mm[start:end] is the
+        JSON text of its value.
+    """
+    mm.seek(0)
+    for key, buf, start, end, base in _iter_chunked(
+            lambda n: mm.read(n).decode("ascii"), size):
+        yield key, base + start, base + end
+
+
+def iter_indexed_entries(read, starts, size=1 << 16):
+    """Yield the members of the ASCII JSON object returned by read, found
+    at the positions saved when it was written.
+
+    The object is read size bytes at a time, or a member at a time for
+    larger members.
+
+    Args:
+        read (callable): Returns the next bytes of the object, at most as
+            many as its argument.
+        starts (array): The position of each member, followed by the
+            size of the object plus one, as returned by member_starts().
+        size (int): The number of bytes read at a time.
+
+    Yields:
+        A (key, text) tuple per member, where text is the JSON text of
+        its value.
+    """
+    buf = b""
+    base = 0
+    for i in range(len(starts) - 1):
+        start = starts[i]
+        end = starts[i + 1] - 2
+        if end > base + len(buf):
+            cut = min(start - base, len(buf))
+            buf = buf[cut:] + read(max(size, end - base - len(buf)))
+            base += cut
+        key, value = _indexed_member(buf, start - base, end - base)
+        yield key, buf[value:end - base].decode("ascii")
+
+
+def iter_mmap_indexed(mm, starts):
+    """Yield the position of the members of the ASCII JSON object mapped
+    by mm, found at the positions saved when it was written.
+
+    Args:
+        mm (mmap): The memory-mapped JSON file.
+        starts (array): The position of each member, as taken by
+            iter_indexed_entries().
+
+    Yields:
+        A (key, start, end) tuple per member, where mm[start:end] is the
+        JSON text of its value.
+    """
+    for i in range(len(starts) - 1):
+        end = starts[i + 1] - 2
+        key, value = _indexed_member(mm, starts[i], end)
+        yield key, value, end
+
+
+def member_starts(parts):
+    """Return the position of each member of the JSON object written as
+    "{" + ", ".join(parts) + "}", followed by its size plus one.
+
+    Args:
+        parts (iterable): The "key": value text of each member.
+    """
+    return array.array("q", itertools.accumulate(
+        (len(part) + 2 for part in parts), initial=1))
+
+
+def _indexed_member(buf, start, end):
+    """Return the key of the "key": value member written at buf[start:end]
+    and the position of its value."""
+    close = buf.find(b'"', start + 1, end)
+    if buf.find(b"\\", start + 1, close) == -1:
+        return buf[start + 1:close].decode("ascii"), close + 3
+    key, close = scanstring(buf[start:end].decode("ascii"), 1)
+    return key, start + close + 2
+
+
+def _iter_chunked(read, size):
+    """Scan the JSON object returned size characters at a time by read.
+
+    Yields:
+        A (key, buf, start, end, base) tuple per member, where
+        buf[start:end] is the JSON text of its value and base is the
+        position of buf in the whole text.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    base = 0
+    idx = None
+    eof = False
+    while True:
+        try:
+            if idx is None:
+                idx = _open_object(buf)
+                if idx is None:
+                    return
+            key, start, end, nxt = _scan_member(buf, idx, decoder)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = read(size)
+            eof = len(chunk) == 0
+            if idx is not None:
+                buf, base, idx = buf[idx:], base + idx, 0
+            buf += chunk
+            continue
+        yield key, buf, start, end, base
+        if nxt is None:
+            return
+        idx = nxt
+
+
+def _open_object(text):
+    """Return the index of the first member of the JSON object text,
+    or None if the object is empty."""
+    idx = _skip_ws(text, 0)
+    if text[idx:idx + 1] != "{":
+        raise json.JSONDecodeError("Expecting '{'", text, idx)
+    idx = _skip_ws(text, idx + 1)
+    if text[idx:idx + 1] == "}":
+        return None
+    if idx == len(text):
+        raise json.JSONDecodeError("Expecting property name", text, idx)
+    return idx
+
+
+def _scan_member(text, idx, decoder):
+    """Scan the object member starting at idx in text.
+
+    Returns:
+        A (key, start, end, next) tuple, where text[start:end] is the
+        JSON text of the value and next is the index of the following
+        member, or None after the last one.
+    """
+    idx = _skip_ws(text, idx)
+    if text[idx:idx + 1] != '"':
+        raise json.JSONDecodeError("Expecting property name", text, idx)
+    key, idx = scanstring(text, idx + 1)
+    idx = _skip_ws(text, idx)
+    if text[idx:idx + 1] != ":":
+        raise json.JSONDecodeError("Expecting ':'", text, idx)
+    start = _skip_ws(text, idx + 1)
+    end = decoder.raw_decode(text, start)[1]
+    idx = _skip_ws(text, end)
+    if text[idx:idx + 1] == "}":
+        return key, start, end, None
+    if text[idx:idx + 1] != ",":
+        raise json.JSONDecodeError("Expecting ','", text, idx)
+    return key, start, end, idx + 1
+
+
+def _skip_ws(text, idx):
+    """Return the index of the first non-whitespace character from idx."""
+    while idx < len(text) and text[idx] in " \t\n\r":
+        idx += 1
+    return idx
+
+
+class _Crc32Writer:
+    """Wraps a binary file to compute the CRC-32 of the bytes written."""
+
+    def __init__(self, f):
+        """Initialize the writer of the binary file f."""
+        self.f = f
+        self.crc = 0
+
+    def write(self, data):
+        """Write data to the file and add it to the checksum."""
+        self.crc = zlib.crc32(data, self.crc)
+        return self.f.write(data)
+
+
+class FileStorage(Storage):
     """Representation of an abstracted storage engine.
 
     Attributes:
-        __file_path (str): The file name used to save objects.
+        __file_path (str): The file name used to save objects. Objects
+            are saved in the binary format when it ends with ".bin". In
+            sharded mode, each class is saved to its own file named
+            after it, such as file.User.json.
+        __log_path (str): The file name of the append-only journal.
         __objects (dict): A dictionary storing instantiated objects.
+        __sharded (bool): Whether objects are saved to one file per class.
+        __lazy (bool): Whether reload() defers building the objects
+            until they are first accessed.
+        __raw (dict): The encoded records loaded but not yet built in
+            lazy mode, keyed like __objects.
+        __batch_size (int): The number of records reload() builds at
+            once.
+        __cache_size (int): The number of objects kept built, 0 for no
+            limit. Beyond it, the least recently used objects without
+            unsaved changes are evicted back to their encoded records,
+            which implies the lazy mode. These records are kept in
+            memory as text, except in mmap mode for the records read at
+            startup, so the limit alone does not bound the memory used.
+        __evicted (WeakValueDictionary): The evicted objects still
+            referenced elsewhere, keyed like __objects, which get() and
+            touch() store again instead of building new ones.
+        __sources (dict): When __cache_size is set, the encoded record
+            each unchanged object was built from, reused on eviction.
+        __hits (int): The number of get() calls that found the object
+            built.
+        __misses (int): The number of get() calls that built the object.
+        __evictions (int): The number of objects evicted.
+        __mmap (bool): Whether reload() maps the snapshot in memory and
+            only indexes the position of each record, which implies the
+            lazy mode.
+        __journaled (bool): Whether save() appends to the journal
+            instead of rewriting __file_path.
+        __durable (bool): Whether writes are flushed to disk with fsync
+            before save() returns.
+        __checksum (bool): Whether snapshots end with a CRC-32 trailer,
+            which reload() then checks.
+        __locking (bool): Whether reload() holds a shared lock, and save()
+            and compactions an exclusive one, on __file_path + ".lock",
+            so that processes sharing the files do not interleave.
+        __merging (bool): Whether save() first applies the records saved
+            by other processes since the snapshot was last read, so that
+            only the local changes override them. Implies __locking.
+        __snapshot_seen (list): The __snapshot_stamp() of the snapshot as
+            last read or written.
+        __dirty (dict): Keys of objects changed since the last save,
+            mapped to the set of changed attribute names or to None
+            when the whole object must be written.
+        __deleted (set): Keys of objects deleted since the last save.
+        __created (set): Keys of objects added since the last save that
+            were not stored before, which a merge keeps even though the
+            snapshot lacks them.
+        __fragments (dict): Cached fragment of each saved object, keyed
+            like __objects, as (object, fragment) pairs.
+        __codec (BinaryCodec): The string table of the binary format.
+        __compact_bytes (int): Journal size in bytes that triggers a
+            background compaction, 0 to disable.
+        __compact_ratio (float): Journal to snapshot size ratio that
+            triggers a background compaction, 0 to disable.
+        __compaction (dict): Bytes and records reclaimed by the last
+            compaction, or None.
+        __by_class (dict): The keys of the objects in __objects and of
+            the records in __raw, grouped by class name, with the keys of
+            each class stored in insertion order as the keys of a dict.
+        __indexed (tuple): The __objects and __raw dictionaries that
+            __by_class was built from.
+        __relations (dict): The attributes of each class that hold the
+            id of a parent object.
+        __children (dict): For each (class name, attribute) relation,
+            the keys of the objects grouped by parent id.
+        __parents (dict): For each relation, the parent id of each key.
+        __timeline (dict): For created_at and updated_at, the sorted
+            timestamps of the objects and their keys in the same order,
+            as a pair of lists.
+        __stamps (dict): For created_at and updated_at, the timestamp
+            indexed for each key.
+        __cell_size (float): The size in degrees of the cells of __grid.
+        __grid (dict): The keys of the places with coordinates grouped by
+            (latitude, longitude) cell, mapped to their coordinates.
+        __cells (dict): The cell of __grid of each place key.
+        __numbers (tuple): The numeric attributes of Place kept in
+            __columns.
+        __columns (ColumnStore): The numeric attributes of the places,
+            grouped by city_id or user_id.
+        __secondary (dict): For each of the "relations", "timeline",
+            "grid" and "columns" indexes built, the __objects and __raw
+            dictionaries it was built from. Each index is only built
+            when first queried.
+        __texts (dict): The attributes of each class that are searched.
+        __stemmed (bool): Whether searched words are stemmed.
+        __search (InvertedIndex): The full-text index of the objects.
+        __searched (tuple): The __objects and __raw dictionaries that
+            __search was built from, or None until first searched.
     """
-    __file_path = "file.json"
+    __file_path = getenv("HBNB_FILE_PATH", "file.json")
+    __log_path = __file_path + ".log"
     __objects = {}
+    __sharded = getenv("HBNB_FILE_SHARDED") == "1"
+    __lazy = getenv("HBNB_FILE_LAZY") == "1"
+    __raw = {}
+    __batch_size = 1000
+    __cache_size = int(getenv("HBNB_FILE_CACHE_SIZE", 0))
+    __evicted = weakref.WeakValueDictionary()
+    __sources = {}
+    __hits = 0
+    __misses = 0
+    __evictions = 0
+    __mmap = getenv("HBNB_FILE_MMAP") == "1"
+    __journaled = getenv("HBNB_FILE_JOURNAL") == "1"
+    __durable = getenv("HBNB_FILE_DURABLE") == "1"
+    __checksum = getenv("HBNB_FILE_CHECKSUM") == "1"
+    __locking = getenv("HBNB_FILE_LOCK") == "1"
+    __merging = getenv("HBNB_FILE_MERGE") == "1"
+    __snapshot_seen = None
+    __dirty = {}
+    __deleted = set()
+    __created = set()
+    __fragments = {}
+    __codec = BinaryCodec()
+    __compact_bytes = int(getenv("HBNB_FILE_COMPACT_BYTES", 1 << 20))
+    __compact_ratio = float(getenv("HBNB_FILE_COMPACT_RATIO", 2.0))
+    __compaction = None
+    __compact_lock = threading.Lock()
+    __compactor = None
+    __by_class = {}
+    __indexed = None
+    __relations = {
+        "City": ("state_id",),
+        "Place": ("city_id", "user_id"),
+        "Review": ("place_id", "user_id")
+    }
+    __children = {}
+    __parents = {}
+    __timeline = {}
+    __stamps = {}
+    __cell_size = 0.1
+    __grid = {}
+    __cells = {}
+    __numbers = NUMBERS
+    __columns = None
+    __secondary = {}
+    __texts = TEXTS
+    __stemmed = STEMMED
+    __search = None
+    __searched = None
+
+    def all(self, *, cls_name=None):
+        """Return all objects stored in the dictionary __objects.
+
+        Args:
+            cls_name (str): If given, only return the objects of this
+                class, in a new dictionary.
 
-    def all(self):
-        """Return all objects stored in the dictionary __objects."""
+        When the cache is bounded, the objects are returned in a new
+        dictionary, as they do not all stay in __objects.
+        """
+        if cls_name is not None:
+            objs = {}
+            for key in list(self.__class_index().get(cls_name, ())):
+                objs[key] = self.get(*key.split(".", 1))
+            return objs
+        if FileStorage.__cache_size > 0:
+            keys = list(itertools.chain(FileStorage.__objects,
+                                        FileStorage.__raw))
+            return {key: self.get(*key.split(".", 1)) for key in keys}
+        if len(FileStorage.__raw) != 0:
+            for key in list(FileStorage.__raw):
+                self.__materialize(key)
         return FileStorage.__objects
 
+    def count(self, cls_name=None):
+        """Return the number of objects of class cls_name, or of all
+        objects when None, without building the lazily loaded ones."""
+        if cls_name is None:
+            return len(FileStorage.__objects) + len(FileStorage.__raw)
+        return len(self.__class_index().get(cls_name, ()))
+
+    def children(self, cls_name, attr, parent_id):
+        """Return the objects of class cls_name whose attribute attr holds
+        parent_id, such as the cities of a state, in a new dictionary.
+
+        Raises:
+            ValueError: If attr is not a relation of cls_name.
+        """
+        if attr not in FileStorage.__relations.get(cls_name, ()):
+            raise ValueError("{}.{} is not indexed".format(cls_name, attr))
+        self.__secondary_index("relations")
+        keys = FileStorage.__children[cls_name, attr].get(parent_id, ())
+        return {key: self.get(*key.split(".", 1)) for key in list(keys)}
+
+    def between(self, attr, start=None, end=None, *, cls_name=None):
+        """Return the objects whose timestamp attr is at or after start and
+        before end, in a new dictionary ordered by that timestamp.
+
+        Args:
+            attr (str): "created_at" or "updated_at".
+            start (datetime): The first timestamp, unbounded when None.
+            end (datetime): The timestamp after the last, unbounded when
+                None.
+            cls_name (str): If given, only return the objects of this
+                class.
+        """
+        keys = self.__time_range(attr, start, True, end, False)
+        if cls_name is not None:
+            keys = [k for k in keys if k.partition(".")[0] == cls_name]
+        return {key: self.get(*key.split(".", 1)) for key in keys}
+
+    def near(self, lat, lon, radius):
+        """Return the places within radius kilometers of the coordinates
+        lat, lon, nearest first, in a new dictionary."""
+        self.__secondary_index("grid")
+        dlat = math.degrees(radius / EARTH_RADIUS)
+        south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        edge = math.cos(math.radians(max(abs(south), abs(north))))
+        if edge * math.pi * EARTH_RADIUS <= radius:
+            west, east = -180.0, 180.0
+        else:
+            dlon = math.degrees(radius / (EARTH_RADIUS * edge))
+            west = (lon - dlon + 180.0) % 360.0 - 180.0
+            east = (lon + dlon + 180.0) % 360.0 - 180.0
+        hits = []
+        for key, plat, plon in self.__grid_scan(south, west, north, east):
+            dist = _haversine(lat, lon, plat, plon)
+            if dist <= radius:
+                hits.append((dist, key))
+        hits.sort()
+        return {key: self.get(*key.split(".", 1)) for dist, key in hits}
+
+    def within(self, south, west, north, east):
+        """Return the places inside a bounding box, in a new dictionary.
+
+        The box crosses the antimeridian when west is greater than east.
+        """
+        self.__secondary_index("grid")
+        return {key: self.get(*key.split(".", 1)) for key, lat, lon in
+                self.__grid_scan(south, west, north, east)}
+
+    def search(self, query, cls_name=None):
+        """Return the places and reviews whose name, description or text
+        hold words of query, best match first, in a new dictionary.
+
+        The index is read from the file saved along the snapshot when it
+        still matches it, and built from the objects otherwise.
+
+        Args:
+            query (str): The words to search.
+            cls_name (str): If given, only return the objects of this
+                class.
+        """
+        objs = {}
+        for score, key in self.__search_index().search(query):
+            if cls_name is None or key.partition(".")[0] == cls_name:
+                obj = self.get(*key.split(".", 1))
+                if obj is not None:
+                    objs[key] = obj
+        return objs
+
+    def aggregate(self, attr, func="avg", group_by=None):
+        """Return an aggregate of a numeric attribute of the places, read
+        from the columns of __columns.
+
+        Args:
+            attr (str): One of number_rooms, number_bathrooms, max_guest,
+                price_by_night, latitude and longitude.
+            func (str): One of "count", "sum", "avg", "min" and "max".
+            group_by (str): "city_id" or "user_id" to return a dictionary
+                of the aggregate of each city or user.
+
+        Raises:
+            ValueError: If attr, func or group_by is not supported.
+        """
+        self.__check_column(attr)
+        if group_by is not None and group_by not in ("city_id", "user_id"):
+            raise ValueError("cannot group places by {}".format(group_by))
+        self.__secondary_index("columns")
+        return FileStorage.__columns.aggregate(attr, func, group_by)
+
+    def histogram(self, attr, edges):
+        """Return the number of places whose numeric attribute attr falls
+        in each bin between consecutive edges, the last bin including its
+        upper edge.
+
+        Raises:
+            ValueError: If attr is not supported.
+        """
+        self.__check_column(attr)
+        self.__secondary_index("columns")
+        return FileStorage.__columns.histogram(attr, edges)
+
+    def where(self, cls_name, conditions):
+        """Return the objects of class cls_name matching every condition,
+        in a new dictionary.
+
+        An equality on the id or on a parent id, or else a range of
+        created_at or updated_at, is answered from the indexes; the other
+        conditions are checked on those candidates only, or on every
+        object of the class otherwise. Timestamps may be compared with
+        ISO format strings.
+
+        Args:
+            cls_name (str): The class name.
+            conditions (list): (attribute, operator, value) tuples, such
+                as returned by query.parse_conditions().
+        """
+        objs = None
+        rest = []
+        relations = FileStorage.__relations.get(cls_name, ())
+        for attr, op, value in parse_timestamps(conditions):
+            if objs is None and op == "==" and attr == "id":
+                key = "{}.{}".format(cls_name, value)
+                obj = self.get(cls_name, value)
+                objs = {} if obj is None else {key: obj}
+            elif (objs is None and op == "==" and attr in relations and
+                    type(value) is str):
+                objs = self.children(cls_name, attr, value)
+            else:
+                rest.append((attr, op, value))
+        if objs is None:
+            objs = self.__plan_time_range(cls_name, rest)
+        if objs is None:
+            objs = self.all(cls_name=cls_name)
+        match = compile_filter(rest)
+        return {key: obj for key, obj in objs.items() if match(obj)}
+
+    def get(self, cls_name, obj_id):
+        """Return the object of class cls_name with id obj_id, or None."""
+        key = "{}.{}".format(cls_name, obj_id)
+        obj = FileStorage.__objects.get(key)
+        if obj is not None:
+            FileStorage.__hits += 1
+            if FileStorage.__cache_size > 0:
+                # Move the key last, __objects being kept in LRU order.
+                FileStorage.__objects[key] = FileStorage.__objects.pop(key)
+        elif key in FileStorage.__raw:
+            obj = FileStorage.__evicted.get(key)
+            if obj is not None and self.__readmit(key, obj):
+                FileStorage.__hits += 1
+            else:
+                FileStorage.__misses += 1
+                obj = self.__materialize(key)
+        return obj
+
+    def cache_stats(self):
+        """Return the "hits", "misses" and "evictions" of get(), with the
+        "size" and "limit" of the cache, 0 when unbounded."""
+        return {"hits": FileStorage.__hits, "misses": FileStorage.__misses,
+                "evictions": FileStorage.__evictions,
+                "size": len(FileStorage.__objects),
+                "limit": FileStorage.__cache_size}
+
     def new(self, obj):
         """Add an object to __objects using <obj_class_name>.id as the key."""
         ocname = obj.__class__.__name__
-        FileStorage.__objects["{}.{}".format(ocname, obj.id)] = obj
+        key = "{}.{}".format(ocname, obj.id)
+        if FileStorage.__objects.get(key) is obj:
+            return
+        if key not in FileStorage.__objects and key not in FileStorage.__raw:
+            FileStorage.__created.add(key)
+        FileStorage.__objects[key] = obj
+        FileStorage.__raw.pop(key, None)
+        FileStorage.__sources.pop(key, None)
+        self.__index(key)
+        built = self.__secondary_current()
+        if built:
+            self.__reindex(key, obj.attributes(), None, built)
+        if self.__search_current():
+            self.__index_text(key, obj.attributes())
+        FileStorage.__dirty[key] = None
+        FileStorage.__deleted.discard(key)
+        self.__shrink()
+
+    def touch(self, obj, name):
+        """Mark the attribute name of a stored object as changed."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        if (FileStorage.__objects.get(key) is not obj and
+                not self.__readmit(key, obj)):
+            return
+        FileStorage.__sources.pop(key, None)
+        fields = FileStorage.__dirty.get(key, set())
+        if fields is not None:
+            fields.add(name)
+            FileStorage.__dirty[key] = fields
+        if (name in TIMESTAMPS or name in FileStorage.__numbers or
+                name in FileStorage.__relations.get(
+                    obj.__class__.__name__, ())):
+            built = self.__secondary_current()
+            if built:
+                self.__reindex(key, obj.attributes(), (name,), built)
+        if (name in FileStorage.__texts.get(obj.__class__.__name__, ()) and
+                self.__search_current()):
+            self.__index_text(key, obj.attributes())
+
+    def delete(self, obj):
+        """Remove an object from __objects if it is stored there."""
+        key = "{}.{}".format(obj.__class__.__name__, obj.id)
+        self.__readmit(key, obj)
+        if FileStorage.__objects.pop(key, None) is not None:
+            FileStorage.__sources.pop(key, None)
+            keys = self.__class_index().get(obj.__class__.__name__, {})
+            keys.pop(key, None)
+            built = self.__secondary_current()
+            if built:
+                self.__reindex(key, {}, None, built)
+            if self.__search_current():
+                FileStorage.__search.remove(key)
+            FileStorage.__dirty.pop(key, None)
+            FileStorage.__deleted.add(key)
 
     def save(self):
         """Serialize the objects in __objects to the JSON file
-        specified by __file_path."""
+        specified by __file_path, or append the pending operations
+        to the journal when journaling is enabled.
+
+        In sharded mode, only the files of the classes with changed or
+        deleted objects are rewritten. In merge mode, the snapshot is
+        first read again if another process rewrote it.
+        """
+        if FileStorage.__journaled:
+            with self.__locked(fcntl.LOCK_EX):
+                self.__append_journal()
+            self.__shrink()
+            if self.__needs_compaction():
+                self.compact(background=True)
+            return
         odict = FileStorage.__objects
-        objdict = {obj: odict[obj].to_dict() for obj in odict.keys()}
-        with open(FileStorage.__file_path, "w") as f:
-            json.dump(objdict, f)
+        raw = FileStorage.__raw
+        with self.__locked(fcntl.LOCK_EX), FileStorage.__compact_lock:
+            if (FileStorage.__merging and
+                    self.__snapshot_stamp() != FileStorage.__snapshot_seen):
+                self.__merge(None if not FileStorage.__sharded else {
+                    k.partition(".")[0] for k in
+                    itertools.chain(FileStorage.__dirty,
+                                    FileStorage.__deleted)})
+            if FileStorage.__sharded:
+                if self.__journal_exists():
+                    names = set(self.__shard_names())
+                    names.update(k.partition(".")[0] for k in odict)
+                    names.update(k.partition(".")[0] for k in raw)
+                else:
+                    names = {k.partition(".")[0] for k in
+                             list(FileStorage.__dirty) +
+                             list(FileStorage.__deleted)}
+                groups = self.__group(odict, names)
+                raws = self.__group(raw, names)
+                for name in names:
+                    parts = self.__serialize(groups[name], raws[name])
+                    self.__write_shard(name, parts)
+            else:
+                self.__write(FileStorage.__file_path,
+                             self.__serialize(odict, raw))
+            self.__mark_clean()
+            for path in (FileStorage.__log_path,
+                         FileStorage.__log_path + ".old"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            FileStorage.__snapshot_seen = self.__snapshot_stamp()
+        self.__shrink()
 
-    def reload(self):
+    def reload(self, *, classes=None):
         """Deserialize objects from the JSON file __file_path
-        into __objects, if the file exists."""
+        into __objects, then replay the journal on top of them.
+
+        The snapshot is streamed one record at a time and each record
+        is built as soon as it is read, unless the journal changes it.
+        In lazy mode, and when the cache is bounded, the records are kept
+        as JSON text instead until accessed through all() or get().
+
+        Args:
+            classes (iterable): Names of the classes to load, all of them
+                when None. In sharded mode, only their files are read.
+                Otherwise, the records of the other classes are kept as
+                text, as in lazy mode, so that save() writes them back.
+        """
+        if classes is not None:
+            classes = set(classes)
+        old = FileStorage.__log_path + ".old"
+        FileStorage.__secondary = {}
+        FileStorage.__searched = None
+        FileStorage.__evicted = weakref.WeakValueDictionary()
+        with self.__locked(fcntl.LOCK_SH), FileStorage.__compact_lock:
+            logged = {rec["key"] for path in (old, FileStorage.__log_path)
+                      for rec in self.__read_journal(path)}
+            objdict = {}
+            batch = []
+            for key, text in self.__iter_snapshot(classes):
+                skipped = (classes is not None and
+                           key.partition(".")[0] not in classes)
+                if skipped and FileStorage.__sharded:
+                    continue
+                if key in logged:
+                    objdict[key] = self.__decode(text)
+                elif (FileStorage.__lazy or FileStorage.__mmap or
+                        FileStorage.__cache_size > 0 or skipped):
+                    FileStorage.__objects.pop(key, None)
+                    FileStorage.__sources.pop(key, None)
+                    FileStorage.__raw[key] = text
+                    self.__index(key)
+                else:
+                    batch.append((key, self.__decode(text), text))
+                    if len(batch) == FileStorage.__batch_size:
+                        self.__build_batch(batch)
+                        batch = []
+            self.__build_batch(batch)
+            self.__replay_journal(objdict, old)
+            self.__replay_journal(objdict, FileStorage.__log_path)
+            FileStorage.__snapshot_seen = self.__snapshot_stamp()
+        batch = []
+        for key, o in objdict.items():
+            if classes is None or o["__class__"] in classes:
+                batch.append((key, o, None))
+            elif not FileStorage.__sharded:
+                FileStorage.__objects.pop(key, None)
+                FileStorage.__sources.pop(key, None)
+                FileStorage.__raw[key] = self.__record_text(o)
+                self.__index(key)
+        self.__build_batch(batch)
+        FileStorage.__dirty.clear()
+        FileStorage.__deleted.clear()
+        FileStorage.__created.clear()
+        self.__shrink()
+
+    def compact(self, background=False):
+        """Fold the journal into a new snapshot of __file_path.
+
+        The journal is first renamed aside so that writers keep appending
+        to a fresh one while the snapshot is rebuilt; the new snapshot is
+        then swapped in with an atomic rename.
+
+        Args:
+            background (bool): Run the fold in a separate thread.
+
+        Returns:
+            A dict with the "bytes" and "records" reclaimed, or None when
+            run in the background.
+        """
+        compactor = FileStorage.__compactor
+        if compactor is not None and compactor.is_alive():
+            if background:
+                return None
+            compactor.join()
+        old = FileStorage.__log_path + ".old"
+        with self.__locked(fcntl.LOCK_EX):
+            if not os.path.exists(old):
+                try:
+                    os.rename(FileStorage.__log_path, old)
+                except FileNotFoundError:
+                    return {"bytes": 0, "records": 0}
+        if background:
+            FileStorage.__compactor = threading.Thread(target=self.__fold)
+            FileStorage.__compactor.start()
+            return None
+        return self.__fold()
+
+    def last_compaction(self):
+        """Return the statistics of the last completed compaction."""
+        return FileStorage.__compaction
+
+    def close(self):
+        """Save the full-text index along the snapshot, if it was built,
+        so that the next process can load it instead of rebuilding it.
+
+        The index is only saved when it matches the snapshot, that is
+        when no change is waiting to be saved and no other process
+        rewrote the snapshot since it was last read or written.
+        """
+        if (self.__search_current() and len(FileStorage.__dirty) == 0 and
+                len(FileStorage.__deleted) == 0 and
+                FileStorage.__snapshot_seen == self.__snapshot_stamp()):
+            self.__save_search()
+
+    def __class_index(self):
+        """Return __by_class, rebuilt if __objects or __raw was replaced."""
+        objs = FileStorage.__objects
+        raw = FileStorage.__raw
+        indexed = FileStorage.__indexed
+        if indexed is None or indexed[0] is not objs or indexed[1] is not raw:
+            by_class = {}
+            for key in itertools.chain(objs, raw):
+                by_class.setdefault(key.partition(".")[0], {})[key] = None
+            FileStorage.__by_class = by_class
+            FileStorage.__indexed = (objs, raw)
+        return FileStorage.__by_class
+
+    def __index(self, key):
+        """Add the key of a stored object or raw record to __by_class."""
+        by_class = self.__class_index()
+        by_class.setdefault(key.partition(".")[0], {})[key] = None
+
+    def __secondary_current(self):
+        """Return the names of the secondary indexes built from the current
+        objects, dropping the others."""
+        current = (FileStorage.__objects, FileStorage.__raw)
+        secondary = FileStorage.__secondary
+        for name, built in list(secondary.items()):
+            if built[0] is not current[0] or built[1] is not current[1]:
+                del secondary[name]
+        return set(secondary)
+
+    def __secondary_index(self, name):
+        """Rebuild the secondary index name if it is not current.
+
+        Args:
+            name (str): "relations" for __children and __parents,
+                "timeline" for __timeline and __stamps, "grid" for __grid
+                and __cells, or "columns" for __columns.
+
+        The raw records of lazy mode are decoded but not built.
+        """
+        if name in self.__secondary_current():
+            return
+        if name == "relations":
+            FileStorage.__children = {rel: {} for rel in (
+                (cls_name, attr)
+                for cls_name, attrs in FileStorage.__relations.items()
+                for attr in attrs)}
+            FileStorage.__parents = {rel: {}
+                                     for rel in FileStorage.__children}
+        elif name == "timeline":
+            FileStorage.__timeline = {attr: ([], []) for attr in TIMESTAMPS}
+            FileStorage.__stamps = {attr: {} for attr in TIMESTAMPS}
+        elif name == "grid":
+            FileStorage.__grid = {}
+            FileStorage.__cells = {}
+        else:
+            FileStorage.__columns = ColumnStore(FileStorage.__numbers,
+                                                ("city_id", "user_id"),
+                                                Place.defaults)
+        indexes = (name,)
+        for key, obj in FileStorage.__objects.items():
+            self.__reindex(key, obj.attributes(), None, indexes)
+        for key, text in FileStorage.__raw.items():
+            if name in ("relations", "timeline") or key.startswith("Place."):
+                self.__reindex(key, self.__decode(text), None, indexes)
+        FileStorage.__secondary[name] = (FileStorage.__objects,
+                                         FileStorage.__raw)
+
+    def __reindex(self, key, values, attrs, indexes):
+        """Update the entries of key in the secondary indexes.
+
+        Args:
+            key (str): The <class name>.id key of an object.
+            values (dict): The attributes of the object, empty to remove
+                it from the indexes.
+            attrs (tuple): The attributes to update, all of them when None.
+            indexes (iterable): The names of the indexes to update.
+        """
+        cls_name = key.partition(".")[0]
+        relations = FileStorage.__relations.get(cls_name, ())
+        if "relations" in indexes:
+            self.__relate(key, values, relations if attrs is None else
+                          [a for a in attrs if a in relations])
+        if "timeline" in indexes:
+            self.__stamp(key, values, TIMESTAMPS if attrs is None else
+                         [a for a in attrs if a in TIMESTAMPS])
+        if cls_name != "Place":
+            return
+        if "grid" in indexes and (attrs is None or "latitude" in attrs or
+                                  "longitude" in attrs):
+            self.__locate(key, values)
+        if "columns" in indexes and (attrs is None or any(
+                a in FileStorage.__numbers or a in relations for a in attrs)):
+            if len(values) == 0:
+                FileStorage.__columns.remove(key)
+            else:
+                FileStorage.__columns.set(key, values)
+
+    def __stamp(self, key, values, attrs):
+        """Index the timestamps attrs of key found in the dictionary values.
+
+        Timestamps read from JSON records are parsed from ISO format.
+        """
+        for attr in attrs:
+            times, keys = FileStorage.__timeline[attr]
+            stamps = FileStorage.__stamps[attr]
+            old = stamps.pop(key, None)
+            if old is not None:
+                i = bisect.bisect_left(times, old)
+                while keys[i] != key:
+                    i += 1
+                del times[i]
+                del keys[i]
+            ts = values.get(attr)
+            if type(ts) is str:
+                try:
+                    ts = datetime.fromisoformat(ts)
+                except ValueError:
+                    continue
+            if type(ts) is datetime:
+                i = bisect.bisect_right(times, ts)
+                times.insert(i, ts)
+                keys.insert(i, key)
+                stamps[key] = ts
+
+    def __check_column(self, attr):
+        """Raise a ValueError if attr is not a numeric column of Place."""
+        if attr not in FileStorage.__numbers:
+            raise ValueError("Place.{} is not a numeric column".format(attr))
+
+    def __search_current(self):
+        """Return True if __search indexes the current objects."""
+        searched = FileStorage.__searched
+        return (searched is not None and
+                searched[0] is FileStorage.__objects and
+                searched[1] is FileStorage.__raw)
+
+    def __search_index(self):
+        """Return __search, loaded or rebuilt if it is not current.
+
+        A saved index is only used if the snapshot files did not change
+        since it was written; the objects changed in the journal or not
+        saved yet are then indexed again.
+        """
+        if self.__search_current():
+            return FileStorage.__search
+        index = None
+        try:
+            with open(self.__search_path()) as f:
+                index, stamp = InvertedIndex.load(f)
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        if (index is None or index.stemmed != FileStorage.__stemmed or
+                stamp != self.__snapshot_stamp()):
+            index = InvertedIndex(FileStorage.__stemmed)
+            changed = itertools.chain(FileStorage.__objects, FileStorage.__raw)
+        else:
+            logs = (FileStorage.__log_path + ".old", FileStorage.__log_path)
+            changed = {rec["key"] for path in logs
+                       for rec in self.__read_journal(path)}
+            changed.update(FileStorage.__dirty, FileStorage.__deleted)
+        FileStorage.__search = index
+        for key in changed:
+            if key in FileStorage.__objects:
+                obj = FileStorage.__objects[key]
+                self.__index_text(key, obj.attributes())
+            elif key in FileStorage.__raw:
+                if key.partition(".")[0] in FileStorage.__texts:
+                    self.__index_text(key,
+                                      self.__decode(FileStorage.__raw[key]))
+            else:
+                index.remove(key)
+        FileStorage.__searched = (FileStorage.__objects, FileStorage.__raw)
+        return index
+
+    def __index_text(self, key, values):
+        """Index the searched attributes of key found in the dictionary
+        values."""
+        attrs = FileStorage.__texts.get(key.partition(".")[0], ())
+        texts = [values[a] for a in attrs if type(values.get(a)) is str]
+        FileStorage.__search.add(key, texts)
+
+    def __search_path(self):
+        """Return the file name of the saved full-text index."""
+        return FileStorage.__file_path + ".search"
+
+    def __save_search(self):
+        """Atomically save __search with the stamp of the snapshot."""
+        with self.__replacing(self.__search_path(), "w") as f:
+            FileStorage.__search.dump(f, self.__snapshot_stamp())
+
+    def __locate(self, key, values):
+        """Index the place key in __grid by the coordinates in the
+        dictionary values, or else the defaults of Place, unless it has
+        none."""
+        grid = FileStorage.__grid
+        old = FileStorage.__cells.pop(key, None)
+        if old is not None:
+            del grid[old][key]
+            if len(grid[old]) == 0:
+                del grid[old]
+        lat = self.__value(key, values, "latitude")
+        lon = self.__value(key, values, "longitude")
+        if type(lat) in (int, float) and type(lon) in (int, float):
+            size = FileStorage.__cell_size
+            cell = (math.floor(lat / size), math.floor(lon / size))
+            grid.setdefault(cell, {})[key] = (lat, lon)
+            FileStorage.__cells[key] = cell
+
+    def __value(self, key, values, attr):
+        """Return the attribute attr of key in the dictionary values, or
+        the default of its class, or None if values is empty."""
+        if attr in values:
+            return values[attr]
+        cls = ModelType.classes.get(key.partition(".")[0])
+        if len(values) == 0 or cls is None:
+            return None
+        return cls.defaults.get(attr)
+
+    def __grid_scan(self, south, west, north, east):
+        """Yield the key and coordinates of each place inside a bounding
+        box, which crosses the antimeridian when west > east.
+
+        Only the cells overlapping the box are read, or only the cells
+        holding places when there are fewer of them.
+        """
+        grid = FileStorage.__grid
+        size = FileStorage.__cell_size
+        if west <= east:
+            spans = [(west, east)]
+        else:
+            spans = [(west, 180.0), (-180.0, east)]
+        rows = range(math.floor(south / size), math.floor(north / size) + 1)
+        for w, e in spans:
+            cols = range(math.floor(w / size), math.floor(e / size) + 1)
+            if len(rows) * len(cols) > len(grid):
+                cells = [c for c in grid if c[0] in rows and c[1] in cols]
+            else:
+                cells = [(r, c) for r in rows for c in cols
+                         if (r, c) in grid]
+            for cell in cells:
+                for key, (lat, lon) in list(grid[cell].items()):
+                    if south <= lat <= north and w <= lon <= e:
+                        yield key, lat, lon
+
+    def __time_range(self, attr, low, low_closed, high, high_closed):
+        """Return the keys whose timestamp attr lies between low and high,
+        in timestamp order.
+
+        Args:
+            attr (str): "created_at" or "updated_at".
+            low (datetime): The lower bound, unbounded when None.
+            low_closed (bool): Whether low itself is in the range.
+            high (datetime): The upper bound, unbounded when None.
+            high_closed (bool): Whether high itself is in the range.
+        """
+        self.__secondary_index("timeline")
+        times, keys = FileStorage.__timeline[attr]
+        first, last = 0, len(times)
+        if low is not None:
+            find = bisect.bisect_left if low_closed else bisect.bisect_right
+            first = find(times, low)
+        if high is not None:
+            find = bisect.bisect_right if high_closed else bisect.bisect_left
+            last = find(times, high)
+        return keys[first:last]
+
+    def __plan_time_range(self, cls_name, conditions):
+        """Return the objects of class cls_name in the narrowest timestamp
+        range bounded by conditions, or None if no condition bounds one."""
+        bounds = {}
+        for attr, op, value in conditions:
+            if (attr not in TIMESTAMPS or type(value) is not datetime or
+                    op not in ("<", "<=", ">", ">=")):
+                continue
+            low, high = bounds.get(attr, (None, None))
+            if op[0] == ">" and (low is None or value > low[0]):
+                low = (value, op == ">=")
+            elif op[0] == "<" and (high is None or value < high[0]):
+                high = (value, op == "<=")
+            bounds[attr] = (low, high)
+        if len(bounds) == 0:
+            return None
+        best = None
+        for attr, (low, high) in bounds.items():
+            low = low or (None, True)
+            high = high or (None, True)
+            keys = self.__time_range(attr, low[0], low[1], high[0], high[1])
+            if best is None or len(keys) < len(best):
+                best = keys
+        return {key: self.get(*key.split(".", 1)) for key in best
+                if key.partition(".")[0] == cls_name}
+
+    def __relate(self, key, values, attrs):
+        """Index the parent ids attrs of key found in the dictionary values,
+        or else the defaults of its class."""
+        cls_name = key.partition(".")[0]
+        for attr in attrs:
+            children = FileStorage.__children[cls_name, attr]
+            parents = FileStorage.__parents[cls_name, attr]
+            old = parents.pop(key, None)
+            if old is not None:
+                children[old].pop(key, None)
+                if len(children[old]) == 0:
+                    del children[old]
+            parent_id = self.__value(key, values, attr)
+            if type(parent_id) is str:
+                children.setdefault(parent_id, {})[key] = None
+                parents[key] = parent_id
+
+    @contextlib.contextmanager
+    def __locked(self, op):
+        """Hold the lock of __file_path + ".lock" in locking mode.
+
+        Args:
+            op (int): fcntl.LOCK_SH to share the lock with other readers,
+                or fcntl.LOCK_EX to hold it alone.
+        """
+        if not FileStorage.__locking and not FileStorage.__merging:
+            yield
+            return
+        with open(FileStorage.__file_path + ".lock", "a") as f:
+            fcntl.flock(f, op)
+            yield
+
+    @contextlib.contextmanager
+    def __replacing(self, path, mode="wb"):
+        """Open a new temporary file next to path, renamed over path when
+        the block exits, or removed if it raises.
+
+        Each call gets its own file, so that processes replacing path at
+        the same time do not write to or rename each other's.
+        """
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                   prefix=os.path.basename(path) + ".",
+                                   suffix=".tmp")
+        try:
+            os.fchmod(fd, 0o666 & ~UMASK)
+            with open(fd, mode) as f:
+                yield f
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def __merge(self, classes=None):
+        """Apply the snapshot rewritten by another process, keeping the
+        local changes.
+
+        The objects added, replaced or deleted locally and the attributes
+        changed locally override the snapshot. The other attributes of
+        the built objects are set from the snapshot, the records not yet
+        built are replaced by the new ones, and the objects missing from
+        the snapshot are removed, even if changed locally, unless they
+        were created since the last save.
+
+        Args:
+            classes (set): In sharded mode, the names of the classes whose
+                shards are merged, all of them when None.
+        """
+        odict = FileStorage.__objects
+        raw = FileStorage.__raw
+        dirty = FileStorage.__dirty
+        deleted = FileStorage.__deleted
+        frags = FileStorage.__fragments
+        seen = set()
+        for key, text in self.__iter_snapshot(classes):
+            seen.add(key)
+            if key in deleted or (key in dirty and dirty[key] is None):
+                continue
+            obj = odict.get(key)
+            evicted = FileStorage.__evicted.get(key)
+            if obj is None and evicted is not None:
+                obj = evicted if self.__readmit(key, evicted) else None
+            if obj is None:
+                raw[key] = text
+                self.__index(key)
+                continue
+            frag = frags.get(key)
+            if (key not in dirty and frag is not None and frag[0] is obj and
+                    frag[1] == self.__fragment(key, text)):
+                continue
+            fields = dirty.get(key, ())
+            attrs = obj.attributes()
+            for k, v in self.__decode(text).items():
+                if k in fields or k == "__class__":
+                    continue
+                if k in TIMESTAMPS and type(v) is str:
+                    v = datetime.fromisoformat(v)
+                if k not in attrs or attrs[k] != v:
+                    setattr(obj, k, v)
+        created = FileStorage.__created
+        gone = [k for k in itertools.chain(odict, raw)
+                if k not in seen and k not in created and
+                (classes is None or k.partition(".")[0] in classes)]
+        for key in gone:
+            odict.pop(key, None)
+            raw.pop(key, None)
+            dirty.pop(key, None)
+            frags.pop(key, None)
+            FileStorage.__sources.pop(key, None)
+            by_class = self.__class_index()
+            by_class.get(key.partition(".")[0], {}).pop(key, None)
+        FileStorage.__secondary = {}
+        FileStorage.__searched = None
+
+    def __needs_compaction(self):
+        """Return True when the journal passed a compaction threshold."""
+        try:
+            log_size = os.path.getsize(FileStorage.__log_path)
+        except FileNotFoundError:
+            return False
+        snap_size = self.__snapshot_size()
+        limit = FileStorage.__compact_bytes
+        ratio = FileStorage.__compact_ratio
+        return ((limit > 0 and log_size >= limit) or
+                (ratio > 0 and 0 < snap_size and
+                 log_size >= ratio * snap_size))
+
+    def __fold(self):
+        """Rewrite the snapshot with the rotated journal applied."""
+        path = FileStorage.__file_path
+        old = FileStorage.__log_path + ".old"
+        with self.__locked(fcntl.LOCK_EX), FileStorage.__compact_lock:
+            if not os.path.exists(old):
+                return None
+            objdict = self.__load_snapshot()
+            before = len(objdict)
+            size = os.path.getsize(old) + self.__snapshot_size()
+            touched = set()
+            count = self.__replay_journal(objdict, old, touched)
+            parts = [(k, self.__encode_record(k, rec))
+                     for k, rec in objdict.items()]
+            if FileStorage.__sharded:
+                for name, group in self.__group(dict(parts), touched).items():
+                    self.__write_shard(name, list(group.items()))
+            else:
+                self.__write(path, parts)
+            os.remove(old)
+            FileStorage.__compaction = {
+                "bytes": size - self.__snapshot_size(),
+                "records": before + count - len(objdict)
+            }
+        return FileStorage.__compaction
+
+    def __shard_path(self, name):
+        """Return the file name of the shard of the class name."""
+        root, ext = os.path.splitext(FileStorage.__file_path)
+        return "{}.{}{}".format(root, name, ext)
+
+    def __shard_names(self):
+        """Return the class names of the shard files found on disk."""
+        root, ext = os.path.splitext(FileStorage.__file_path)
+        pattern = "{}.*{}".format(glob.escape(root), ext)
+        return [p[len(root) + 1:len(p) - len(ext)] for p in glob.glob(pattern)]
+
+    def __snapshot_paths(self):
+        """Return the file names of the snapshot."""
+        if FileStorage.__sharded:
+            return [self.__shard_path(n) for n in self.__shard_names()]
+        return [FileStorage.__file_path]
+
+    def __snapshot_size(self):
+        """Return the size in bytes of the snapshot files."""
+        return sum(os.path.getsize(p) for p in self.__snapshot_paths()
+                   if os.path.exists(p))
+
+    def __snapshot_stamp(self):
+        """Return the sorted name, inode, size and modification time of
+        each snapshot file, to tell whether they changed."""
+        stamp = []
+        for path in sorted(self.__snapshot_paths()):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stamp.append([path, st.st_ino, st.st_size, st.st_mtime_ns])
+        return stamp
+
+    def __journal_exists(self):
+        """Return True when a journal file is present on disk."""
+        return (os.path.exists(FileStorage.__log_path) or
+                os.path.exists(FileStorage.__log_path + ".old"))
+
+    def __group(self, items, names):
+        """Split the dictionary items by the class name of their keys.
+
+        Args:
+            items (dict): A dictionary keyed by <class name>.id.
+            names (set): The class names to keep.
+
+        Returns:
+            A dictionary mapping each name to the matching items.
+        """
+        groups = {name: {} for name in names}
+        for key, value in items.items():
+            group = groups.get(key.partition(".")[0])
+            if group is not None:
+                group[key] = value
+        return groups
+
+    def __write_shard(self, name, parts):
+        """Atomically replace the shard of the class name with the
+        encoded records parts, or remove it if there are none."""
+        path = self.__shard_path(name)
+        if len(parts) == 0:
+            for p in (path, path + ".offsets"):
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+            return
+        self.__write(path, parts)
+
+    def __write(self, path, parts):
+        """Atomically replace the file path with the encoded records parts.
+
+        The records are written to a temporary file that is renamed over
+        path, so a crash never leaves a truncated file behind. In lazy
+        mode, the position of each record of a JSON file in ASCII is
+        saved to path + ".offsets", so that reload() does not scan it.
+
+        Args:
+            path (str): The file name.
+            parts (list): (key, fragment) pairs.
+        """
+        starts = None
+        with self.__replacing(path) as f:
+            w = _Crc32Writer(f)
+            if self.__is_binary():
+                FileStorage.__codec.dump(w, (frag for k, frag in parts))
+            else:
+                text = ", ".join(frag for k, frag in parts)
+                w.write(("{" + text + "}").encode("utf-8"))
+                if ((FileStorage.__lazy or FileStorage.__mmap) and
+                        text.isascii()):
+                    starts = member_starts(frag for k, frag in parts)
+            if FileStorage.__checksum:
+                f.write("\n#crc32:{:08x}\n".format(w.crc).encode("ascii"))
+            self.__sync(f)
+        if starts is not None:
+            self.__write_offsets(path, starts)
+        if FileStorage.__durable:
+            fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def __write_offsets(self, path, starts):
+        """Atomically save the positions starts of the members of the JSON
+        file path, after the inode, size and modification time of path.
+        """
+        st = os.stat(path)
+        offsets = array.array("q", (st.st_ino, st.st_size, st.st_mtime_ns))
+        offsets.extend(starts)
+        with self.__replacing(path + ".offsets") as f:
+            offsets.tofile(f)
+
+    def __read_offsets(self, f, end):
+        """Return the positions of the members of the JSON file f saved by
+        __write_offsets(), or None if f changed since they were saved.
+
+        Args:
+            f (file): The JSON file, opened in binary mode.
+            end (int): The size of the data of f, before any trailer.
+        """
+        offsets = array.array("q")
+        try:
+            with open(f.name + ".offsets", "rb") as g:
+                offsets.frombytes(g.read())
+        except (FileNotFoundError, ValueError):
+            return None
+        st = os.fstat(f.fileno())
+        if (len(offsets) < 4 or offsets[-1] not in (1, end + 1) or
+                offsets[:3].tolist() != [st.st_ino, st.st_size,
+                                         st.st_mtime_ns]):
+            return None
+        return offsets[3:]
+
+    def __sync(self, f):
+        """Flush the file f to disk in durable mode."""
+        if FileStorage.__durable:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __check_trailer(self, f):
+        """Check the CRC-32 trailer of the binary file f, if it has one.
+
+        Returns:
+            The size of the data before the trailer.
+
+        Raises:
+            ValueError: If the data does not match the checksum.
+        """
+        size = os.fstat(f.fileno()).st_size
+        if size < TRAILER_SIZE:
+            return size
+        f.seek(size - TRAILER_SIZE)
+        match = TRAILER.fullmatch(f.read(TRAILER_SIZE))
+        f.seek(0)
+        if match is None:
+            return size
+        crc = 0
+        left = size - TRAILER_SIZE
+        while left > 0:
+            chunk = f.read(min(left, 1 << 16))
+            crc = zlib.crc32(chunk, crc)
+            left -= len(chunk)
+        f.seek(0)
+        if crc != int(match.group(1), 16):
+            raise ValueError("{}: checksum mismatch".format(f.name))
+        return size - TRAILER_SIZE
+
+    def __is_binary(self):
+        """Return True when objects are saved in the binary format."""
+        return FileStorage.__file_path.endswith(".bin")
+
+    def __encode(self, key, obj):
+        """Return the fragment of the object obj stored under key."""
+        return self.__fragment(key, self.__encode_object(obj))
+
+    def __encode_object(self, obj):
+        """Return the encoded record of the object obj."""
+        if self.__is_binary():
+            rec = obj.attributes().copy()
+            rec["__class__"] = obj.__class__.__name__
+            return FileStorage.__codec.encode(rec)
+        return json.dumps(obj.to_dict())
+
+    def __encode_record(self, key, rec):
+        """Return the fragment of the record dictionary rec of key."""
+        return self.__fragment(key, self.__record_text(rec))
+
+    def __record_text(self, rec):
+        """Return the encoded record of the record dictionary rec."""
+        if self.__is_binary():
+            return FileStorage.__codec.encode(rec)
+        return json.dumps(rec)
+
+    def __fragment(self, key, frag):
+        """Return the fragment written to the storage file for the encoded
+        record frag of key.
+
+        In the binary format, this is the record itself. In JSON, it is
+        the whole "key": record member of the file, so that saving an
+        unchanged object only copies its fragment.
+        """
+        frag = self.__unmap(frag)
+        if self.__is_binary():
+            return frag
+        return "{}: {}".format(json.dumps(key), frag)
+
+    def __decode(self, frag):
+        """Return the record dictionary of the encoded record frag."""
+        if self.__is_binary():
+            return FileStorage.__codec.decode(frag)
+        if type(frag) is memoryview:
+            frag = bytes(frag)
+        return json.loads(frag)
+
+    def __unmap(self, frag):
+        """Return a copy of the encoded record frag if it is a view of
+        a memory-mapped file."""
+        if type(frag) is not memoryview:
+            return frag
+        if self.__is_binary():
+            return bytes(frag)
+        return str(frag, "ascii")
+
+    def __materialize(self, key):
+        """Build the object of the raw record key and return it."""
+        text = FileStorage.__raw[key]
+        return self.__build(key, self.__decode(text), text)
+
+    def __build(self, key, o, text=None):
+        """Build the object of the record o and store it under key.
+
+        Args:
+            key (str): The <class name>.id key of the record.
+            o (dict): The record, as returned by to_dict().
+            text (str): The encoded record, kept in __sources when the
+                cache is bounded, so that the object can be evicted
+                without encoding it again.
+        """
+        return self.__build_batch([(key, o, text)])[0]
+
+    def __build_batch(self, batch):
+        """Build the objects of the records of batch, store them and
+        return them.
+
+        Args:
+            batch (list): (key, record, encoded record) triples, as taken
+                by __build(), with None for a record not to keep.
+
+        The encoded records are not cached as fragments: only save()
+        caches the fragments it writes, so that the text of the objects
+        built is not kept in memory along with them until then.
+        """
+        objs = BaseModel.from_records(rec for key, rec, text in batch)
+        bounded = FileStorage.__cache_size > 0
+        for (key, rec, text), obj in zip(batch, objs):
+            FileStorage.__objects[key] = obj
+            FileStorage.__raw.pop(key, None)
+            self.__index(key)
+            FileStorage.__fragments.pop(key, None)
+            if bounded and text is not None:
+                FileStorage.__sources[key] = text
+            else:
+                FileStorage.__sources.pop(key, None)
+        self.__shrink()
+        return objs
+
+    def __shrink(self):
+        """Evict the least recently used objects without unsaved changes
+        while __objects holds more than __cache_size objects.
+
+        The objects with unsaved changes that are passed over are moved
+        last, so that the next calls do not scan them again.
+        """
+        objs = FileStorage.__objects
+        excess = len(objs) - FileStorage.__cache_size
+        if FileStorage.__cache_size <= 0 or excess <= 0:
+            return
+        dirty = FileStorage.__dirty
+        victims = []
+        pinned = []
+        for key in objs:
+            if len(victims) == excess:
+                break
+            if key in dirty:
+                pinned.append(key)
+            else:
+                victims.append(key)
+        for key in pinned:
+            objs[key] = objs.pop(key)
+        for key in victims:
+            self.__evict(key)
+
+    def __evict(self, key):
+        """Replace the object of key in __objects by its encoded record in
+        __raw, keeping a weak reference to it in __evicted.
+
+        The record is a string held in memory, unless it is a view of the
+        file mapped in mmap mode.
+        """
+        obj = FileStorage.__objects.pop(key)
+        text = FileStorage.__sources.pop(key, None)
+        if text is None:
+            text = self.__encode_object(obj)
+        FileStorage.__raw[key] = text
+        FileStorage.__fragments.pop(key, None)
+        FileStorage.__evicted[key] = obj
+        FileStorage.__evictions += 1
+
+    def __readmit(self, key, obj):
+        """Store the evicted object obj of key in __objects again.
+
+        Returns:
+            True if obj was evicted and is stored again, False otherwise.
+        """
+        if (key not in FileStorage.__raw or
+                FileStorage.__evicted.get(key) is not obj):
+            return False
+        FileStorage.__objects[key] = obj
+        FileStorage.__sources[key] = FileStorage.__raw.pop(key)
+        del FileStorage.__evicted[key]
+        self.__shrink()
+        return True
+
+    def __iter_snapshot(self, classes=None):
+        """Yield the key and encoding of each record of the snapshot.
+
+        Args:
+            classes (set): In sharded mode, the names of the classes whose
+                shards are read, all of them when None.
+        """
+        if FileStorage.__sharded:
+            if classes is None:
+                classes = self.__shard_names()
+            paths = [self.__shard_path(name) for name in classes]
+        else:
+            paths = [FileStorage.__file_path]
+        binary = self.__is_binary()
+        for path in paths:
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            with f:
+                end = self.__check_trailer(f)
+                starts = None if binary else self.__read_offsets(f, end)
+                mm = None
+                if FileStorage.__mmap and end > 0:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if mm is not None and starts is not None:
+                    view = memoryview(mm)
+                    for key, start, stop in iter_mmap_indexed(mm, starts):
+                        yield key, view[start:stop]
+                elif starts is not None:
+                    yield from iter_indexed_entries(f.read, starts)
+                elif mm is not None and binary:
+                    yield from FileStorage.__codec.iter_buffer(
+                        memoryview(mm)[:end])
+                elif mm is not None and re.search(rb"[\x80-\xff]", mm) is None:
+                    view = memoryview(mm)
+                    for key, start, stop in iter_mmap_offsets(mm):
+                        yield key, view[start:stop]
+                elif binary:
+                    yield from FileStorage.__codec.iter_load(f, end)
+                else:
+                    yield from iter_file_entries(
+                        io.TextIOWrapper(f, encoding="utf-8"))
+
+    def __load_snapshot(self, classes=None):
+        """Return the dictionary stored in the snapshot, or an empty one.
+
+        Args:
+            classes (set): In sharded mode, the names of the classes whose
+                shards are read, all of them when None.
+        """
+        return {key: self.__decode(frag)
+                for key, frag in self.__iter_snapshot(classes)}
+
+    def __serialize(self, odict, raw):
+        """Return the (key, fragment) pairs of the objects in odict and of
+        the raw records in raw, encoding only the objects that changed
+        since their cached fragment was built.
+        """
+        frags = FileStorage.__fragments
+        dirty = FileStorage.__dirty
+        binary = self.__is_binary()
+        parts = []
+        for key, obj in odict.items():
+            frag = frags.get(key)
+            if (frag is None or frag[0] is not obj or key in dirty or
+                    isinstance(frag[1], bytes) != binary):
+                frag = (obj, self.__encode(key, obj))
+                frags[key] = frag
+            parts.append((key, frag[1]))
+        parts.extend((key, self.__fragment(key, frag))
+                     for key, frag in raw.items())
+        return parts
+
+    def __mark_clean(self):
+        """Forget the pending changes and the fragments of removed objects."""
+        odict = FileStorage.__objects
+        frags = FileStorage.__fragments
+        if len(frags) != len(odict):
+            for key in [k for k in frags if k not in odict]:
+                del frags[key]
+        FileStorage.__dirty.clear()
+        FileStorage.__deleted.clear()
+        FileStorage.__created.clear()
+
+    def __append_journal(self):
+        """Append one record per deleted or changed object to __log_path.
+
+        Objects changed through attribute assignment only carry the
+        changed attributes, and their lists and dicts.
+        """
+        dirty = FileStorage.__dirty
+        deleted = FileStorage.__deleted
+        odict = FileStorage.__objects
+        if len(dirty) == 0 and len(deleted) == 0:
+            return
+        with open(FileStorage.__log_path, "a") as f:
+            for key in deleted:
+                f.write(json.dumps({"op": "delete", "key": key}) + "\n")
+            for key, fields in dirty.items():
+                obj = odict.get(key)
+                if obj is None:
+                    continue
+                data = obj.to_dict()
+                if fields is not None:
+                    data = {k: v for k, v in data.items() if k in fields or
+                            type(v) is list or type(v) is dict}
+                rec = {"op": "put", "key": key, "data": data}
+                f.write(json.dumps(rec) + "\n")
+            self.__sync(f)
+        dirty.clear()
+        deleted.clear()
+
+    def __replay_journal(self, objdict, path, touched=None):
+        """Apply the records of the journal at path to the snapshot objdict
+        and return the number of records applied.
+
+        A partially written last line, left by a crash during append,
+        is ignored.
+
+        Args:
+            objdict (dict): The snapshot records, updated in place.
+            path (str): The journal file name.
+            touched (set): If given, receives the class names of the
+                records applied.
+        """
+        count = 0
+        for rec in self.__read_journal(path):
+            key = rec["key"]
+            if rec["op"] == "put":
+                if key in objdict:
+                    objdict[key].update(rec["data"])
+                elif "__class__" in rec["data"]:
+                    objdict[key] = rec["data"]
+            else:
+                objdict.pop(key, None)
+            if touched is not None:
+                touched.add(key.partition(".")[0])
+            count += 1
+        return count
+
+    def __read_journal(self, path):
+        """Yield the records of the journal at path, stopping at a
+        partially written one."""
         try:
-            with open(FileStorage.__file_path) as f:
-                objdict = json.load(f)
-                for o in objdict.values():
-                    cls_name = o["__class__"]
-                    del o["__class__"]
-                    self.new(eval(cls_name)(**o))
+            with open(path) as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        return
         except FileNotFoundError:
             return
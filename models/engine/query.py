@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""Defines the conditions of the queries run by FileStorage.where().
+
+A condition is an (attribute, operator, value) tuple, such as
+("price_by_night", "<", 100), parsed from text like
+"price_by_night<100, max_guest>=4".
+"""
+import ast
+import operator
+import re
+from datetime import datetime
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge
+}
+CONDITION = re.compile(r"""\s*([A-Za-z_]\w*)\s*(==|!=|<=|>=|<|>|=)\s*
+                           ("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|[^,]*?)
+                           \s*(?:,|$)""", re.VERBOSE)
+
+
+def parse_conditions(text):
+    """Return the conditions of the comma-separated text.
+
+    Values are read as Python literals when they are numbers, booleans,
+    None or quoted strings, and as plain strings otherwise. A single "="
+    is the same as "==".
+
+    Raises:
+        ValueError: If text is not a list of conditions.
+    """
+    conditions = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = CONDITION.match(text, pos)
+        if match is None or match.end() == pos:
+            raise ValueError("invalid condition: {}".format(text[pos:]))
+        attr, op, value = match.groups()
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass
+        conditions.append((attr, "==" if op == "=" else op, value))
+        pos = match.end()
+    return conditions
+
+
+def parse_timestamps(conditions):
+    """Return conditions with the ISO format strings compared with
+    created_at or updated_at replaced by datetimes."""
+    parsed = []
+    for attr, op, value in conditions:
+        if attr in ("created_at", "updated_at") and type(value) is str:
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                pass
+        parsed.append((attr, op, value))
+    return parsed
+
+
+def compile_filter(conditions):
+    """Return a function testing whether an object matches every condition.
+
+    An object whose attribute is missing or cannot be compared with the
+    value of a condition does not match it.
+    """
+    tests = [(attr, OPERATORS[op], value) for attr, op, value in conditions]
+
+    def match(obj):
+        for attr, op, value in tests:
+            try:
+                if not op(getattr(obj, attr), value):
+                    return False
+            except (AttributeError, TypeError):
+                return False
+        return True
+    return match
@@ -0,0 +1,243 @@
+#!/usr/bin/python3
+"""Defines the interface shared by the storage engines.
+
+models/__init__.py creates the engine named by HBNB_TYPE_STORAGE:
+FileStorage by default, or DBStorage when it is "db".
+"""
+import math
+from datetime import datetime
+from os import getenv
+from models.engine.columns import ColumnStore
+from models.engine.query import compile_filter, parse_timestamps
+from models.engine.text_index import InvertedIndex
+from models.place import Place
+
+EARTH_RADIUS = 6371.0
+NUMBERS = ("number_rooms", "number_bathrooms", "max_guest",
+           "price_by_night", "latitude", "longitude")
+TEXTS = {"Place": ("name", "description"), "Review": ("text",)}
+STEMMED = getenv("HBNB_SEARCH_STEM") == "1"
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    """Return the distance in kilometers between two coordinates."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    h = (math.sin(dphi / 2) ** 2 +
+         math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(h)))
+
+
+def _coordinates(obj):
+    """Return the latitude and longitude of the place obj, or None."""
+    lat = getattr(obj, "latitude", None)
+    lon = getattr(obj, "longitude", None)
+    if type(lat) in (int, float) and type(lon) in (int, float):
+        return lat, lon
+    return None
+
+
+class Storage:
+    """The interface of the storage engines.
+
+    Engines implement all(), get(), new(), touch(), delete(), save() and
+    reload(). The queries are implemented here by reading every object of
+    the classes involved, and engines override them with indexed ones.
+    """
+
+    def all(self, *, cls_name=None):
+        """Return the stored objects keyed by <class name>.id.
+
+        Args:
+            cls_name (str): If given, only return the objects of this
+                class.
+        """
+        raise NotImplementedError
+
+    def get(self, cls_name, obj_id):
+        """Return the object of class cls_name with id obj_id, or None."""
+        raise NotImplementedError
+
+    def new(self, obj):
+        """Add the object obj to the storage."""
+        raise NotImplementedError
+
+    def touch(self, obj, name):
+        """Mark the attribute name of a stored object as changed."""
+        raise NotImplementedError
+
+    def delete(self, obj):
+        """Remove the object obj from the storage if it is stored there."""
+        raise NotImplementedError
+
+    def save(self):
+        """Persist the changes made since the last save."""
+        raise NotImplementedError
+
+    def reload(self, *, classes=None):
+        """Load the stored objects.
+
+        Args:
+            classes (iterable): Names of the classes to load, all of them
+                when None.
+        """
+        raise NotImplementedError
+
+    def count(self, cls_name=None):
+        """Return the number of objects of class cls_name, or of all
+        objects when None."""
+        return len(self.all(cls_name=cls_name))
+
+    def where(self, cls_name, conditions):
+        """Return the objects of class cls_name matching every condition,
+        in a new dictionary. Timestamps may be compared with ISO format
+        strings.
+
+        Args:
+            cls_name (str): The class name.
+            conditions (list): (attribute, operator, value) tuples, such
+                as returned by query.parse_conditions().
+        """
+        match = compile_filter(parse_timestamps(conditions))
+        return {key: obj for key, obj in self.all(cls_name=cls_name).items()
+                if match(obj)}
+
+    def children(self, cls_name, attr, parent_id):
+        """Return the objects of class cls_name whose attribute attr holds
+        parent_id, such as the cities of a state, in a new dictionary."""
+        return self.where(cls_name, [(attr, "==", parent_id)])
+
+    def between(self, attr, start=None, end=None, *, cls_name=None):
+        """Return the objects whose timestamp attr is at or after start and
+        before end, in a new dictionary ordered by that timestamp.
+
+        Args:
+            attr (str): "created_at" or "updated_at".
+            start (datetime): The first timestamp, unbounded when None.
+            end (datetime): The timestamp after the last, unbounded when
+                None.
+            cls_name (str): If given, only return the objects of this
+                class.
+        """
+        hits = []
+        for key, obj in self.all(cls_name=cls_name).items():
+            ts = getattr(obj, attr, None)
+            if (type(ts) is datetime and (start is None or start <= ts) and
+                    (end is None or ts < end)):
+                hits.append((ts, key, obj))
+        hits.sort(key=lambda hit: hit[0])
+        return {key: obj for ts, key, obj in hits}
+
+    def near(self, lat, lon, radius):
+        """Return the places within radius kilometers of the coordinates
+        lat, lon, nearest first, in a new dictionary."""
+        hits = []
+        for key, obj in self.all(cls_name="Place").items():
+            coords = _coordinates(obj)
+            if coords is not None:
+                dist = _haversine(lat, lon, *coords)
+                if dist <= radius:
+                    hits.append((dist, key, obj))
+        hits.sort(key=lambda hit: hit[:2])
+        return {key: obj for dist, key, obj in hits}
+
+    def within(self, south, west, north, east):
+        """Return the places inside a bounding box, in a new dictionary.
+
+        The box crosses the antimeridian when west is greater than east.
+        """
+        objs = {}
+        for key, obj in self.all(cls_name="Place").items():
+            coords = _coordinates(obj)
+            if coords is None or not south <= coords[0] <= north:
+                continue
+            lon = coords[1]
+            if (west <= lon <= east if west <= east else
+                    west <= lon or lon <= east):
+                objs[key] = obj
+        return objs
+
+    def search(self, query, cls_name=None):
+        """Return the places and reviews whose name, description or text
+        hold words of query, best match first, in a new dictionary.
+
+        Args:
+            query (str): The words to search.
+            cls_name (str): If given, only return the objects of this
+                class.
+        """
+        index = InvertedIndex(STEMMED)
+        objs = {}
+        for name, attrs in TEXTS.items():
+            if cls_name is not None and name != cls_name:
+                continue
+            for key, obj in self.all(cls_name=name).items():
+                values = obj.attributes()
+                index.add(key, [values[a] for a in attrs
+                                if type(values.get(a)) is str])
+                objs[key] = obj
+        return {key: objs[key] for score, key in index.search(query)}
+
+    def aggregate(self, attr, func="avg", group_by=None):
+        """Return an aggregate of a numeric attribute of the places.
+
+        Args:
+            attr (str): One of number_rooms, number_bathrooms, max_guest,
+                price_by_night, latitude and longitude.
+            func (str): One of "count", "sum", "avg", "min" and "max".
+            group_by (str): "city_id" or "user_id" to return a dictionary
+                of the aggregate of each city or user.
+
+        Raises:
+            ValueError: If attr, func or group_by is not supported.
+        """
+        self.__check_column(attr)
+        if group_by is not None and group_by not in ("city_id", "user_id"):
+            raise ValueError("cannot group places by {}".format(group_by))
+        return self.__places().aggregate(attr, func, group_by)
+
+    def histogram(self, attr, edges):
+        """Return the number of places whose numeric attribute attr falls
+        in each bin between consecutive edges, the last bin including its
+        upper edge.
+
+        Raises:
+            ValueError: If attr is not supported.
+        """
+        self.__check_column(attr)
+        return self.__places().histogram(attr, edges)
+
+    def compact(self, background=False):
+        """Reclaim the space taken by past changes.
+
+        Returns:
+            A dict with the "bytes" and "records" reclaimed.
+        """
+        return {"bytes": 0, "records": 0}
+
+    def last_compaction(self):
+        """Return the statistics of the last completed compaction, or
+        None."""
+        return None
+
+    def close(self):
+        """Release the resources of the engine before the program exits,
+        without saving pending changes."""
+
+    def cache_stats(self):
+        """Return the statistics of the cache of built objects, or None
+        when the engine has none."""
+        return None
+
+    def __check_column(self, attr):
+        """Raise a ValueError if attr is not a numeric column of Place."""
+        if attr not in NUMBERS:
+            raise ValueError("Place.{} is not a numeric column".format(attr))
+
+    def __places(self):
+        """Return the columns of the numeric attributes of the places."""
+        columns = ColumnStore(NUMBERS, ("city_id", "user_id"), Place.defaults)
+        for key, obj in self.all(cls_name="Place").items():
+            columns.set(key, obj.attributes())
+        return columns
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+"""Defines the inverted index behind the full-text search of FileStorage.
+
+Texts are split into lowercase words, optionally stemmed by stripping
+common English suffixes, and documents are ranked with BM25.
+"""
+import json
+import math
+import re
+
+TOKEN = re.compile(r"\w+")
+SUFFIXES = ("ingly", "edly", "ing", "ies", "ied", "ed", "es", "ly", "s")
+K1 = 1.2
+B = 0.75
+
+
+def stem(word):
+    """Return word without its longest common English suffix, keeping a
+    stem of at least three letters."""
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            if suffix in ("ies", "ied"):
+                word += "y"
+            return word
+    return word
+
+
+def tokenize(text, stemmed=False):
+    """Return the lowercase words of text, stemmed if stemmed is True."""
+    words = TOKEN.findall(text.lower())
+    if stemmed:
+        return [stem(w) for w in words]
+    return words
+
+
+class InvertedIndex:
+    """Maps words to the documents holding them.
+
+    Attributes:
+        stemmed (bool): Whether words are stemmed.
+        docs (dict): The count of each word of each document key.
+        postings (dict): The count of each word in each document, keyed
+            by word, then by document key.
+    """
+
+    def __init__(self, stemmed=False):
+        """Initialize an empty index."""
+        self.stemmed = stemmed
+        self.docs = {}
+        self.postings = {}
+        self.__sizes = {}
+        self.__length = 0
+
+    def add(self, key, texts):
+        """Index the strings texts as the document key, replacing it."""
+        self.remove(key)
+        counts = {}
+        for text in texts:
+            for word in tokenize(text, self.stemmed):
+                counts[word] = counts.get(word, 0) + 1
+        if len(counts) == 0:
+            return
+        self.__insert(key, counts)
+
+    def remove(self, key):
+        """Remove the document key from the index, if present."""
+        counts = self.docs.pop(key, None)
+        if counts is None:
+            return
+        for word in counts:
+            docs = self.postings[word]
+            del docs[key]
+            if len(docs) == 0:
+                del self.postings[word]
+        self.__length -= self.__sizes.pop(key)
+
+    def search(self, query):
+        """Return the (score, key) pairs of the documents holding any word
+        of query, best first."""
+        total = len(self.docs)
+        if total == 0:
+            return []
+        avg = self.__length / total
+        scores = {}
+        for word in set(tokenize(query, self.stemmed)):
+            docs = self.postings.get(word, {})
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for key, count in docs.items():
+                size = self.__sizes[key]
+                tf = count * (K1 + 1) / (count + K1 * (1 - B + B * size / avg))
+                scores[key] = scores.get(key, 0.0) + idf * tf
+        return sorted(((score, key) for key, score in scores.items()),
+                      key=lambda hit: (-hit[0], hit[1]))
+
+    def dump(self, f, stamp):
+        """Write the index and the stamp of the storage files it matches
+        to the text file f."""
+        json.dump({"stamp": stamp, "stemmed": self.stemmed,
+                   "docs": self.docs}, f)
+
+    @classmethod
+    def load(cls, f):
+        """Return the index read from the text file f and its stamp."""
+        data = json.load(f)
+        index = cls(data["stemmed"])
+        for key, counts in data["docs"].items():
+            index.__insert(key, counts)
+        return index, data["stamp"]
+
+    def __insert(self, key, counts):
+        """Add the document key with the word counts counts."""
+        self.docs[key] = counts
+        for word, count in counts.items():
+            self.postings.setdefault(word, {})[key] = count
+        size = sum(counts.values())
+        self.__sizes[key] = size
+        self.__length += size
@@ -11,13 +11,22 @@ Defines eight unittest classes for testing the Console:
 - TestHBNBCommandAll: Test the 'all' command in HBNB interpreter.
 - TestHBNBCommandUpdate: Test the 'update' command in HBNB interpreter.
 - TestHBNBCommandCount: Test the 'count' method in HBNB interpreter.
+- TestHBNBCommandCompact: Test the 'compact' command in HBNB interpreter.
+- TestHBNBCommandGroupCommit: Test saving changes in groups.
+- TestHBNBCommandWhere: Test the 'where' command in HBNB interpreter.
+- TestHBNBCommandGeo: Test the 'near' and 'within' commands.
+- TestHBNBCommandSearch: Test the 'search' command in HBNB interpreter.
 """
 import os
 import sys
+import json
 import unittest
 from io import StringIO
 from models import storage
 from console import HBNBCommand
+from models.place import Place
+from models.review import Review
+from models.base_model import BaseModel, ModelType
 from unittest.mock import patch
 from models.engine.file_storage import FileStorage
 
@@ -111,11 +120,68 @@ class TestHBNBCommandHelp(unittest.TestCase):
             self.assertFalse(HBNBCommand().onecmd("help update"))
             self.assertEqual(h, output.getvalue().strip())
 
+    def test_help_compact(self):
+        """Test the 'help' message for the 'compact' command."""
+        h = """Fold the storage journal into a new snapshot.
+
+        Usage: compact"""
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("help compact"))
+            self.assertEqual(h, output.getvalue().strip())
+
+    def test_help_flush(self):
+        """Test the 'help' message for the 'flush' command."""
+        h = """Save the changes waiting for a group commit.
+
+        Usage: flush"""
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("help flush"))
+            self.assertEqual(h, output.getvalue().strip())
+
+    def test_help_where(self):
+        """Test the 'help' message for the 'where' command."""
+        h = """Display the instances of a class matching every condition.
+
+        Usage: where <class> <attribute><op><value>, ... or
+       <class>.where(<attribute><op><value>, ...)
+       with <op> one of ==, !=, <, <=, > and >="""
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("help where"))
+            self.assertEqual(h, output.getvalue().strip())
+
+    def test_help_search(self):
+        """Test the 'help' message for the 'search' command."""
+        h = """Display the places and reviews matching words, best first.
+
+        Usage: search [<class>] <words> or <class>.search(<words>)"""
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("help search"))
+            self.assertEqual(h, output.getvalue().strip())
+
+    def test_help_near(self):
+        """Test the 'help' message for the 'near' command."""
+        h = """Display the places within a radius in kilometers, nearest first.
+
+        Usage: near <latitude> <longitude> <radius>"""
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("help near"))
+            self.assertEqual(h, output.getvalue().strip())
+
+    def test_help_within(self):
+        """Test the 'help' message for the 'within' command."""
+        h = """Display the places inside a bounding box.
+
+        Usage: within <south> <west> <north> <east>"""
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("help within"))
+            self.assertEqual(h, output.getvalue().strip())
+
     def test_help(self):
         """Test the general 'help' message listing available commands."""
         h = ("Documented commands (type help <topic>):\n"
              "========================================\n"
-             "EOF  all  count  create  destroy  help  quit  show  update")
+             "EOF  compact  create   flush  near  search  update  within\n"
+             "all  count    destroy  help   quit  show    where")
         with patch("sys.stdout", new=StringIO()) as output:
             self.assertFalse(HBNBCommand().onecmd("help"))
             self.assertEqual(h, output.getvalue().strip())
@@ -220,6 +286,20 @@ class TestHBNBCommandCreate(unittest.TestCase):
             testKey = "Review.{}".format(output.getvalue().strip())
             self.assertIn(testKey, storage.all().keys())
 
+    def test_create_registered_class(self):
+        """Test the 'create' command with a model defined elsewhere."""
+        class Castle(BaseModel):
+            towers = 0
+        self.addCleanup(ModelType.classes.pop, "Castle")
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("create Castle"))
+            testId = output.getvalue().strip()
+        obj = storage.get("Castle", testId)
+        self.addCleanup(storage.delete, obj)
+        self.assertEqual(Castle, type(obj))
+        HBNBCommand().onecmd("update Castle {} towers 4".format(testId))
+        self.assertEqual(4, obj.towers)
+
 
 class TestHBNBCommandShow(unittest.TestCase):
     """Unit test for the 'show' command of the HBNB command interpreter"""
@@ -898,6 +978,22 @@ class TestHBNBCommandUpdate(unittest.TestCase):
         except IOError:
             pass
 
+    def test_update_and_destroy_keep_relations(self):
+        """Test that the foreign-key indexes follow 'update' and 'destroy'."""
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create City")
+            testID = output.getvalue().strip()
+        HBNBCommand().onecmd("update City {} state_id s1".format(testID))
+        self.assertEqual(["City." + testID],
+                         list(storage.children("City", "state_id", "s1")))
+        HBNBCommand().onecmd(
+            "City.update({}, {{'state_id': 's2'}})".format(testID))
+        self.assertEqual({}, storage.children("City", "state_id", "s1"))
+        self.assertEqual(["City." + testID],
+                         list(storage.children("City", "state_id", "s2")))
+        HBNBCommand().onecmd("destroy City {}".format(testID))
+        self.assertEqual({}, storage.children("City", "state_id", "s2"))
+
     def test_update_missing_class(self):
         correct = "** class name missing **"
         with patch("sys.stdout", new=StringIO()) as output:
@@ -1504,6 +1600,19 @@ class TestHBNBCommandUpdate(unittest.TestCase):
         test_dict = storage.all()["Place.{}".format(testId)].__dict__
         self.assertEqual(98, test_dict["max_guest"])
 
+    def test_update_dictionary_not_evaluated(self):
+        """Test that update only reads literal dictionaries."""
+        correct = "** value missing **"
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("create Place")
+            testId = output.getvalue().strip()
+        for value in ("42", "{'name': str(42)}"):
+            with patch("sys.stdout", new=StringIO()) as output:
+                testCmd = "update Place {} {}".format(testId, value)
+                self.assertFalse(HBNBCommand().onecmd(testCmd))
+                self.assertEqual(correct, output.getvalue().strip())
+        self.assertEqual("", storage.get("Place", testId).name)
+
     def test_update_valid_dictionary_with_float_space_notation(self):
         with patch("sys.stdout", new=StringIO()) as output:
             HBNBCommand().onecmd("create Place")
@@ -1594,5 +1703,336 @@ class TestHBNBCommandCount(unittest.TestCase):
             self.assertEqual("1", output.getvalue().strip())
 
 
+class TestHBNBCommandCompact(unittest.TestCase):
+    """Unit tests for the 'compact' command of the HBNB interpreter."""
+
+    def setUp(self):
+        """Set up the test environment for the 'compact' command."""
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+
+    def tearDown(self):
+        """Tear down the test environment after the 'compact' tests."""
+        FileStorage._FileStorage__journaled = False
+        for path in ("file.json", "file.json.log"):
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def test_compact_without_journal(self):
+        """Test 'compact' when there is nothing to fold."""
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("compact"))
+            self.assertEqual("0 bytes, 0 records reclaimed",
+                             output.getvalue().strip())
+
+    def test_compact_folds_journal(self):
+        """Test 'compact' after journaled creates and destroys."""
+        FileStorage._FileStorage__journaled = True
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("create User"))
+            testID = output.getvalue().strip()
+        with patch("sys.stdout", new=StringIO()) as output:
+            HBNBCommand().onecmd("destroy User {}".format(testID))
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd("compact"))
+            self.assertIn("2 records reclaimed", output.getvalue())
+        self.assertFalse(os.path.exists("file.json.log"))
+
+
+class TestHBNBCommandGroupCommit(unittest.TestCase):
+    """Unit tests for the group commit mode of the HBNB interpreter."""
+
+    def setUp(self):
+        """Set up group commits of three changes."""
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        HBNBCommand._HBNBCommand__group_commit = True
+        HBNBCommand._HBNBCommand__commit_count = 3
+        HBNBCommand._HBNBCommand__commit_window = 3600.0
+        self.console = HBNBCommand(stdin=StringIO())
+
+    def tearDown(self):
+        """Tear down by leaving group commit mode."""
+        HBNBCommand._HBNBCommand__group_commit = False
+        HBNBCommand._HBNBCommand__commit_count = 1000
+        HBNBCommand._HBNBCommand__commit_window = 1.0
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def run_commands(self, *commands):
+        """Run each command in the test console, hiding its output."""
+        with patch("sys.stdout", new=StringIO()):
+            for command in commands:
+                self.console.onecmd(command)
+
+    def test_save_on_count(self):
+        """Test that changes are saved once the group is full."""
+        self.run_commands("create User", "create State")
+        self.assertFalse(os.path.exists("file.json"))
+        self.run_commands("create City")
+        with open("file.json") as f:
+            self.assertEqual(3, len(json.load(f)))
+
+    def test_save_on_flush(self):
+        """Test that 'flush' saves the pending changes."""
+        self.run_commands("create User")
+        self.assertFalse(os.path.exists("file.json"))
+        self.run_commands("flush")
+        self.assertTrue(os.path.exists("file.json"))
+
+    def test_save_on_exit(self):
+        """Test that 'quit' and 'EOF' save the pending changes."""
+        self.run_commands("create User")
+        with patch("sys.stdout", new=StringIO()):
+            self.assertTrue(self.console.onecmd("quit"))
+        self.assertTrue(os.path.exists("file.json"))
+        os.remove("file.json")
+        self.run_commands("create User")
+        with patch("sys.stdout", new=StringIO()):
+            self.assertTrue(self.console.onecmd("EOF"))
+        self.assertTrue(os.path.exists("file.json"))
+
+    def test_save_on_window(self):
+        """Test that changes are saved once the commit window elapses."""
+        self.run_commands("create User")
+        self.console.postcmd(False, "create User")
+        self.assertFalse(os.path.exists("file.json"))
+        HBNBCommand._HBNBCommand__commit_window = 0.0
+        self.assertFalse(self.console.postcmd(False, "count User"))
+        self.assertTrue(os.path.exists("file.json"))
+
+    def test_save_on_window_at_prompt(self):
+        """Test that changes are saved once the commit window elapses
+        while no command is entered, and not while commands are read."""
+        rfd, wfd = os.pipe()
+        with os.fdopen(rfd) as r, os.fdopen(wfd, "w") as w:
+            self.console = HBNBCommand(stdin=r)
+            HBNBCommand._HBNBCommand__commit_window = 0.05
+            self.run_commands("create User")
+            w.write("count User\n")
+            w.flush()
+            self.console.postcmd(False, "create User")
+            self.assertFalse(os.path.exists("file.json"))
+            r.readline()
+            self.console.postcmd(False, "count User")
+            self.assertTrue(os.path.exists("file.json"))
+
+    def test_update_and_destroy_are_grouped(self):
+        """Test that 'update' and 'destroy' join the pending group."""
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.console.onecmd("create User")
+            testID = output.getvalue().strip()
+        self.run_commands("update User {} first_name Betty".format(testID))
+        self.assertFalse(os.path.exists("file.json"))
+        self.run_commands("destroy User {}".format(testID))
+        with open("file.json") as f:
+            self.assertEqual({}, json.load(f))
+
+
+class TestHBNBCommandWhere(unittest.TestCase):
+    """Unit tests for the 'where' command of the HBNB interpreter."""
+
+    def setUp(self):
+        """Set up three places with different prices and guests."""
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        self.places = []
+        for price, guests in ((50, 2), (80, 6), (150, 8)):
+            pl = Place()
+            pl.price_by_night = price
+            pl.max_guest = guests
+            pl.city_id = "c1"
+            self.places.append(pl)
+
+    def tearDown(self):
+        """Tear down the test environment after the 'where' tests."""
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def where(self, command):
+        """Run a command and return its stripped output."""
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(command))
+        return output.getvalue().strip()
+
+    def test_where_missing_class(self):
+        self.assertEqual("** class name missing **", self.where("where"))
+        self.assertEqual("** class doesn't exist **",
+                         self.where("MyModel.where(max_guest>1)"))
+
+    def test_where_invalid_condition(self):
+        self.assertEqual("** invalid condition: max_guest **",
+                         self.where("Place.where(max_guest)"))
+
+    def test_where_dot_notation(self):
+        output = self.where("Place.where(price_by_night<100, max_guest>=4)")
+        self.assertIn(self.places[1].id, output)
+        self.assertNotIn(self.places[0].id, output)
+        self.assertNotIn(self.places[2].id, output)
+
+    def test_where_space_notation(self):
+        output = self.where("where Place price_by_night >= 80")
+        self.assertNotIn(self.places[0].id, output)
+        self.assertIn(self.places[1].id, output)
+        self.assertIn(self.places[2].id, output)
+
+    def test_where_indexed_attribute(self):
+        self.places[0].city_id = "c2"
+        output = self.where("Place.where(city_id=c1, max_guest!=8)")
+        self.assertEqual(str([str(self.places[1])]), output)
+        output = self.where("Place.where(id == '{}')".format(
+            self.places[2].id))
+        self.assertEqual(str([str(self.places[2])]), output)
+
+    def test_where_without_conditions(self):
+        self.assertEqual(3, self.where("where Place").count("[Place]"))
+
+
+class TestHBNBCommandGeo(unittest.TestCase):
+    """Unit tests for the 'near' and 'within' commands."""
+
+    def setUp(self):
+        """Set up a place in Paris and one in London."""
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        self.paris = Place()
+        self.paris.latitude = 48.8566
+        self.paris.longitude = 2.3522
+        self.london = Place()
+        self.london.latitude = 51.5072
+        self.london.longitude = -0.1276
+
+    def tearDown(self):
+        """Tear down the test environment after the 'near' tests."""
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def run_command(self, command):
+        """Run a command and return its stripped output."""
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(command))
+        return output.getvalue().strip()
+
+    def test_near(self):
+        output = self.run_command("near 48.85 2.35 10")
+        self.assertIn(self.paris.id, output)
+        self.assertNotIn(self.london.id, output)
+
+    def test_within(self):
+        output = self.run_command("within 45 -5 55 1")
+        self.assertIn(self.london.id, output)
+        self.assertNotIn(self.paris.id, output)
+
+    def test_invalid_arguments(self):
+        self.assertEqual("** usage: near <latitude> <longitude> <radius> **",
+                         self.run_command("near 48.85 2.35"))
+        self.assertEqual("** usage: within <south> <west> <north> <east> **",
+                         self.run_command("within a b c d"))
+
+    def test_update_moves_place(self):
+        HBNBCommand().onecmd("update Place {} latitude 51.5".format(
+            self.paris.id))
+        HBNBCommand().onecmd("update Place {} longitude -0.12".format(
+            self.paris.id))
+        self.assertEqual("[]", self.run_command("near 48.85 2.35 10"))
+        self.assertIn(self.paris.id, self.run_command("near 51.5 -0.12 1"))
+
+
+class TestHBNBCommandSearch(unittest.TestCase):
+    """Unit tests for the 'search' command of the HBNB interpreter."""
+
+    def setUp(self):
+        """Set up a place and a review mentioning a river."""
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        FileStorage._FileStorage__objects = {}
+        self.place = Place()
+        self.place.description = "Loft by the river"
+        self.review = Review()
+        self.review.text = "River view, river sounds"
+
+    def tearDown(self):
+        """Tear down the test environment after the 'search' tests."""
+        for path in ("file.json", "file.json.search"):
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+
+    def run_command(self, command):
+        """Run a command and return its stripped output."""
+        with patch("sys.stdout", new=StringIO()) as output:
+            self.assertFalse(HBNBCommand().onecmd(command))
+        return output.getvalue().strip()
+
+    def test_search_missing_words(self):
+        self.assertEqual("** search words missing **",
+                         self.run_command("search"))
+        self.assertEqual("** search words missing **",
+                         self.run_command("search Review"))
+
+    def test_search_ranked(self):
+        output = self.run_command("search river")
+        self.assertLess(output.index(self.review.id),
+                        output.index(self.place.id))
+
+    def test_search_class(self):
+        for command in ("search Place river", "Place.search(river)"):
+            output = self.run_command(command)
+            self.assertIn(self.place.id, output)
+            self.assertNotIn(self.review.id, output)
+
+    def test_update_and_destroy_reindex(self):
+        self.run_command("search river")
+        HBNBCommand().onecmd('update Review {} text "Quiet"'.format(
+            self.review.id))
+        self.assertNotIn(self.review.id, self.run_command("search river"))
+        self.assertIn(self.review.id, self.run_command("search quiet"))
+        HBNBCommand().onecmd("destroy Review {}".format(self.review.id))
+        self.assertEqual("[]", self.run_command("search quiet"))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -5,13 +5,24 @@ Defines three unittest classes for testing the BaseModel model:
 - TestBaseModelInstantiation: Test the instantiation of the BaseModel class.
 - TestBaseModelSave: Test the 'save' method of the BaseModel class.
 - TestBaseModelToDict: Test the 'to_dict' method of the BaseModel class.
+- TestBaseModelFromRecords: Test the 'from_records' method of the
+  BaseModel class.
+- TestBaseModelCompact: Test the compact representation of the models,
+  run in a separate process with HBNB_COMPACT_MODELS=1.
+- TestBaseModelLazyTimestamps: Test the lazily decoded timestamps, run in
+  a separate process with HBNB_LAZY_TIMESTAMPS=1.
 """
 import os
+import sys
 import models
+import subprocess
 import unittest
 from datetime import datetime
 from time import sleep
-from models.base_model import BaseModel
+from unittest.mock import patch
+from models.base_model import BaseModel, ModelType, COMPACT, LAZY_TIMESTAMPS
+from models.place import Place
+from models.user import User
 
 
 class TestBaseModelInstantiation(unittest.TestCase):
@@ -84,6 +95,14 @@ class TestBaseModelInstantiation(unittest.TestCase):
         self.assertEqual(bm.created_at, dt)
         self.assertEqual(bm.updated_at, dt)
 
+    def test_instantiation_with_whole_seconds(self):
+        """Test instantiation from timestamps without microseconds."""
+        dt = datetime(2017, 9, 28, 21, 5, 54)
+        bm = BaseModel(id="345", created_at=dt.isoformat(),
+                       updated_at=dt.isoformat())
+        self.assertEqual(bm.created_at, dt)
+        self.assertEqual(bm.to_dict()["created_at"], "2017-09-28T21:05:54")
+
     def test_instantiation_with_None_kwargs(self):
         """Test that instantiation with None as kwargs raises a TypeError."""
         with self.assertRaises(TypeError):
@@ -214,5 +233,175 @@ class TestBaseModelToDict(unittest.TestCase):
             bm.to_dict(None)
 
 
+class TestBaseModelFromRecords(unittest.TestCase):
+    """Unit tests for the 'from_records' method of the BaseModel class."""
+
+    def test_registry(self):
+        """Test that the model classes are registered by name."""
+        self.assertIs(ModelType.classes["BaseModel"], BaseModel)
+        self.assertIs(ModelType.classes["Place"], Place)
+
+    def test_same_as_kwargs(self):
+        """Test that the objects are the same as built from kwargs."""
+        pl = Place()
+        pl.name = "Loft"
+        us = User()
+        recs = [pl.to_dict(), us.to_dict()]
+        objs = BaseModel.from_records(recs)
+        self.assertEqual([Place, User], [type(obj) for obj in objs])
+        self.assertEqual(recs, [obj.to_dict() for obj in objs])
+        self.assertEqual(pl.created_at, objs[0].created_at)
+
+    def test_not_stored(self):
+        """Test that the objects are not added to storage."""
+        rec = Place().to_dict()
+        rec["id"] = "from-records"
+        obj = BaseModel.from_records([rec])[0]
+        self.assertNotIn(obj, models.storage.all().values())
+
+    def test_no_wasted_values(self):
+        """Test that no id or timestamp is generated for complete
+        records."""
+        recs = [Place().to_dict() for i in range(3)]
+        with patch("models.base_model.uuid4", side_effect=AssertionError):
+            objs = BaseModel.from_records(recs)
+        self.assertEqual([rec["id"] for rec in recs],
+                         [obj.id for obj in objs])
+
+    def test_missing_values_generated(self):
+        """Test that the id and timestamps a record lacks are generated."""
+        obj = Place.from_records([{"name": "Loft"}])[0]
+        self.assertEqual(Place, type(obj))
+        self.assertEqual(str, type(obj.id))
+        self.assertEqual(datetime, type(obj.created_at))
+        self.assertEqual("Loft", obj.name)
+
+    def test_unknown_class(self):
+        """Test that a record of an unknown class raises a KeyError."""
+        with self.assertRaises(KeyError):
+            BaseModel.from_records([{"__class__": "Castle"}])
+
+
+class TestBaseModelCompact(unittest.TestCase):
+    """Unit tests for the compact representation of the models."""
+
+    @unittest.skipIf(COMPACT, "already in compact mode")
+    def test_compact_mode(self):
+        """Test that the tests below pass in compact mode."""
+        env = dict(os.environ, HBNB_COMPACT_MODELS="1")
+        test = "tests.test_models.test_base_model.TestBaseModelCompact"
+        proc = subprocess.run([sys.executable, "-m", "unittest", test],
+                              env=env, capture_output=True, text=True)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+
+    def test_defaults(self):
+        """Test the defaults collected from the class attributes."""
+        self.assertEqual(Place.defaults["number_rooms"], 0)
+        self.assertEqual(Place.defaults["amenity_ids"], [])
+        self.assertEqual(BaseModel.defaults, {})
+
+    @unittest.skipUnless(COMPACT, "requires HBNB_COMPACT_MODELS=1")
+    def test_no_dict(self):
+        """Test that compact instances have no __dict__."""
+        self.assertFalse(hasattr(Place(), "__dict__"))
+
+    @unittest.skipUnless(COMPACT, "requires HBNB_COMPACT_MODELS=1")
+    def test_default_values(self):
+        """Test that unset declared attributes read their default."""
+        pl = Place()
+        self.assertEqual(pl.number_rooms, 0)
+        self.assertEqual(pl.name, "")
+        pl.number_rooms = 3
+        self.assertEqual(pl.number_rooms, 3)
+        self.assertEqual(Place().number_rooms, 0)
+
+    @unittest.skipUnless(COMPACT, "requires HBNB_COMPACT_MODELS=1")
+    def test_extra_attributes(self):
+        """Test attributes that are not declared by the class."""
+        pl = Place()
+        with self.assertRaises(AttributeError):
+            pl.color
+        pl.color = "blue"
+        self.assertEqual(pl.color, "blue")
+        self.assertEqual(pl.attributes()["color"], "blue")
+
+    @unittest.skipUnless(COMPACT, "requires HBNB_COMPACT_MODELS=1")
+    def test_to_dict_and_str(self):
+        """Test to_dict and str on a compact instance."""
+        pl = Place()
+        pl.name = "Loft"
+        pl.color = "blue"
+        pl_dict = pl.to_dict()
+        self.assertEqual(pl_dict["name"], "Loft")
+        self.assertEqual(pl_dict["color"], "blue")
+        self.assertEqual(pl_dict["__class__"], "Place")
+        self.assertNotIn("number_rooms", pl_dict)
+        self.assertIn("'color': 'blue'", str(pl))
+
+    @unittest.skipUnless(COMPACT, "requires HBNB_COMPACT_MODELS=1")
+    def test_kwargs_round_trip(self):
+        """Test that an instance is rebuilt from its to_dict."""
+        pl = Place()
+        pl.max_guest = 4
+        pl.color = "blue"
+        pl2 = Place(**pl.to_dict())
+        self.assertEqual(pl2.to_dict(), pl.to_dict())
+        self.assertEqual(pl2.created_at, pl.created_at)
+        self.assertEqual(pl2.max_guest, 4)
+
+
+class TestBaseModelLazyTimestamps(unittest.TestCase):
+    """Unit tests for the lazily decoded timestamps of the models."""
+
+    iso = "2017-09-28T21:05:54.119427"
+
+    @unittest.skipIf(LAZY_TIMESTAMPS, "already in lazy mode")
+    def test_lazy_mode(self):
+        """Test that the tests below pass in lazy mode."""
+        env = dict(os.environ, HBNB_LAZY_TIMESTAMPS="1")
+        test = "tests.test_models.test_base_model.TestBaseModelLazyTimestamps"
+        proc = subprocess.run([sys.executable, "-m", "unittest", test],
+                              env=env, capture_output=True, text=True)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+
+    @unittest.skipUnless(LAZY_TIMESTAMPS, "requires HBNB_LAZY_TIMESTAMPS=1")
+    def test_kept_until_read(self):
+        """Test that a timestamp is kept as a string until it is read."""
+        bm = BaseModel(id="345", created_at=self.iso, updated_at=self.iso)
+        self.assertEqual(bm.attributes()["created_at"], self.iso)
+        self.assertEqual(bm.created_at, datetime.fromisoformat(self.iso))
+        self.assertEqual(type(bm.attributes()["created_at"]), datetime)
+        self.assertEqual(bm.attributes()["updated_at"], self.iso)
+
+    @unittest.skipUnless(LAZY_TIMESTAMPS, "requires HBNB_LAZY_TIMESTAMPS=1")
+    def test_to_dict_keeps_string(self):
+        """Test that to_dict does not decode the timestamps."""
+        bm = BaseModel(id="345", created_at=self.iso, updated_at=self.iso)
+        self.assertEqual(bm.to_dict()["created_at"], self.iso)
+        self.assertEqual(bm.attributes()["created_at"], self.iso)
+
+    @unittest.skipUnless(LAZY_TIMESTAMPS, "requires HBNB_LAZY_TIMESTAMPS=1")
+    def test_str_decodes(self):
+        """Test that the timestamps print as datetimes."""
+        bm = BaseModel(id="345", created_at=self.iso, updated_at=self.iso)
+        self.assertIn("datetime.datetime(2017, 9, 28", str(bm))
+
+    @unittest.skipUnless(LAZY_TIMESTAMPS, "requires HBNB_LAZY_TIMESTAMPS=1")
+    def test_set_datetime(self):
+        """Test setting a timestamp of a lazily decoded instance."""
+        bm = BaseModel(id="345", created_at=self.iso, updated_at=self.iso)
+        dt = datetime.today()
+        bm.updated_at = dt
+        self.assertEqual(bm.updated_at, dt)
+        self.assertEqual(bm.to_dict()["updated_at"], dt.isoformat())
+
+    @unittest.skipUnless(LAZY_TIMESTAMPS, "requires HBNB_LAZY_TIMESTAMPS=1")
+    def test_invalid_string(self):
+        """Test that an invalid timestamp fails when it is read."""
+        bm = BaseModel(id="345", created_at="yesterday", updated_at=self.iso)
+        with self.assertRaises(ValueError):
+            bm.created_at
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+"""This module defines unit tests for the 'binary_format' module.
+
+Defines two unittest classes for testing the binary storage format:
+- TestBinaryCodec: Test encoding and decoding records.
+- TestBinaryConversion: Test converting storage files to and from JSON.
+"""
+import os
+import sys
+import json
+import unittest
+import subprocess
+from io import BytesIO
+from datetime import datetime
+from models.engine.binary_format import BinaryCodec, MAGIC
+from models.engine.binary_format import json_to_binary, binary_to_json
+
+
+class TestBinaryCodec(unittest.TestCase):
+    """Unit tests for the BinaryCodec class."""
+
+    rec = {
+        "id": "123",
+        "created_at": datetime(2023, 10, 14, 16, 24, 21, 796479),
+        "updated_at": datetime(1960, 1, 1),
+        "name": "Loft é",
+        "number_rooms": 3,
+        "latitude": 9.8,
+        "big": 1 << 70,
+        "public": True,
+        "owner": None,
+        "amenity_ids": ["a", "b"],
+        "__class__": "Place"
+    }
+
+    def test_round_trip(self):
+        """Test that decoding an encoded record gives it back."""
+        codec = BinaryCodec()
+        payload = codec.encode(self.rec)
+        self.assertEqual(self.rec, codec.decode(payload))
+        self.assertEqual(list(self.rec), list(codec.decode(payload)))
+        self.assertEqual("Place.123", codec.key(payload))
+
+    def test_names_are_interned(self):
+        """Test that class and attribute names are stored once."""
+        codec = BinaryCodec()
+        first = codec.encode(self.rec)
+        count = len(codec.strings)
+        codec.encode(self.rec)
+        self.assertEqual(count, len(codec.strings))
+        self.assertIn("Place", codec.strings)
+        self.assertNotIn(b"Place", first)
+
+    def test_dump_and_load(self):
+        """Test writing and reading back a binary file."""
+        codec = BinaryCodec()
+        payloads = [codec.encode(dict(self.rec, id=str(i))) for i in range(3)]
+        f = BytesIO()
+        codec.dump(f, payloads)
+        f.seek(0)
+        self.assertTrue(f.getvalue().startswith(MAGIC))
+        loaded = list(BinaryCodec().iter_load(f))
+        self.assertEqual(["Place.0", "Place.1", "Place.2"],
+                         [k for k, p in loaded])
+
+    def test_load_remaps_strings(self):
+        """Test loading a file whose string table differs from the codec."""
+        writer = BinaryCodec()
+        f = BytesIO()
+        writer.dump(f, [writer.encode(self.rec)])
+        f.seek(0)
+        reader = BinaryCodec()
+        reader.intern("other")
+        key, payload = next(reader.iter_load(f))
+        self.assertEqual("Place.123", key)
+        self.assertEqual(self.rec, reader.decode(payload))
+
+    def test_bad_magic(self):
+        """Test that a file without the magic bytes is rejected."""
+        f = BytesIO(b"{}")
+        f.name = "file.bin"
+        with self.assertRaises(ValueError):
+            list(BinaryCodec().iter_load(f))
+
+    def test_truncated(self):
+        """Test that a truncated file is rejected."""
+        codec = BinaryCodec()
+        f = BytesIO()
+        codec.dump(f, [codec.encode(self.rec)])
+        with self.assertRaises(ValueError):
+            list(BinaryCodec().iter_load(BytesIO(f.getvalue()[:-1])))
+
+
+class TestBinaryConversion(unittest.TestCase):
+    """Unit tests for the json_to_binary and binary_to_json functions."""
+
+    def tearDown(self):
+        """Cleanup by removing the converted files."""
+        for path in ("conv.json", "conv.bin", "conv2.json"):
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+
+    def test_lossless_round_trip(self):
+        """Test that converting to binary and back keeps every value."""
+        objdict = {
+            "User.1": {"id": "1", "created_at": "2023-10-14T16:24:21.796479",
+                       "updated_at": "2023-10-14T16:24:21",
+                       "email": "a@b.c", "__class__": "User"},
+            "Place.2": {"id": "2", "created_at": "not a date",
+                        "updated_at": "2023-10-14T16:24:21.000000",
+                        "price_by_night": 100, "latitude": 0.1,
+                        "amenity_ids": [], "__class__": "Place"}
+        }
+        with open("conv.json", "w") as f:
+            json.dump(objdict, f)
+        json_to_binary("conv.json", "conv.bin")
+        binary_to_json("conv.bin", "conv2.json")
+        with open("conv2.json") as f:
+            self.assertEqual(objdict, json.load(f))
+
+    def test_command_line(self):
+        """Test converting with convert_storage.py, which must not load the
+        models package and the storage."""
+        objdict = {"User.1": {"id": "1", "__class__": "User"}}
+        with open("conv.json", "w") as f:
+            json.dump(objdict, f)
+        code = ("import runpy, sys\n"
+                "sys.argv[0] = 'convert_storage.py'\n"
+                "try:\n"
+                "    runpy.run_path(sys.argv[0], run_name='__main__')\n"
+                "finally:\n"
+                "    print('models' in sys.modules)\n")
+        for args in (["import", "conv.json", "conv.bin"],
+                     ["export", "conv.bin", "conv2.json"]):
+            out = subprocess.run([sys.executable, "-c", code] + args,
+                                 capture_output=True, text=True)
+            self.assertEqual(0, out.returncode)
+            self.assertEqual(("False\n", ""), (out.stdout, out.stderr))
+        with open("conv2.json") as f:
+            self.assertEqual(objdict, json.load(f))
+        out = subprocess.run([sys.executable, "convert_storage.py"],
+                             capture_output=True, text=True)
+        self.assertEqual(1, out.returncode)
+        self.assertIn("Usage: convert_storage.py import", out.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
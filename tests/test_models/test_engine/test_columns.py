@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+"""This module defines unit tests for the 'columns' module.
+
+Defines one unittest class for testing the columnar store:
+- TestColumnStore: Test storing rows and aggregating columns.
+"""
+import unittest
+from models.engine.columns import ColumnStore
+
+
+class TestColumnStore(unittest.TestCase):
+    """Unit tests for the ColumnStore class."""
+
+    def setUp(self):
+        """Set up a store of four places in two cities."""
+        self.store = ColumnStore(("price", "guests"), ("city",))
+        self.store.set("a", {"price": 100, "guests": 2, "city": "c1"})
+        self.store.set("b", {"price": 50.5, "guests": 4, "city": "c1"})
+        self.store.set("c", {"price": 200, "guests": "many", "city": "c2"})
+        self.store.set("d", {"guests": 6})
+
+    def test_aggregate(self):
+        """Test each function over a whole column."""
+        self.assertEqual(3, self.store.aggregate("price", "count"))
+        self.assertEqual(350.5, self.store.aggregate("price", "sum"))
+        self.assertEqual(12, self.store.aggregate("guests", "sum"))
+        self.assertEqual(4, self.store.aggregate("guests", "avg"))
+        self.assertEqual(50.5, self.store.aggregate("price", "min"))
+        self.assertEqual(200, self.store.aggregate("price", "max"))
+        with self.assertRaises(ValueError):
+            self.store.aggregate("price", "median")
+
+    def test_aggregate_by_group(self):
+        """Test aggregating each group, missing values left out."""
+        self.assertEqual({"c1": 75.25, "c2": 200.0},
+                         self.store.aggregate("price", "avg", "city"))
+        self.assertEqual({"c1": 2, None: 1},
+                         self.store.aggregate("guests", "count", "city"))
+
+    def test_empty(self):
+        """Test aggregating a column without values."""
+        store = ColumnStore(("price",))
+        self.assertEqual(0, store.aggregate("price", "count"))
+        self.assertIsNone(store.aggregate("price", "max"))
+
+    def test_set_and_remove(self):
+        """Test updating rows and removing them."""
+        self.store.set("a", {"price": 10, "city": "c2"})
+        self.store.remove("b")
+        self.store.remove("missing")
+        self.assertEqual(3, len(self.store))
+        self.assertEqual({"a", "c", "d"}, set(self.store.keys))
+        self.assertEqual({"c2": 210.0},
+                         self.store.aggregate("price", "sum", "city"))
+        self.assertEqual(6, self.store.aggregate("guests", "max"))
+        for key in ("a", "c", "d"):
+            self.store.remove(key)
+        self.assertEqual(0, len(self.store.numbers["price"]))
+
+    def test_histogram(self):
+        """Test counting values in bins."""
+        self.assertEqual([1, 1, 1], self.store.histogram("price",
+                                                         [0, 100, 150, 200]))
+        self.assertEqual([1, 1], self.store.histogram("price",
+                                                      [60, 150, 250]))
+        self.assertEqual([0], self.store.histogram("price", [300, 400]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+"""This module defines unit tests for the 'db_storage' engine.
+
+Defines unittest classes for testing the DBStorage engine:
+- TestDBStorageMethods: Test storing objects in SQLite.
+- TestDBStorageQueries: Test the queries run in SQL.
+- TestStorageSelection: Test choosing the engine with HBNB_TYPE_STORAGE.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import models
+from models.city import City
+from models.place import Place
+from models.review import Review
+from models.state import State
+from models.user import User
+from models.engine.db_storage import DBStorage
+from models.engine.storage import Storage
+
+
+class DBStorageTestCase(unittest.TestCase):
+    """Base class for tests running DBStorage on a temporary database."""
+
+    def setUp(self):
+        """Set up by making a DBStorage on a new database the storage of
+        the models."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "hbnb.db")
+        DBStorage._DBStorage__db_path = self.path
+        self.storage = DBStorage()
+        self.storage.reload()
+        patcher = patch("models.storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        """Cleanup by closing the database."""
+        DBStorage._DBStorage__connection.close()
+        DBStorage._DBStorage__connection = None
+        DBStorage._DBStorage__db_path = "hbnb.db"
+
+    def reopen(self):
+        """Forget every object and open the database again."""
+        self.storage.reload()
+
+
+class TestDBStorageMethods(DBStorageTestCase):
+    """Unit tests for the methods of DBStorage."""
+
+    def test_is_storage(self):
+        """Test that DBStorage implements the storage interface."""
+        self.assertIsInstance(self.storage, Storage)
+
+    def test_new_and_get(self):
+        """Test that a new object is found before it is saved."""
+        us = User()
+        self.assertIs(us, self.storage.get("User", us.id))
+        self.assertIs(us, self.storage.all()["User." + us.id])
+        self.assertIsNone(self.storage.get("User", "missing"))
+        self.assertIsNone(self.storage.get("Castle", us.id))
+
+    def test_save_and_reload(self):
+        """Test that saved objects are read back with their attributes."""
+        pl = Place()
+        pl.name = "Loft"
+        pl.number_rooms = 3
+        pl.latitude = 1.5
+        pl.amenity_ids = ["a", "b"]
+        pl.color = "blue"
+        pl.description = None
+        pl.save()
+        self.reopen()
+        pl2 = self.storage.get("Place", pl.id)
+        self.assertIsNot(pl, pl2)
+        self.assertEqual(pl.to_dict(), pl2.to_dict())
+        self.assertEqual(pl.created_at, pl2.created_at)
+        self.assertIsNone(pl2.description)
+
+    def test_unsaved_changes_dropped(self):
+        """Test that reload forgets the changes that were not saved."""
+        us = User()
+        us.save()
+        us.first_name = "Betty"
+        User()
+        self.reopen()
+        self.assertEqual(1, self.storage.count())
+        self.assertEqual("", self.storage.get("User", us.id).first_name)
+
+    def test_identity_map(self):
+        """Test that each row is read as a single object."""
+        us = User()
+        us.save()
+        self.reopen()
+        us2 = self.storage.get("User", us.id)
+        self.assertIs(us2, self.storage.all(cls_name="User")["User." + us.id])
+        self.assertIs(us2, self.storage.where(
+            "User", [("id", "==", us.id)])["User." + us.id])
+
+    def test_changes_written_before_queries(self):
+        """Test that changes are seen by queries before they are saved."""
+        us = User()
+        us.first_name = "Betty"
+        self.assertEqual(1, self.storage.count("User"))
+        us.first_name = "Holberton"
+        self.assertEqual([us], list(self.storage.where(
+            "User", [("first_name", "==", "Holberton")]).values()))
+
+    def test_delete(self):
+        """Test deleting a saved object and an unsaved one."""
+        us = User()
+        us.save()
+        us2 = User()
+        self.storage.delete(us)
+        self.storage.delete(us2)
+        self.assertEqual({}, self.storage.all())
+        self.storage.save()
+        self.reopen()
+        self.assertEqual(0, self.storage.count())
+
+    def test_count(self):
+        """Test counting objects of one class and of all classes."""
+        User()
+        User()
+        State()
+        self.assertEqual(2, self.storage.count("User"))
+        self.assertEqual(3, self.storage.count())
+        self.assertEqual(0, self.storage.count("Castle"))
+
+    def test_compact(self):
+        """Test that compact reclaims the space of deleted rows."""
+        objs = [Review(text="x" * 1000, id=str(i)) for i in range(200)]
+        for rv in objs:
+            self.storage.new(rv)
+        self.storage.save()
+        for rv in objs:
+            self.storage.delete(rv)
+        stats = self.storage.compact()
+        self.assertGreater(stats["bytes"], 0)
+        self.assertEqual(0, stats["records"])
+        self.assertEqual(0, self.storage.count())
+
+
+class TestDBStorageQueries(DBStorageTestCase):
+    """Unit tests for the queries of DBStorage."""
+
+    def test_where_defaults(self):
+        """Test that unset attributes compare as their class default."""
+        pl = Place()
+        pl2 = Place()
+        pl2.number_rooms = 4
+        pl3 = Place()
+        pl3.number_rooms = "many"
+        self.assertEqual({"Place." + pl2.id: pl2}, self.storage.where(
+            "Place", [("number_rooms", ">", 2)]))
+        self.assertEqual({"Place." + pl.id: pl}, self.storage.where(
+            "Place", [("number_rooms", "==", 0)]))
+
+    def test_where_timestamps(self):
+        """Test comparing timestamps with ISO format strings."""
+        us = User()
+        day = us.created_at.date().isoformat()
+        self.assertEqual([us], list(self.storage.where(
+            "User", [("created_at", ">=", day)]).values()))
+        self.assertEqual({}, self.storage.where(
+            "User", [("created_at", "<", day)]))
+
+    def test_children(self):
+        """Test finding the cities of a state."""
+        st = State()
+        ct = City()
+        ct.state_id = st.id
+        City().state_id = "other"
+        self.assertEqual({"City." + ct.id: ct},
+                         self.storage.children("City", "state_id", st.id))
+        with self.assertRaises(ValueError):
+            self.storage.children("Place", "name", "x")
+        with self.assertRaises(ValueError):
+            self.storage.children("Castle", "state_id", "x")
+
+    def test_children_indexed(self):
+        """Test that children and timestamps are looked up by index."""
+        conn = sqlite3.connect(self.path)
+        self.addCleanup(conn.close)
+        for sql in ('SELECT * FROM "City" WHERE "state_id" = ?',
+                    'SELECT * FROM "Review" WHERE "created_at" >= ?'):
+            plan = conn.execute("EXPLAIN QUERY PLAN " + sql, ("x",))
+            self.assertIn("USING INDEX", " ".join(r[-1] for r in plan))
+
+    def test_between(self):
+        """Test finding objects in a timestamp range, in order."""
+        now = datetime(2024, 1, 1)
+        objs = []
+        for i in (2, 0, 1):
+            rv = Review()
+            rv.created_at = now + timedelta(days=i)
+            objs.append(rv)
+        found = self.storage.between("created_at", now + timedelta(days=1),
+                                     cls_name="Review")
+        self.assertEqual([objs[2], objs[0]], list(found.values()))
+        self.assertEqual(3, len(self.storage.between("created_at", now)))
+
+    def test_inherited_queries(self):
+        """Test the queries that scan the objects."""
+        pl = Place()
+        pl.name = "Sunny loft"
+        pl.latitude = 48.85
+        pl.longitude = 2.35
+        pl.price_by_night = 100
+        pl.save()
+        self.reopen()
+        key = "Place." + pl.id
+        self.assertEqual([key], list(self.storage.near(48.86, 2.35, 5)))
+        self.assertEqual([key], list(self.storage.search("loft")))
+        self.assertEqual(100, self.storage.aggregate("price_by_night"))
+
+
+class TestStorageSelection(unittest.TestCase):
+    """Unit tests for choosing the storage engine."""
+
+    def test_default_engine(self):
+        """Test that FileStorage is the default engine."""
+        self.assertEqual("FileStorage", type(models.storage).__name__)
+
+    def test_db_engine(self):
+        """Test that HBNB_TYPE_STORAGE=db selects DBStorage."""
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, HBNB_TYPE_STORAGE="db",
+                       HBNB_DB_PATH=os.path.join(tmp, "hbnb.db"))
+            code = ("import models; from models.user import User; "
+                    "u = User(); u.save(); "
+                    "print(type(models.storage).__name__)")
+            out = subprocess.run([sys.executable, "-c", code], env=env,
+                                 capture_output=True, text=True, check=True)
+            self.assertEqual("DBStorage", out.stdout.strip())
+            code = "import models; print(models.storage.count('User'))"
+            out = subprocess.run([sys.executable, "-c", code], env=env,
+                                 capture_output=True, text=True, check=True)
+            self.assertEqual("1", out.stdout.strip())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,42 @@
 #!/usr/bin/python3
 """This module defines unit tests for the 'file_storage' engine.
 
-Defines two unittest classes for testing the FileStorage engine:
+Defines unittest classes for testing the FileStorage engine:
 - TestFileStorageInstantiation: Test FileStorage class instantiation.
 - TestFileStorageMethods: Test FileStorage class methods.
+- TestFileStorageJournal: Test the append-only journal mode.
+- TestFileStorageCompaction: Test folding the journal into a snapshot.
+- TestFileStorageDirtyTracking: Test saving only the changed objects.
+- TestFileStorageSharded: Test saving each class to its own file.
+- TestFileStorageLazy: Test building objects on first access.
+- TestIterFileEntries: Test streaming the members of a JSON file.
+- TestFileStorageStreaming: Test reloading one record at a time.
+- TestFileStorageBinary: Test saving objects in the binary format.
+- TestFileStorageMmap: Test reading records from a memory-mapped file.
+- TestFileStorageDurability: Test fsync'd saves and checksum trailers.
+- TestFileStorageRelations: Test finding objects by parent id.
+- TestFileStorageTimeline: Test finding objects by timestamp range.
+- TestFileStorageGeo: Test finding places by their coordinates.
+- TestFileStorageSearch: Test the full-text search of places and reviews.
+- TestFileStorageAggregate: Test aggregating the numbers of places.
+- TestFileStorageCache: Test bounding the number of built objects.
+- TestFileStorageLocking: Test sharing the storage between processes.
 """
 import os
+import sys
+import glob
 import json
+import mmap
+import fcntl
 import models
+import tempfile
+import threading
+import subprocess
 import unittest
+import zlib
+from io import BytesIO, StringIO
 from datetime import datetime
+from unittest.mock import patch
 from models.user import User
 from models.city import City
 from models.state import State
@@ -18,6 +45,11 @@ from models.review import Review
 from models.amenity import Amenity
 from models.base_model import BaseModel
 from models.engine.file_storage import FileStorage
+from models.engine.file_storage import iter_file_entries
+from models.engine.file_storage import iter_mmap_offsets, iter_mmap_indexed
+from models.engine.file_storage import iter_indexed_entries, member_starts
+from models.engine.text_index import InvertedIndex
+from models.engine.columns import ColumnStore
 
 
 class TestFileStorageInstantiation(unittest.TestCase):
@@ -78,6 +110,31 @@ class TestFileStorageMethods(unittest.TestCase):
         with self.assertRaises(TypeError):
             models.storage.all(None)
 
+    def test_all_of_class(self):
+        """Test 'all' restricted to the objects of one class."""
+        us = User()
+        us2 = User()
+        st = State()
+        self.assertEqual({"User." + us.id: us, "User." + us2.id: us2},
+                         models.storage.all(cls_name="User"))
+        self.assertEqual({"State." + st.id: st},
+                         models.storage.all(cls_name="State"))
+        self.assertEqual({}, models.storage.all(cls_name="MyModel"))
+
+    def test_count(self):
+        """Test the 'count' method of FileStorage."""
+        us = User()
+        User()
+        State()
+        self.assertEqual(2, models.storage.count("User"))
+        self.assertEqual(3, models.storage.count())
+        self.assertEqual(0, models.storage.count("MyModel"))
+        models.storage.delete(us)
+        self.assertEqual(1, models.storage.count("User"))
+        self.assertEqual({}, models.storage.all(cls_name="Place"))
+        FileStorage._FileStorage__objects = {}
+        self.assertEqual(0, models.storage.count("User"))
+
     def test_new(self):
         """Test the 'new' method of FileStorage."""
         bm = BaseModel()
@@ -180,5 +237,1597 @@ class TestFileStorageMethods(unittest.TestCase):
             models.storage.reload(None)
 
 
+class StorageTestCase(unittest.TestCase):
+    """Base class for tests running FileStorage on new files, in
+    journaled mode unless changed by the test.
+
+    Attributes:
+        settings (dict): The settings of FileStorage set for each test,
+            whatever the environment, and restored after it.
+    """
+    settings = {
+        "file_path": "file.json",
+        "log_path": "file.json.log",
+        "journaled": True,
+        "sharded": False,
+        "lazy": False,
+        "mmap": False,
+        "cache_size": 0,
+        "durable": False,
+        "checksum": False,
+        "locking": False,
+        "merging": False,
+        "stemmed": False,
+        "compact_bytes": 0,
+        "compact_ratio": 0
+    }
+
+    def setUp(self):
+        """Set up by moving 'file.json' aside, applying settings and
+        forgetting the objects and indexes of the previous test."""
+        try:
+            os.rename("file.json", "tmp")
+        except IOError:
+            pass
+        self.saved = {}
+        for name, value in self.settings.items():
+            self.saved[name] = getattr(FileStorage, "_FileStorage__" + name)
+            setattr(FileStorage, "_FileStorage__" + name, value)
+        self.reset()
+
+    def tearDown(self):
+        """Cleanup by removing the files, restoring 'file.json' and the
+        settings."""
+        compactor = FileStorage._FileStorage__compactor
+        if compactor is not None:
+            compactor.join()
+        for path in ("file.json", "file.json.log", "file.json.log.old"):
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+        for path in glob.glob("file*.offsets"):
+            os.remove(path)
+        try:
+            os.rename("tmp", "file.json")
+        except IOError:
+            pass
+        for name, value in self.saved.items():
+            setattr(FileStorage, "_FileStorage__" + name, value)
+        self.reset()
+
+    def reset(self):
+        """Forget the objects, the pending changes and the indexes."""
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__raw = {}
+        FileStorage._FileStorage__dirty = {}
+        FileStorage._FileStorage__deleted = set()
+        FileStorage._FileStorage__created = set()
+        FileStorage._FileStorage__fragments = {}
+        FileStorage._FileStorage__sources = {}
+        FileStorage._FileStorage__secondary = {}
+        FileStorage._FileStorage__searched = None
+
+    def save_and_reload(self):
+        """Save the objects, then reload them from an empty storage."""
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+
+    def read_log(self):
+        """Return the list of records in the journal file."""
+        with open("file.json.log") as f:
+            return [json.loads(line) for line in f]
+
+
+class TestFileStorageJournal(StorageTestCase):
+    """Unit tests for the journaled mode of the FileStorage class."""
+    def test_save_appends_without_snapshot(self):
+        """Test that a journaled save appends records only."""
+        us = User()
+        models.storage.save()
+        self.assertFalse(os.path.exists("file.json"))
+        recs = self.read_log()
+        self.assertEqual(1, len(recs))
+        self.assertEqual("put", recs[0]["op"])
+        self.assertEqual("User." + us.id, recs[0]["key"])
+
+    def test_save_appends_only_changes(self):
+        """Test that each save appends only the operations since the last."""
+        User()
+        models.storage.save()
+        pl = Place()
+        models.storage.save()
+        models.storage.save()
+        recs = self.read_log()
+        self.assertEqual(2, len(recs))
+        self.assertEqual("Place." + pl.id, recs[1]["key"])
+
+    def test_delete_is_journaled(self):
+        """Test that deleting an object appends a delete record."""
+        st = State()
+        models.storage.save()
+        models.storage.delete(st)
+        models.storage.save()
+        self.assertNotIn("State." + st.id, models.storage.all())
+        recs = self.read_log()
+        self.assertEqual({"op": "delete", "key": "State." + st.id}, recs[-1])
+
+    def test_reload_replays_on_snapshot(self):
+        """Test that reload applies the journal over the snapshot."""
+        FileStorage._FileStorage__journaled = False
+        cy = City()
+        rv = Review()
+        models.storage.save()
+        FileStorage._FileStorage__journaled = True
+        cy.name = "Lagos"
+        cy.save()
+        models.storage.delete(rv)
+        am = Amenity()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        objs = models.storage.all()
+        self.assertEqual("Lagos", objs["City." + cy.id].name)
+        self.assertNotIn("Review." + rv.id, objs)
+        self.assertIn("Amenity." + am.id, objs)
+
+    def test_reload_ignores_torn_last_record(self):
+        """Test that a partially written last record is skipped."""
+        us = User()
+        models.storage.save()
+        with open("file.json.log", "a") as f:
+            f.write('{"op": "put", "key": "User.x", "da')
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual(["User." + us.id], list(models.storage.all()))
+
+    def test_unjournaled_save_folds_journal(self):
+        """Test that a full save writes a snapshot and drops the journal."""
+        us = User()
+        models.storage.save()
+        FileStorage._FileStorage__journaled = False
+        models.storage.save()
+        self.assertFalse(os.path.exists("file.json.log"))
+        with open("file.json") as f:
+            self.assertIn("User." + us.id, f.read())
+
+
+class TestFileStorageCompaction(StorageTestCase):
+    """Unit tests for compacting the journal of the FileStorage class."""
+
+    def test_compact_folds_journal(self):
+        """Test that compaction writes a snapshot and empties the journal."""
+        us = User()
+        st = State()
+        models.storage.save()
+        us.first_name = "Betty"
+        us.save()
+        models.storage.delete(st)
+        models.storage.save()
+        stats = models.storage.compact()
+        self.assertFalse(os.path.exists("file.json.log"))
+        self.assertFalse(os.path.exists("file.json.log.old"))
+        with open("file.json") as f:
+            objdict = json.load(f)
+        self.assertEqual(["User." + us.id], list(objdict))
+        self.assertEqual("Betty", objdict["User." + us.id]["first_name"])
+        self.assertEqual(3, stats["records"])
+        self.assertLess(0, stats["bytes"])
+        self.assertEqual(stats, models.storage.last_compaction())
+
+    def test_compact_without_journal(self):
+        """Test that compacting with no journal reclaims nothing."""
+        self.assertEqual({"bytes": 0, "records": 0}, models.storage.compact())
+
+    def test_writes_during_compaction_are_kept(self):
+        """Test that records appended after rotation survive the fold."""
+        us = User()
+        models.storage.save()
+        os.rename("file.json.log", "file.json.log.old")
+        pl = Place()
+        models.storage.save()
+        models.storage.compact()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertIn("User." + us.id, models.storage.all())
+        self.assertIn("Place." + pl.id, models.storage.all())
+        self.assertTrue(os.path.exists("file.json.log"))
+
+    def test_reload_replays_rotated_journal(self):
+        """Test that reload replays a journal left by an unfinished fold."""
+        us = User()
+        models.storage.save()
+        os.rename("file.json.log", "file.json.log.old")
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertIn("User." + us.id, models.storage.all())
+
+    def test_threshold_triggers_background_compaction(self):
+        """Test that passing the size threshold compacts in the background."""
+        FileStorage._FileStorage__compact_bytes = 1
+        us = User()
+        models.storage.save()
+        FileStorage._FileStorage__compactor.join()
+        self.assertFalse(os.path.exists("file.json.log.old"))
+        with open("file.json") as f:
+            self.assertIn("User." + us.id, f.read())
+        self.assertEqual(0, models.storage.last_compaction()["records"])
+
+
+class TestFileStorageDirtyTracking(StorageTestCase):
+    """Unit tests for the dirty-object tracking of the FileStorage class."""
+
+    def setUp(self):
+        """Set up in snapshot mode with no dirty objects."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+
+    def test_setattr_marks_dirty(self):
+        """Test that assigning an attribute marks the object dirty."""
+        us = User()
+        models.storage.save()
+        us.first_name = "Betty"
+        dirty = FileStorage._FileStorage__dirty
+        self.assertEqual({"User." + us.id: {"first_name"}}, dirty)
+
+    def test_list_changed_in_place_saved(self):
+        """Test that a list changed in place is saved."""
+        pl = Place()
+        pl.amenity_ids = []
+        models.storage.save()
+        pl.amenity_ids.append("wifi")
+        models.storage.save()
+        with open("file.json") as f:
+            objdict = json.load(f)
+        self.assertEqual(["wifi"], objdict["Place." + pl.id]["amenity_ids"])
+
+    def test_list_changed_in_place_journaled(self):
+        """Test that a list changed in place is journaled, once."""
+        FileStorage._FileStorage__journaled = True
+        pl = Place()
+        pl.amenity_ids = []
+        models.storage.save()
+        pl.amenity_ids.append("wifi")
+        pl.save()
+        models.storage.save()
+        records = self.read_log()
+        self.assertEqual(2, len(records))
+        self.assertEqual(["wifi"], records[1]["data"]["amenity_ids"])
+        pl.amenity_ids.append("pool")
+        models.storage.save()
+        records = self.read_log()
+        self.assertEqual(3, len(records))
+        self.assertEqual(["wifi", "pool"], records[2]["data"]["amenity_ids"])
+
+    def test_save_encodes_changed_objects_only(self):
+        """Test that objects holding unread lists are not encoded again."""
+        FileStorage._FileStorage__journaled = True
+        pls = [Place() for i in range(3)]
+        for pl in pls:
+            pl.amenity_ids = ["wifi"]
+        models.storage.save()
+        self.assertEqual({}, FileStorage._FileStorage__dirty)
+        pls[0].name = "Loft"
+        with patch.object(Place, "to_dict", autospec=True,
+                          side_effect=Place.to_dict) as to_dict:
+            models.storage.save()
+        self.assertEqual([pls[0]], [c.args[0] for c in to_dict.call_args_list])
+        self.assertEqual(["wifi"], pls[1].amenity_ids)
+        self.assertEqual({"amenity_ids"},
+                         FileStorage._FileStorage__dirty["Place." + pls[1].id])
+
+    def test_unstored_object_not_tracked(self):
+        """Test that objects missing from storage are not marked dirty."""
+        dt = datetime.today().isoformat()
+        us = User(id="1", created_at=dt, updated_at=dt)
+        us.first_name = "Betty"
+        self.assertEqual({}, FileStorage._FileStorage__dirty)
+
+    def test_save_serializes_only_dirty(self):
+        """Test that save calls to_dict only on the changed objects."""
+        us = User()
+        pl = Place()
+        rv = Review()
+        models.storage.save()
+        pl.name = "Loft"
+        with patch.object(BaseModel, "to_dict", autospec=True,
+                          side_effect=BaseModel.to_dict) as to_dict:
+            models.storage.save()
+        to_dict.assert_called_once_with(pl)
+        with open("file.json") as f:
+            objdict = json.load(f)
+        self.assertEqual("Loft", objdict["Place." + pl.id]["name"])
+        self.assertIn("User." + us.id, objdict)
+        self.assertIn("Review." + rv.id, objdict)
+
+    def test_clean_save_encodes_nothing(self):
+        """Test that saving unchanged objects only copies fragments."""
+        us = User()
+        st = State()
+        models.storage.save()
+        with open("file.json") as f:
+            text = f.read()
+        with patch("json.dumps", side_effect=AssertionError):
+            models.storage.save()
+        with open("file.json") as f:
+            self.assertEqual(text, f.read())
+
+    def test_timestamp_change_reencodes(self):
+        """Test that changing a timestamp invalidates the fragment."""
+        us = User()
+        models.storage.save()
+        us.updated_at = datetime(2020, 1, 2, 3, 4, 5, 6)
+        models.storage.save()
+        with open("file.json") as f:
+            objdict = json.load(f)
+        self.assertEqual("2020-01-02T03:04:05.000006",
+                         objdict["User." + us.id]["updated_at"])
+
+    def test_save_drops_deleted_fragments(self):
+        """Test that deleted objects are not written from the cache."""
+        us = User()
+        st = State()
+        models.storage.save()
+        models.storage.delete(st)
+        models.storage.save()
+        with open("file.json") as f:
+            objdict = json.load(f)
+        self.assertEqual(["User." + us.id], list(objdict))
+
+    def test_journal_writes_changed_fields(self):
+        """Test that the journal only carries the changed attributes."""
+        FileStorage._FileStorage__journaled = True
+        us = User()
+        models.storage.save()
+        us.first_name = "Betty"
+        models.storage.save()
+        recs = self.read_log()
+        self.assertEqual({"first_name": "Betty"}, recs[-1]["data"])
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        us2 = models.storage.all()["User." + us.id]
+        self.assertEqual("Betty", us2.first_name)
+        self.assertEqual(us.created_at, us2.created_at)
+
+
+class TestFileStorageSharded(StorageTestCase):
+    """Unit tests for the sharded mode of the FileStorage class."""
+
+    def setUp(self):
+        """Set up in sharded snapshot mode."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+        FileStorage._FileStorage__sharded = True
+
+    def tearDown(self):
+        """Cleanup by removing the shard files."""
+        for path in glob.glob("file.*.json"):
+            os.remove(path)
+        super().tearDown()
+
+    def test_save_writes_one_file_per_class(self):
+        """Test that each class is saved to its own file."""
+        us = User()
+        pl = Place()
+        models.storage.save()
+        self.assertFalse(os.path.exists("file.json"))
+        with open("file.User.json") as f:
+            self.assertEqual(["User." + us.id], list(json.load(f)))
+        with open("file.Place.json") as f:
+            self.assertEqual(["Place." + pl.id], list(json.load(f)))
+
+    def test_save_rewrites_only_touched_shards(self):
+        """Test that untouched shards are not rewritten."""
+        us = User()
+        Place()
+        models.storage.save()
+        os.remove("file.Place.json")
+        us.first_name = "Betty"
+        models.storage.save()
+        self.assertFalse(os.path.exists("file.Place.json"))
+        with open("file.User.json") as f:
+            self.assertIn("Betty", f.read())
+
+    def test_save_removes_empty_shard(self):
+        """Test that deleting the last object of a class drops its file."""
+        st = State()
+        models.storage.save()
+        models.storage.delete(st)
+        models.storage.save()
+        self.assertFalse(os.path.exists("file.State.json"))
+
+    def test_reload_selected_classes(self):
+        """Test that reload can load only some classes."""
+        us = User()
+        rv = Review()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload(classes=["Review"])
+        self.assertEqual(["Review." + rv.id], list(models.storage.all()))
+        models.storage.reload(classes=["User"])
+        self.assertIn("User." + us.id, models.storage.all())
+
+    def test_reload_selected_classes_single_file(self):
+        """Test that reload can select classes from a single file."""
+        FileStorage._FileStorage__sharded = False
+        us = User()
+        am = Amenity()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload(classes=["Amenity"])
+        self.assertEqual(["Amenity." + am.id],
+                         list(FileStorage._FileStorage__objects))
+        self.assertIn("User." + us.id, FileStorage._FileStorage__raw)
+
+    def test_save_after_reload_selected_classes(self):
+        """Test that a save after loading only some classes from a single
+        file keeps the records of the other classes."""
+        FileStorage._FileStorage__sharded = False
+        us = User()
+        pl = Place()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload(classes=["User"])
+        models.storage.get("User", us.id).first_name = "Betty"
+        models.storage.save()
+        FileStorage._FileStorage__raw = {}
+        with open("file.json") as f:
+            objdict = json.load(f)
+        self.assertEqual(pl.to_dict(), objdict["Place." + pl.id])
+        self.assertEqual("Betty", objdict["User." + us.id]["first_name"])
+
+    def test_compact_writes_touched_shards(self):
+        """Test that compaction folds the journal into the shards."""
+        us = User()
+        models.storage.save()
+        FileStorage._FileStorage__journaled = True
+        cy = City()
+        models.storage.delete(us)
+        models.storage.save()
+        models.storage.compact()
+        self.assertFalse(os.path.exists("file.User.json"))
+        with open("file.City.json") as f:
+            self.assertEqual(["City." + cy.id], list(json.load(f)))
+
+
+class TestFileStorageLazy(StorageTestCase):
+    """Unit tests for the lazy mode of the FileStorage class."""
+
+    def setUp(self):
+        """Set up in lazy snapshot mode."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+        FileStorage._FileStorage__lazy = True
+
+    def test_reload_builds_nothing(self):
+        """Test that reload keeps the records as text."""
+        us = User()
+        self.save_and_reload()
+        self.assertEqual({}, FileStorage._FileStorage__objects)
+        self.assertIn("User." + us.id, FileStorage._FileStorage__raw)
+
+    def test_get_builds_one_object(self):
+        """Test that get builds only the requested object."""
+        us = User()
+        us.first_name = "Betty"
+        pl = Place()
+        self.save_and_reload()
+        us2 = models.storage.get("User", us.id)
+        self.assertEqual("Betty", us2.first_name)
+        self.assertEqual(us.created_at, us2.created_at)
+        self.assertIs(us2, models.storage.get("User", us.id))
+        self.assertEqual(["User." + us.id],
+                         list(FileStorage._FileStorage__objects))
+        self.assertIn("Place." + pl.id, FileStorage._FileStorage__raw)
+        self.assertIsNone(models.storage.get("User", "missing"))
+
+    def test_all_builds_every_object(self):
+        """Test that all builds the remaining objects."""
+        us = User()
+        rv = Review()
+        self.save_and_reload()
+        objs = models.storage.all()
+        self.assertEqual(User, type(objs["User." + us.id]))
+        self.assertEqual(Review, type(objs["Review." + rv.id]))
+        self.assertEqual({}, FileStorage._FileStorage__raw)
+
+    def test_count_and_all_of_class(self):
+        """Test counting without building and building only one class."""
+        us = User()
+        Review()
+        self.save_and_reload()
+        self.assertEqual(1, models.storage.count("Review"))
+        self.assertEqual(2, models.storage.count())
+        self.assertEqual({}, FileStorage._FileStorage__objects)
+        objs = models.storage.all(cls_name="User")
+        self.assertEqual(["User." + us.id], list(objs))
+        self.assertEqual(["User." + us.id],
+                         list(FileStorage._FileStorage__objects))
+
+    def test_save_keeps_unbuilt_records(self):
+        """Test that records never accessed are saved unchanged."""
+        us = User()
+        st = State()
+        self.save_and_reload()
+        models.storage.get("State", st.id).name = "Lagos"
+        models.storage.save()
+        with open("file.json") as f:
+            objdict = json.load(f)
+        self.assertEqual(us.to_dict(), objdict["User." + us.id])
+        self.assertEqual("Lagos", objdict["State." + st.id]["name"])
+
+    def test_reload_reads_saved_offsets(self):
+        """Test that reload finds the records at their saved positions
+        instead of scanning the file, unless it changed since."""
+        us = User()
+        us.first_name = "Betty"
+        pl = Place()
+        models.storage.save()
+        self.assertTrue(os.path.exists("file.json.offsets"))
+        FileStorage._FileStorage__objects = {}
+        scan = "models.engine.file_storage._scan_member"
+        with patch(scan, side_effect=AssertionError):
+            models.storage.reload()
+        self.assertEqual(us.to_dict(),
+                         models.storage.get("User", us.id).to_dict())
+        self.assertIn("Place." + pl.id, FileStorage._FileStorage__raw)
+        with open("file.json") as f:
+            objdict = json.load(f)
+        del objdict["Place." + pl.id]
+        with open("file.json", "w") as f:
+            json.dump(objdict, f)
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__raw = {}
+        models.storage.reload()
+        self.assertEqual(["User." + us.id],
+                         list(FileStorage._FileStorage__raw))
+
+    def test_journaled_records_built_on_reload(self):
+        """Test that records changed by the journal are built eagerly."""
+        us = User()
+        cy = City()
+        models.storage.save()
+        FileStorage._FileStorage__journaled = True
+        cy.name = "Lagos"
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual(["City." + cy.id],
+                         list(FileStorage._FileStorage__objects))
+        self.assertEqual("Lagos", models.storage.get("City", cy.id).name)
+        self.assertIsNotNone(models.storage.get("User", us.id))
+
+
+class TestIterFileEntries(unittest.TestCase):
+    """Unit tests for the iter_file_entries function."""
+
+    text = ('{"User.1": {"name": "a \\"}\\" b", "ids": [1, 2]},\n'
+            ' "Place.2": {"price": 12}, "City.3": {}}')
+
+    def test_any_chunk_size(self):
+        """Test that chunk boundaries do not change the members read."""
+        expected = [("User.1", '{"name": "a \\"}\\" b", "ids": [1, 2]}'),
+                    ("Place.2", '{"price": 12}'), ("City.3", "{}")]
+        for size in range(1, len(self.text) + 2):
+            entries = list(iter_file_entries(StringIO(self.text), size))
+            self.assertEqual(expected, entries)
+
+    def test_empty_object(self):
+        """Test streaming an empty object split across chunks."""
+        for size in (1, 2, 10):
+            self.assertEqual([], list(iter_file_entries(StringIO("{ }"),
+                                                        size)))
+
+    def test_malformed(self):
+        """Test that malformed text raises a JSONDecodeError."""
+        for text in ("[]", '{"a": 1 "b": 2}', '{"a" 1}', '{"a": }', "{1: 2}"):
+            with self.assertRaises(json.JSONDecodeError):
+                list(iter_file_entries(StringIO(text)))
+
+    def test_truncated_file(self):
+        """Test that a truncated file raises a JSONDecodeError."""
+        for text in ("", '{"a": {"b": 1}', '{"a": {"b": 1},'):
+            with self.assertRaises(json.JSONDecodeError):
+                list(iter_file_entries(StringIO(text), 4))
+
+    def test_reads_in_chunks(self):
+        """Test that the file is read in chunks of the given size."""
+        f = StringIO(self.text)
+        entries = iter_file_entries(f, 8)
+        next(entries)
+        self.assertLess(f.tell(), len(self.text))
+
+    def test_indexed_entries(self):
+        """Test reading the members at their saved positions."""
+        parts = ['"User.1": {"name": "a \\"}\\" b", "ids": [1, 2]}',
+                 '"Place.\\"2": {"price": 12}', '"City.3": {}']
+        data = ("{" + ", ".join(parts) + "}").encode("ascii")
+        starts = member_starts(parts)
+        self.assertEqual(len(data) + 1, starts[-1])
+        expected = [("User.1", '{"name": "a \\"}\\" b", "ids": [1, 2]}'),
+                    ('Place."2', '{"price": 12}'), ("City.3", "{}")]
+        for size in range(1, len(data) + 2):
+            entries = iter_indexed_entries(BytesIO(data).read, starts, size)
+            self.assertEqual(expected, list(entries))
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.assertEqual(expected, [(k, mm[b:e].decode("ascii")) for
+                                        k, b, e in iter_mmap_indexed(mm,
+                                                                     starts)])
+            mm.close()
+        self.assertEqual([], list(iter_indexed_entries(BytesIO(b"{}").read,
+                                                       member_starts([]))))
+
+
+class TestFileStorageStreaming(StorageTestCase):
+    """Unit tests for the streaming reload of the FileStorage class."""
+
+    def setUp(self):
+        """Set up in snapshot mode."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+
+    def test_reload_does_not_load_whole_file(self):
+        """Test that reload does not parse the file in one go."""
+        us = User()
+        pl = Place()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        with patch("json.load", side_effect=AssertionError):
+            models.storage.reload()
+        self.assertEqual(us.to_dict(),
+                         models.storage.all()["User." + us.id].to_dict())
+        self.assertIn("Place." + pl.id, models.storage.all())
+
+    def test_reload_keeps_no_text(self):
+        """Test that reload does not keep the text of the objects it
+        builds, and that save keeps the text it writes."""
+        us = User()
+        self.save_and_reload()
+        self.assertEqual({}, FileStorage._FileStorage__fragments)
+        models.storage.save()
+        with open("file.json") as f:
+            self.assertEqual(us.to_dict(), json.load(f)["User." + us.id])
+        with patch.object(BaseModel, "to_dict", side_effect=AssertionError):
+            models.storage.save()
+
+
+class TestFileStorageBinary(StorageTestCase):
+    """Unit tests for the binary format of the FileStorage class."""
+
+    def setUp(self):
+        """Set up to save objects to 'file.bin'."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+        FileStorage._FileStorage__file_path = "file.bin"
+        FileStorage._FileStorage__log_path = "file.bin.log"
+
+    def tearDown(self):
+        """Cleanup by removing the binary files."""
+        for path in glob.glob("file*.bin*"):
+            os.remove(path)
+        super().tearDown()
+
+    def test_save_and_reload(self):
+        """Test that objects survive a binary save and reload."""
+        us = User()
+        us.first_name = "Betty"
+        pl = Place()
+        pl.amenity_ids = ["a"]
+        self.save_and_reload()
+        with open("file.bin", "rb") as f:
+            self.assertNotIn(b"{", f.read(1))
+        self.assertFalse(os.path.exists("file.json"))
+        objs = models.storage.all()
+        self.assertEqual(us.to_dict(), objs["User." + us.id].to_dict())
+        self.assertEqual(pl.to_dict(), objs["Place." + pl.id].to_dict())
+
+    def test_journal_and_compaction(self):
+        """Test that the journal is folded into the binary snapshot."""
+        us = User()
+        models.storage.save()
+        FileStorage._FileStorage__journaled = True
+        us.last_name = "Holberton"
+        models.storage.save()
+        models.storage.compact()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual("Holberton",
+                         models.storage.all()["User." + us.id].last_name)
+
+    def test_sharded_and_lazy(self):
+        """Test binary shards loaded lazily."""
+        FileStorage._FileStorage__sharded = True
+        FileStorage._FileStorage__lazy = True
+        rv = Review()
+        rv.text = "Great"
+        self.save_and_reload()
+        self.assertTrue(os.path.exists("file.Review.bin"))
+        self.assertEqual({}, FileStorage._FileStorage__objects)
+        self.assertEqual("Great", models.storage.get("Review", rv.id).text)
+
+
+class TestFileStorageMmap(StorageTestCase):
+    """Unit tests for the memory-mapped read path of FileStorage."""
+
+    def setUp(self):
+        """Set up in memory-mapped snapshot mode."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+        FileStorage._FileStorage__mmap = True
+
+    def tearDown(self):
+        """Cleanup by removing the binary files."""
+        for path in glob.glob("file.bin*"):
+            os.remove(path)
+        super().tearDown()
+
+    def test_iter_mmap_offsets(self):
+        """Test indexing the members of a mapped JSON file."""
+        text = '{"a.1": {"x": "}"}, "b.2": [1, 2]}'
+        with open("file.json", "w") as f:
+            f.write(text)
+        with open("file.json", "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        entries = list(iter_mmap_offsets(mm, 5))
+        self.assertEqual([b'{"x": "}"}', b"[1, 2]"],
+                         [mm[b:e] for k, b, e in entries])
+        self.assertEqual(["a.1", "b.2"], [e[0] for e in entries])
+        mm.close()
+
+    def test_reload_indexes_mapped_records(self):
+        """Test that reload keeps views of the mapped file."""
+        us = User()
+        pl = Place()
+        self.save_and_reload()
+        raw = FileStorage._FileStorage__raw
+        self.assertEqual(memoryview, type(raw["User." + us.id]))
+        self.assertEqual({}, FileStorage._FileStorage__objects)
+        self.assertEqual(us.to_dict(),
+                         models.storage.get("User", us.id).to_dict())
+        self.assertIn("Place." + pl.id, raw)
+
+    def test_reload_reads_saved_offsets(self):
+        """Test that reload maps the records at their saved positions
+        instead of scanning the file."""
+        us = User()
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        scan = "models.engine.file_storage._scan_member"
+        with patch(scan, side_effect=AssertionError):
+            models.storage.reload()
+        raw = FileStorage._FileStorage__raw
+        self.assertEqual(memoryview, type(raw["User." + us.id]))
+        self.assertEqual(us.to_dict(),
+                         models.storage.get("User", us.id).to_dict())
+
+    def test_save_keeps_mapped_records_valid(self):
+        """Test that records stay readable after the file is rewritten."""
+        us = User()
+        st = State()
+        self.save_and_reload()
+        models.storage.get("User", us.id).first_name = "Betty"
+        models.storage.save()
+        models.storage.save()
+        self.assertEqual(st.to_dict(),
+                         models.storage.get("State", st.id).to_dict())
+        with open("file.json") as f:
+            objdict = json.load(f)
+        self.assertEqual("Betty", objdict["User." + us.id]["first_name"])
+        self.assertEqual(st.to_dict(), objdict["State." + st.id])
+
+    def test_non_ascii_file_is_copied(self):
+        """Test that a JSON file with non-ASCII text is not mapped."""
+        cy = City()
+        models.storage.save()
+        with open("file.json") as f:
+            objdict = json.load(f)
+        objdict["City." + cy.id]["name"] = "Orléans"
+        with open("file.json", "w", encoding="utf-8") as f:
+            json.dump(objdict, f, ensure_ascii=False)
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        raw = FileStorage._FileStorage__raw
+        self.assertEqual(str, type(raw["City." + cy.id]))
+        self.assertEqual("Orléans", models.storage.get("City", cy.id).name)
+
+    def test_binary_mapped_records(self):
+        """Test the memory-mapped read path of the binary format."""
+        FileStorage._FileStorage__file_path = "file.bin"
+        FileStorage._FileStorage__log_path = "file.bin.log"
+        rv = Review()
+        rv.text = "Great"
+        self.save_and_reload()
+        raw = FileStorage._FileStorage__raw
+        self.assertEqual(memoryview, type(raw["Review." + rv.id]))
+        self.assertEqual("Great", models.storage.get("Review", rv.id).text)
+        self.save_and_reload()
+        self.assertEqual(rv.to_dict(),
+                         models.storage.all()["Review." + rv.id].to_dict())
+
+
+class TestFileStorageDurability(StorageTestCase):
+    """Unit tests for the durable and checksummed saves of FileStorage."""
+
+    def setUp(self):
+        """Set up in checksummed snapshot mode."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+        FileStorage._FileStorage__checksum = True
+
+    def tearDown(self):
+        """Cleanup by removing the binary files."""
+        for path in glob.glob("file.bin*"):
+            os.remove(path)
+        super().tearDown()
+
+    def test_trailer_written_and_checked(self):
+        """Test that the snapshot ends with the CRC-32 of its data."""
+        us = User()
+        us.first_name = "Bétty"
+        self.save_and_reload()
+        with open("file.json", "rb") as f:
+            data = f.read()
+        body, crc = data[:-17], data[-17:]
+        self.assertEqual("\n#crc32:{:08x}\n".format(zlib.crc32(body)),
+                         crc.decode())
+        self.assertEqual(us.to_dict(),
+                         models.storage.all()["User." + us.id].to_dict())
+
+    def test_corrupted_snapshot_raises(self):
+        """Test that reload rejects a snapshot not matching its checksum."""
+        us = User()
+        us.first_name = "Betty"
+        models.storage.save()
+        with open("file.json", "rb") as f:
+            data = f.read()
+        with open("file.json", "wb") as f:
+            f.write(data.replace(b"Betty", b"Bitty"))
+        FileStorage._FileStorage__objects = {}
+        with self.assertRaises(ValueError):
+            models.storage.reload()
+
+    def test_snapshot_without_trailer(self):
+        """Test that a snapshot saved without a checksum still loads."""
+        FileStorage._FileStorage__checksum = False
+        us = User()
+        self.save_and_reload()
+        with open("file.json", "rb") as f:
+            self.assertTrue(f.read().endswith(b"}"))
+        self.assertIn("User." + us.id, models.storage.all())
+
+    def test_binary_and_mmap(self):
+        """Test checksummed binary snapshots, read and memory-mapped."""
+        FileStorage._FileStorage__file_path = "file.bin"
+        FileStorage._FileStorage__log_path = "file.bin.log"
+        pl = Place()
+        pl.number_rooms = 3
+        self.save_and_reload()
+        self.assertEqual(pl.to_dict(),
+                         models.storage.get("Place", pl.id).to_dict())
+        FileStorage._FileStorage__mmap = True
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual(pl.to_dict(),
+                         models.storage.get("Place", pl.id).to_dict())
+
+    def test_durable_save_syncs(self):
+        """Test that durable saves fsync the snapshot and the journal."""
+        FileStorage._FileStorage__durable = True
+        User()
+        with patch("os.fsync") as fsync:
+            models.storage.save()
+        self.assertEqual(2, fsync.call_count)
+        self.assertEqual([], glob.glob("file.json.*tmp"))
+        FileStorage._FileStorage__journaled = True
+        FileStorage._FileStorage__compact_bytes = 1 << 30
+        FileStorage._FileStorage__compact_ratio = 0
+        User()
+        with patch("os.fsync") as fsync:
+            models.storage.save()
+        self.assertEqual(1, fsync.call_count)
+
+    def test_plain_save_does_not_sync(self):
+        """Test that saves skip fsync outside durable mode."""
+        User()
+        with patch("os.fsync") as fsync:
+            models.storage.save()
+        fsync.assert_not_called()
+
+
+class TestFileStorageRelations(StorageTestCase):
+    """Unit tests for the foreign-key indexes of FileStorage."""
+
+    def setUp(self):
+        """Set up in snapshot mode."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+
+    def test_children(self):
+        """Test finding the cities of a state."""
+        st = State()
+        ct = City()
+        ct.state_id = st.id
+        ct2 = City()
+        ct2.state_id = st.id
+        City().state_id = "other"
+        self.assertEqual({"City." + ct.id: ct, "City." + ct2.id: ct2},
+                         models.storage.children("City", "state_id", st.id))
+        self.assertEqual({}, models.storage.children("City", "state_id",
+                                                     "missing"))
+
+    def test_children_follow_changes(self):
+        """Test that the index follows new, changed and deleted objects."""
+        pl = Place()
+        us = User()
+        rv = Review()
+        rv.place_id = pl.id
+        rv.user_id = us.id
+        self.assertEqual([rv], list(models.storage.children(
+            "Review", "user_id", us.id).values()))
+        rv2 = Review()
+        rv2.place_id = pl.id
+        self.assertEqual(2, len(models.storage.children(
+            "Review", "place_id", pl.id)))
+        rv.place_id = "other"
+        self.assertEqual([rv2], list(models.storage.children(
+            "Review", "place_id", pl.id).values()))
+        rv2.__dict__["place_id"] = "other"
+        models.storage.touch(rv2, "place_id")
+        self.assertEqual({}, models.storage.children(
+            "Review", "place_id", pl.id))
+        models.storage.delete(rv)
+        self.assertEqual({}, models.storage.children(
+            "Review", "user_id", us.id))
+
+    def test_children_after_reload(self):
+        """Test the index of reloaded and lazily loaded records."""
+        us = User()
+        pl = Place()
+        pl.user_id = us.id
+        models.storage.save()
+        for lazy in (False, True):
+            FileStorage._FileStorage__lazy = lazy
+            FileStorage._FileStorage__objects = {}
+            models.storage.reload()
+            objs = models.storage.children("Place", "user_id", us.id)
+            self.assertEqual(["Place." + pl.id], list(objs))
+            self.assertEqual(pl.to_dict(), objs["Place." + pl.id].to_dict())
+
+    def test_default_parent_id(self):
+        """Test that objects whose parent id is the class default are
+        indexed under it, as a scan would match them."""
+        pl = Place()
+        pl2 = Place()
+        pl2.city_id = "somewhere"
+        self.assertEqual({"Place." + pl.id: pl}, models.storage.where(
+            "Place", [("city_id", "==", "")]))
+        pl.city_id = "elsewhere"
+        self.assertEqual({}, models.storage.children("Place", "city_id", ""))
+
+    def test_indexes_built_separately(self):
+        """Test that each secondary index is only built and kept current
+        once a query needs it."""
+        pl = Place()
+        pl.user_id = "someone"
+        models.storage.children("Place", "user_id", "someone")
+        self.assertEqual({"relations"},
+                         set(FileStorage._FileStorage__secondary))
+        with patch.object(ColumnStore, "set") as set_column:
+            pl.price_by_night = 80
+            pl.latitude = 1.0
+        set_column.assert_not_called()
+        self.assertEqual({"relations"},
+                         set(FileStorage._FileStorage__secondary))
+        self.assertEqual({"Place." + pl.id: pl},
+                         models.storage.within(0.0, 0.0, 2.0, 2.0))
+        self.assertEqual({"relations", "grid"},
+                         set(FileStorage._FileStorage__secondary))
+
+    def test_children_not_a_relation(self):
+        """Test querying an attribute that is not indexed."""
+        with self.assertRaises(ValueError):
+            models.storage.children("Place", "name", "x")
+        with self.assertRaises(ValueError):
+            models.storage.children("MyModel", "state_id", "x")
+
+
+class TestFileStorageTimeline(StorageTestCase):
+    """Unit tests for the timestamp indexes of FileStorage."""
+
+    def setUp(self):
+        """Set up three users created a day apart."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+        self.users = []
+        for day in (3, 1, 2):
+            us = User()
+            us.created_at = datetime(2023, 10, day, 6, 0, 0, 1)
+            us.updated_at = us.created_at
+            self.users.append(us)
+
+    def test_between(self):
+        """Test ranges of created_at in timestamp order."""
+        u3, u1, u2 = self.users
+        self.assertEqual([u1, u2, u3], list(
+            models.storage.between("created_at").values()))
+        self.assertEqual([u2], list(models.storage.between(
+            "created_at", datetime(2023, 10, 2),
+            datetime(2023, 10, 3)).values()))
+        self.assertEqual([u2, u3], list(models.storage.between(
+            "created_at", datetime(2023, 10, 1, 12)).values()))
+        self.assertEqual({}, models.storage.between(
+            "created_at", cls_name="Place"))
+
+    def test_save_moves_updated_at(self):
+        """Test that save() and delete() keep the index current."""
+        u3, u1, u2 = self.users
+        since = datetime(2023, 10, 2, 12)
+        self.assertEqual([u3], list(models.storage.between(
+            "updated_at", since).values()))
+        u1.save()
+        self.assertEqual([u3, u1], list(models.storage.between(
+            "updated_at", since).values()))
+        models.storage.delete(u3)
+        self.assertEqual([u1], list(models.storage.between(
+            "updated_at", since).values()))
+
+    def test_between_after_reload(self):
+        """Test the index of reloaded and lazily loaded records."""
+        u3, u1, u2 = self.users
+        models.storage.save()
+        for lazy in (False, True):
+            FileStorage._FileStorage__lazy = lazy
+            FileStorage._FileStorage__objects = {}
+            models.storage.reload()
+            objs = models.storage.between("created_at",
+                                          end=datetime(2023, 10, 2, 12))
+            self.assertEqual(["User." + u1.id, "User." + u2.id], list(objs))
+
+
+class TestFileStorageGeo(StorageTestCase):
+    """Unit tests for the spatial index of FileStorage."""
+
+    def setUp(self):
+        """Set up places in Paris, Versailles, London and Fiji, and one
+        at the default coordinates."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+        self.places = {}
+        for name, lat, lon in (("paris", 48.8566, 2.3522),
+                               ("versailles", 48.8049, 2.1204),
+                               ("london", 51.5072, -0.1276),
+                               ("fiji", -17.7134, 178.065)):
+            pl = Place()
+            pl.latitude = lat
+            pl.longitude = lon
+            self.places[name] = pl
+        self.default = Place()
+
+    def test_near(self):
+        """Test radius searches, nearest first."""
+        pls = self.places
+        self.assertEqual([pls["paris"]], list(
+            models.storage.near(48.857, 2.35, 5).values()))
+        self.assertEqual([pls["versailles"], pls["paris"]], list(
+            models.storage.near(48.80, 2.13, 30).values()))
+        self.assertEqual([pls["london"], pls["versailles"], pls["paris"]],
+                         list(models.storage.near(51.5, 0, 400).values()))
+        self.assertEqual(5, len(models.storage.near(0, 0, 30000)))
+        self.assertEqual([self.default], list(
+            models.storage.near(0, 0, 100).values()))
+        self.assertEqual({}, models.storage.near(10, 10, 100))
+
+    def test_near_antimeridian_and_pole(self):
+        """Test radius searches crossing the antimeridian and a pole."""
+        fiji = self.places["fiji"]
+        self.assertEqual([fiji], list(
+            models.storage.near(-17.7, -179.9, 300).values()))
+        self.assertEqual({}, models.storage.near(89.9, 0, 300))
+
+    def test_within(self):
+        """Test bounding box searches."""
+        pls = self.places
+        objs = models.storage.within(48, 2, 49.5, 3)
+        self.assertEqual({pls["paris"], pls["versailles"]},
+                         set(objs.values()))
+        objs = models.storage.within(-20, 170, -10, -170)
+        self.assertEqual([pls["fiji"]], list(objs.values()))
+        self.assertEqual([self.default], list(
+            models.storage.within(0, 0, 1, 1).values()))
+        self.assertEqual({}, models.storage.within(1, 1, 2, 2))
+
+    def test_index_follows_changes(self):
+        """Test that the grid follows moved and deleted places."""
+        pl = self.places["london"]
+        self.assertEqual(1, len(models.storage.near(51.5, -0.13, 5)))
+        pl.latitude = 48.8584
+        pl.longitude = 2.2945
+        self.assertEqual({}, models.storage.near(51.5, -0.13, 5))
+        self.assertIn(pl, models.storage.near(48.857, 2.35, 5).values())
+        models.storage.delete(pl)
+        self.assertNotIn(pl, models.storage.near(48.857, 2.35, 5).values())
+
+    def test_near_after_reload(self):
+        """Test the grid of reloaded and lazily loaded records."""
+        models.storage.save()
+        for lazy in (False, True):
+            FileStorage._FileStorage__lazy = lazy
+            FileStorage._FileStorage__objects = {}
+            models.storage.reload()
+            objs = models.storage.near(48.857, 2.35, 5)
+            self.assertEqual(["Place." + self.places["paris"].id],
+                             list(objs))
+
+
+class TestFileStorageSearch(StorageTestCase):
+    """Unit tests for the full-text search of FileStorage."""
+
+    def setUp(self):
+        """Set up a place and two reviews."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+        self.pl = Place()
+        self.pl.name = "River loft"
+        self.pl.description = "A quiet loft"
+        self.rv = Review()
+        self.rv.text = "Great view of the river"
+        self.rv2 = Review()
+        self.rv2.text = "Noisy"
+
+    def tearDown(self):
+        """Cleanup by removing the saved index."""
+        for path in glob.glob("file.json.search*"):
+            os.remove(path)
+        super().tearDown()
+
+    def reindexed(self):
+        """Return the keys indexed by the next search for 'river'."""
+        with patch.object(InvertedIndex, "add", autospec=True,
+                          side_effect=InvertedIndex.add) as add:
+            models.storage.search("river")
+        return {call.args[1] for call in add.call_args_list}
+
+    def test_search(self):
+        """Test ranked results across classes and for one class."""
+        self.assertEqual([self.pl, self.rv], list(
+            models.storage.search("loft river").values()))
+        self.assertEqual([self.rv], list(
+            models.storage.search("river", "Review").values()))
+        self.assertEqual({}, models.storage.search("pool"))
+
+    def test_search_follows_changes(self):
+        """Test that the index follows created, changed and deleted
+        objects."""
+        models.storage.search("river")
+        self.rv2.text = "River noise"
+        rv3 = Review()
+        rv3.text = "river"
+        models.storage.delete(self.rv)
+        self.assertEqual({self.pl, self.rv2, rv3}, set(
+            models.storage.search("river").values()))
+
+    def test_saved_index_is_reused(self):
+        """Test that reload reuses the index saved on close."""
+        models.storage.search("river")
+        models.storage.save()
+        self.assertFalse(os.path.exists("file.json.search"))
+        models.storage.close()
+        self.assertTrue(os.path.exists("file.json.search"))
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual(set(), self.reindexed())
+        self.assertEqual(["Place." + self.pl.id, "Review." + self.rv.id],
+                         list(models.storage.search("loft river")))
+
+    def test_journal_changes_are_reindexed(self):
+        """Test that only the objects changed since the snapshot are
+        indexed again."""
+        models.storage.search("river")
+        models.storage.save()
+        models.storage.close()
+        FileStorage._FileStorage__journaled = True
+        self.rv2.text = "river"
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual({"Review." + self.rv2.id}, self.reindexed())
+        self.assertEqual(3, len(models.storage.search("river")))
+
+    def test_stale_index_is_rebuilt(self):
+        """Test that an index older than the snapshot is not used."""
+        models.storage.search("river")
+        models.storage.save()
+        models.storage.close()
+        FileStorage._FileStorage__searched = None
+        self.rv2.text = "river"
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__lazy = True
+        models.storage.reload()
+        self.assertEqual(3, len(self.reindexed()))
+        self.assertEqual(3, len(models.storage.search("river")))
+
+    def test_index_not_saved_with_pending_changes(self):
+        """Test that close does not save an index that does not match the
+        snapshot."""
+        models.storage.search("river")
+        models.storage.save()
+        self.rv2.text = "river"
+        models.storage.close()
+        self.assertFalse(os.path.exists("file.json.search"))
+        models.storage.save()
+        with open("file.json", "a") as f:
+            f.write(" ")
+        models.storage.close()
+        self.assertFalse(os.path.exists("file.json.search"))
+
+    def test_reload_rebuilds_index(self):
+        """Test that a reload indexes the records another process saved."""
+        models.storage.search("river")
+        models.storage.save()
+        rv = Review(text="A castle", id="castle")
+        with open("file.json") as f:
+            objdict = json.load(f)
+        objdict["Review.castle"] = rv.to_dict()
+        with open("file.json", "w") as f:
+            json.dump(objdict, f)
+        models.storage.reload()
+        self.assertEqual(["Review.castle"],
+                         list(models.storage.search("castle")))
+
+    def test_stemmed(self):
+        """Test that stemming matches other forms of a word."""
+        FileStorage._FileStorage__stemmed = True
+        self.rv2.text = "Great views"
+        self.assertEqual({self.rv, self.rv2}, set(
+            models.storage.search("viewing").values()))
+
+
+class TestFileStorageAggregate(StorageTestCase):
+    """Unit tests for the aggregations of FileStorage."""
+
+    def setUp(self):
+        """Set up three places in two cities and a default place."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+        self.places = []
+        for city_id, price in (("c1", 100), ("c1", 50), ("c2", 80)):
+            pl = Place()
+            pl.city_id = city_id
+            pl.price_by_night = price
+            self.places.append(pl)
+        Place()
+        User()
+
+    def test_aggregate(self):
+        """Test aggregating all places and the places of each city."""
+        self.assertEqual(4, models.storage.aggregate("price_by_night",
+                                                     "count"))
+        self.assertEqual(57.5, models.storage.aggregate("price_by_night"))
+        self.assertEqual({"c1": 100, "c2": 80, "": 0},
+                         models.storage.aggregate("price_by_night", "max",
+                                                  "city_id"))
+
+    def test_aggregate_follows_changes(self):
+        """Test that the columns follow changed and deleted places."""
+        models.storage.aggregate("price_by_night")
+        self.places[0].price_by_night = 20
+        self.places[1].city_id = "c2"
+        models.storage.delete(self.places[2])
+        pl = Place()
+        pl.city_id = "c3"
+        pl.price_by_night = 300
+        self.assertEqual({"c1": 20, "c2": 50, "": 0, "c3": 300},
+                         models.storage.aggregate("price_by_night", "sum",
+                                                  "city_id"))
+
+    def test_histogram(self):
+        """Test counting places by price."""
+        self.assertEqual([1, 2, 1], models.storage.histogram(
+            "price_by_night", [0, 50, 100, 150]))
+
+    def test_aggregate_after_reload(self):
+        """Test the columns of lazily loaded records."""
+        models.storage.save()
+        FileStorage._FileStorage__lazy = True
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        self.assertEqual(230, models.storage.aggregate("price_by_night",
+                                                       "sum"))
+        self.assertEqual({}, FileStorage._FileStorage__objects)
+
+    def test_invalid_arguments(self):
+        """Test unsupported attributes, functions and groups."""
+        with self.assertRaises(ValueError):
+            models.storage.aggregate("name")
+        with self.assertRaises(ValueError):
+            models.storage.aggregate("max_guest", "median")
+        with self.assertRaises(ValueError):
+            models.storage.aggregate("max_guest", "sum", "name")
+        with self.assertRaises(ValueError):
+            models.storage.histogram("id", [0, 1])
+
+
+class TestFileStorageCache(StorageTestCase):
+    """Unit tests for the bounded cache of built objects of FileStorage."""
+
+    def setUp(self):
+        """Set up in snapshot mode with a cache of two objects."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+        FileStorage._FileStorage__cache_size = 2
+
+    def save_and_reload(self, count):
+        """Save count new users, then reload them and return their ids,
+        starting the statistics of the cache over."""
+        ids = [User().id for i in range(count)]
+        models.storage.save()
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        FileStorage._FileStorage__hits = 0
+        FileStorage._FileStorage__misses = 0
+        FileStorage._FileStorage__evictions = 0
+        return ids
+
+    def test_bounded(self):
+        """Test that at most two objects stay built."""
+        ids = self.save_and_reload(5)
+        self.assertEqual({}, FileStorage._FileStorage__objects)
+        for obj_id in ids:
+            self.assertEqual(obj_id, models.storage.get("User", obj_id).id)
+        self.assertEqual(["User." + i for i in ids[3:]],
+                         list(FileStorage._FileStorage__objects))
+        self.assertEqual(5, models.storage.count())
+        models.storage.get("User", ids[4])
+        self.assertEqual({"hits": 1, "misses": 5, "evictions": 3,
+                          "size": 2, "limit": 2},
+                         models.storage.cache_stats())
+
+    def test_least_recently_used_evicted(self):
+        """Test that the object evicted is the least recently used."""
+        ids = self.save_and_reload(3)
+        models.storage.get("User", ids[0])
+        models.storage.get("User", ids[1])
+        models.storage.get("User", ids[0])
+        models.storage.get("User", ids[2])
+        self.assertEqual(["User." + ids[0], "User." + ids[2]],
+                         list(FileStorage._FileStorage__objects))
+
+    def test_changed_objects_kept(self):
+        """Test that objects with unsaved changes are not evicted."""
+        objs = [User() for i in range(3)]
+        self.assertEqual(3, len(FileStorage._FileStorage__objects))
+        models.storage.save()
+        self.assertEqual(2, len(FileStorage._FileStorage__objects))
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+        for us in objs:
+            self.assertEqual(us.to_dict(),
+                             models.storage.get("User", us.id).to_dict())
+
+    def test_evicted_object_reused(self):
+        """Test that an evicted object still referenced is stored again,
+        and that its changes are saved."""
+        ids = self.save_and_reload(3)
+        us = models.storage.get("User", ids[0])
+        models.storage.get("User", ids[1])
+        models.storage.get("User", ids[2])
+        self.assertNotIn("User." + us.id, FileStorage._FileStorage__objects)
+        self.assertIs(us, models.storage.get("User", us.id))
+        models.storage.get("User", ids[1])
+        models.storage.get("User", ids[2])
+        us.first_name = "Betty"
+        self.assertIs(us, FileStorage._FileStorage__objects["User." + us.id])
+        models.storage.save()
+        with open("file.json") as f:
+            objdict = json.load(f)
+        self.assertEqual("Betty", objdict["User." + us.id]["first_name"])
+
+    def test_delete_evicted_object(self):
+        """Test deleting an object that was evicted."""
+        ids = self.save_and_reload(3)
+        us = models.storage.get("User", ids[0])
+        models.storage.get("User", ids[1])
+        models.storage.get("User", ids[2])
+        models.storage.delete(us)
+        models.storage.save()
+        self.assertIsNone(models.storage.get("User", us.id))
+        self.assertEqual(2, models.storage.count())
+
+    def test_all(self):
+        """Test that all() returns every object in a new dictionary."""
+        ids = self.save_and_reload(4)
+        objs = models.storage.all()
+        self.assertEqual(["User." + i for i in ids], list(objs))
+        self.assertEqual(2, len(FileStorage._FileStorage__objects))
+
+    def test_mapped_records_reused(self):
+        """Test that evicted objects go back to their mapped records."""
+        FileStorage._FileStorage__mmap = True
+        ids = self.save_and_reload(3)
+        for obj_id in ids:
+            models.storage.get("User", obj_id)
+        self.assertEqual(memoryview, type(
+            FileStorage._FileStorage__raw["User." + ids[0]]))
+
+
+class TestFileStorageLocking(StorageTestCase):
+    """Unit tests for the file locks and merged saves of FileStorage."""
+
+    def setUp(self):
+        """Set up in snapshot mode, merging the saves."""
+        super().setUp()
+        FileStorage._FileStorage__journaled = False
+        FileStorage._FileStorage__merging = True
+        FileStorage._FileStorage__snapshot_seen = None
+
+    def tearDown(self):
+        """Cleanup by removing the lock file."""
+        try:
+            os.remove("file.json.lock")
+        except FileNotFoundError:
+            pass
+        super().tearDown()
+
+    def rewrite(self, change):
+        """Rewrite 'file.json' as another process would, calling change
+        on its dictionary of records."""
+        with open("file.json") as f:
+            objdict = json.load(f)
+        change(objdict)
+        with open("file.json", "w") as f:
+            json.dump(objdict, f, indent=1)
+
+    def test_merge_other_changes(self):
+        """Test that a save keeps the objects saved by another process."""
+        us = User()
+        us2 = User()
+        models.storage.save()
+        other = User(id="other", first_name="Betty")
+
+        def change(objdict):
+            objdict["User." + us2.id]["first_name"] = "Other"
+            objdict["User.other"] = other.to_dict()
+        self.rewrite(change)
+        us.first_name = "Local"
+        models.storage.save()
+        with open("file.json") as f:
+            objdict = json.load(f)
+        self.assertEqual("Local", objdict["User." + us.id]["first_name"])
+        self.assertEqual("Other", objdict["User." + us2.id]["first_name"])
+        self.assertEqual(other.to_dict(), objdict["User.other"])
+        self.assertEqual("Other", us2.first_name)
+        self.assertEqual("Betty", models.storage.get("User",
+                                                     "other").first_name)
+
+    def test_merge_attributes(self):
+        """Test that only the attributes changed locally override those
+        saved by another process."""
+        us = User()
+        models.storage.save()
+
+        def change(objdict):
+            objdict["User." + us.id]["first_name"] = "Other"
+            objdict["User." + us.id]["last_name"] = "Other"
+        self.rewrite(change)
+        us.first_name = "Local"
+        models.storage.save()
+        with open("file.json") as f:
+            rec = json.load(f)["User." + us.id]
+        self.assertEqual("Local", rec["first_name"])
+        self.assertEqual("Other", rec["last_name"])
+
+    def test_merge_deletions(self):
+        """Test objects deleted by either process."""
+        us = User()
+        us2 = User()
+        models.storage.save()
+
+        def change(objdict):
+            del objdict["User." + us.id]
+            objdict["User." + us2.id]["first_name"] = "Other"
+        self.rewrite(change)
+        models.storage.delete(us2)
+        models.storage.save()
+        with open("file.json") as f:
+            self.assertEqual({}, json.load(f))
+        self.assertEqual(0, models.storage.count())
+
+    def test_merge_deletion_wins_over_change(self):
+        """Test that an object deleted by another process stays deleted
+        when it was changed locally, unlike one created locally."""
+        us = User()
+        us2 = User()
+        models.storage.save()
+
+        def change(objdict):
+            del objdict["User." + us.id]
+        self.rewrite(change)
+        us.first_name = "Local"
+        us3 = User()
+        models.storage.save()
+        with open("file.json") as f:
+            self.assertEqual({"User." + us2.id, "User." + us3.id},
+                             set(json.load(f)))
+        self.assertIsNone(models.storage.get("User", us.id))
+
+    def test_merge_lazy_records(self):
+        """Test that records not yet built are replaced by new ones."""
+        us = User()
+        st = State()
+        models.storage.save()
+        FileStorage._FileStorage__lazy = True
+        FileStorage._FileStorage__objects = {}
+        models.storage.reload()
+
+        def change(objdict):
+            objdict["User." + us.id]["first_name"] = "Other"
+        self.rewrite(change)
+        models.storage.get("State", st.id).name = "Local"
+        models.storage.save()
+        self.assertEqual("Other", models.storage.get("User",
+                                                     us.id).first_name)
+
+    def test_unchanged_snapshot_not_read(self):
+        """Test that the snapshot is only read again when it changed."""
+        User()
+        models.storage.save()
+        with patch.object(FileStorage, "_FileStorage__merge") as merge:
+            User()
+            models.storage.save()
+        merge.assert_not_called()
+
+    def test_save_waits_for_lock(self):
+        """Test that a save waits for another process to release its
+        lock."""
+        FileStorage._FileStorage__merging = False
+        FileStorage._FileStorage__locking = True
+        User()
+        with open("file.json.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            saver = threading.Thread(target=models.storage.save)
+            saver.start()
+            saver.join(0.2)
+            self.assertTrue(saver.is_alive())
+            self.assertFalse(os.path.exists("file.json"))
+        saver.join()
+        self.assertTrue(os.path.exists("file.json"))
+
+    def test_concurrent_processes(self):
+        """Test that processes saving to the same file lose no object."""
+        code = ("import models; from models.user import User\n"
+                "for i in range(10):\n"
+                "    User().save()\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "file.json")
+            env = dict(os.environ, HBNB_FILE_PATH=path, HBNB_FILE_MERGE="1")
+            procs = [subprocess.Popen([sys.executable, "-c", code], env=env)
+                     for i in range(4)]
+            for proc in procs:
+                self.assertEqual(0, proc.wait())
+            with open(path) as f:
+                self.assertEqual(40, len(json.load(f)))
+
+    def test_concurrent_saves_without_locks(self):
+        """Test that processes saving to the same file at once do not
+        clash on their temporary files."""
+        code = ("import models; from models.user import User\n"
+                "for i in range(50):\n"
+                "    User().save()\n")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "file.json")
+            env = dict(os.environ, HBNB_FILE_PATH=path, HBNB_FILE_LAZY="1")
+            procs = [subprocess.Popen([sys.executable, "-c", code], env=env)
+                     for i in range(4)]
+            for proc in procs:
+                self.assertEqual(0, proc.wait())
+            self.assertEqual(["file.json", "file.json.offsets"],
+                             sorted(os.listdir(tmp)))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+"""This module defines unit tests for the 'query' module.
+
+Defines three unittest classes for testing storage queries:
+- TestParseConditions: Test parsing the conditions of a query.
+- TestCompileFilter: Test matching objects against conditions.
+- TestFileStorageWhere: Test planning queries in FileStorage.
+"""
+import models
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from models.place import Place
+from models.engine.file_storage import FileStorage
+from models.engine.query import parse_conditions, compile_filter
+
+
+class TestParseConditions(unittest.TestCase):
+    """Unit tests for the parse_conditions function."""
+
+    def test_operators_and_literals(self):
+        """Test numbers, quoted strings and every operator."""
+        self.assertEqual(
+            [("price_by_night", "<", 100), ("max_guest", ">=", 4),
+             ("latitude", ">", 1.5), ("name", "!=", "a, b"),
+             ("id", "<=", "x'y"), ("public", "==", True)],
+            parse_conditions("price_by_night<100, max_guest >= 4,"
+                             "latitude>1.5, name!='a, b', id<=\"x'y\", "
+                             "public==True"))
+
+    def test_bare_values_and_single_equal(self):
+        """Test unquoted strings and '=' for equality."""
+        self.assertEqual([("city_id", "==", "abc-123"), ("name", "==", "")],
+                         parse_conditions(" city_id = abc-123, name="))
+
+    def test_empty(self):
+        """Test that no text means no conditions."""
+        self.assertEqual([], parse_conditions("  "))
+
+    def test_invalid(self):
+        """Test text that is not a list of conditions."""
+        for text in ("max_guest", "4<max_guest", "a<1,,b>2", "a~1"):
+            with self.assertRaises(ValueError):
+                parse_conditions(text)
+
+
+class TestCompileFilter(unittest.TestCase):
+    """Unit tests for the compile_filter function."""
+
+    def test_match(self):
+        """Test that an object must match every condition."""
+        pl = Place()
+        pl.max_guest = 4
+        pl.name = "Loft"
+        match = compile_filter([("max_guest", ">", 2), ("name", "==", "Loft")])
+        self.assertTrue(match(pl))
+        pl.max_guest = 1
+        self.assertFalse(match(pl))
+        self.assertTrue(compile_filter([])(pl))
+
+    def test_missing_and_mismatched(self):
+        """Test that missing or incomparable attributes do not match."""
+        pl = Place()
+        pl.max_guest = "many"
+        self.assertFalse(compile_filter([("max_guest", ">", 2)])(pl))
+        self.assertFalse(compile_filter([("missing", "==", 2)])(pl))
+        self.assertFalse(compile_filter([("missing", "!=", 2)])(pl))
+
+
+class TestFileStorageWhere(unittest.TestCase):
+    """Unit tests for the where method of FileStorage."""
+
+    def setUp(self):
+        """Set up two cities with places."""
+        FileStorage._FileStorage__objects = {}
+        self.places = []
+        for city_id, price in (("c1", 50), ("c1", 120), ("c2", 60)):
+            pl = Place()
+            pl.city_id = city_id
+            pl.price_by_night = price
+            self.places.append(pl)
+
+    def tearDown(self):
+        """Cleanup by emptying the storage."""
+        FileStorage._FileStorage__objects = {}
+
+    def test_filter(self):
+        """Test a query answered by filtering the class."""
+        objs = models.storage.where("Place", [("price_by_night", "<", 100)])
+        self.assertEqual({self.places[0], self.places[2]},
+                         set(objs.values()))
+        self.assertEqual({}, models.storage.where(
+            "City", [("price_by_night", "<", 100)]))
+
+    def test_relation_index(self):
+        """Test that an equality on a parent id uses its index."""
+        conditions = [("price_by_night", "<", 100), ("city_id", "==", "c1")]
+        with patch.object(FileStorage, "all") as all_objs:
+            objs = models.storage.where("Place", conditions)
+        all_objs.assert_not_called()
+        self.assertEqual([self.places[0]], list(objs.values()))
+
+    def test_time_range(self):
+        """Test that timestamp bounds use the timestamp index."""
+        for day, pl in zip((1, 2, 3), self.places):
+            pl.updated_at = datetime(2023, 10, day)
+        conditions = [("updated_at", ">", "2023-10-01"),
+                      ("updated_at", "<=", datetime(2023, 10, 3)),
+                      ("price_by_night", "<", 100)]
+        with patch.object(FileStorage, "all") as all_objs:
+            objs = models.storage.where("Place", conditions)
+        all_objs.assert_not_called()
+        self.assertEqual([self.places[2]], list(objs.values()))
+        self.assertEqual({}, models.storage.where(
+            "City", [("updated_at", ">", "2023-10-01")]))
+
+    def test_id(self):
+        """Test that an equality on the id looks up one object."""
+        pl = self.places[1]
+        with patch.object(FileStorage, "all") as all_objs:
+            objs = models.storage.where("Place", [("id", "==", pl.id)])
+            self.assertEqual({}, models.storage.where(
+                "Place", [("id", "==", "missing")]))
+        all_objs.assert_not_called()
+        self.assertEqual({"Place." + pl.id: pl}, objs)
+
+
+if __name__ == "__main__":
+    unittest.main()
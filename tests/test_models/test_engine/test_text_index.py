@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""This module defines unit tests for the 'text_index' module.
+
+Defines two unittest classes for testing the full-text index:
+- TestTokenize: Test splitting and stemming words.
+- TestInvertedIndex: Test indexing and ranking documents.
+"""
+import unittest
+from io import StringIO
+from models.engine.text_index import InvertedIndex, stem, tokenize
+
+
+class TestTokenize(unittest.TestCase):
+    """Unit tests for the tokenize and stem functions."""
+
+    def test_tokenize(self):
+        """Test that words are lowercase and punctuation is dropped."""
+        self.assertEqual(["great", "view", "5", "stars"],
+                         tokenize("Great view! 5 stars..."))
+
+    def test_stem(self):
+        """Test stripping common suffixes."""
+        self.assertEqual(["view", "view", "cozy", "quiet", "walk", "bus"],
+                         [stem(w) for w in ("views", "viewing", "cozies",
+                                            "quietly", "walked", "bus")])
+        self.assertEqual(["great", "view", "star"],
+                         tokenize("Great Views, stars", stemmed=True))
+
+
+class TestInvertedIndex(unittest.TestCase):
+    """Unit tests for the InvertedIndex class."""
+
+    def setUp(self):
+        """Set up an index of three reviews."""
+        self.index = InvertedIndex()
+        self.index.add("Review.1", ["Great view, great host"])
+        self.index.add("Review.2", ["Noisy street but a great view of "
+                                    "the river from the small balcony"])
+        self.index.add("Review.3", ["Small and noisy"])
+
+    def test_search_ranks(self):
+        """Test that documents are ranked by relevance."""
+        self.assertEqual(["Review.1", "Review.2"],
+                         [k for s, k in self.index.search("great")])
+        self.assertEqual(["Review.3", "Review.2"],
+                         [k for s, k in self.index.search("NOISY small")])
+        self.assertEqual([], self.index.search("pool"))
+        self.assertEqual([], InvertedIndex().search("pool"))
+
+    def test_add_replaces_and_remove(self):
+        """Test updating and removing documents."""
+        self.index.add("Review.1", ["Awful"])
+        self.assertEqual(["Review.2"],
+                         [k for s, k in self.index.search("great")])
+        self.index.remove("Review.2")
+        self.index.remove("Review.missing")
+        self.assertEqual([], self.index.search("great"))
+        self.assertNotIn("river", self.index.postings)
+        self.index.add("Review.3", [])
+        self.assertEqual({"Review.1"}, set(self.index.docs))
+
+    def test_dump_and_load(self):
+        """Test that a loaded index ranks like the original."""
+        f = StringIO()
+        self.index.dump(f, [["file.json", 1, 2, 3]])
+        f.seek(0)
+        index, stamp = InvertedIndex.load(f)
+        self.assertEqual([["file.json", 1, 2, 3]], stamp)
+        self.assertEqual(self.index.search("small view"),
+                         index.search("small view"))
+        self.assertFalse(index.stemmed)
+
+
+if __name__ == "__main__":
+    unittest.main()